@@ -0,0 +1,67 @@
+"""
+管理接口路由
+提供性能剖析等运维功能，需通过ADMIN_TOKEN环境变量配置的令牌访问
+"""
+
+import logging
+import os
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+
+from app.routes import voice_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class ProfileRequest(BaseModel):
+    mode: str = "torch"
+    requests: Optional[int] = None
+    seconds: Optional[float] = None
+
+def verify_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    """校验管理令牌；未设置ADMIN_TOKEN时管理接口不可用"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="管理接口未启用（未设置ADMIN_TOKEN）")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=401, detail="管理令牌无效")
+
+@router.post("/profile", dependencies=[Depends(verify_admin_token)])
+async def start_profiling(request: ProfileRequest):
+    """
+    开启性能剖析
+
+    Args:
+        request: mode为torch（Chrome Trace）或sampling（speedscope），
+                 requests/seconds指定剖析接下来的N次请求或T秒
+
+    Returns:
+        剖析状态
+    """
+    if request.requests is not None and request.requests <= 0:
+        raise HTTPException(status_code=400, detail="requests必须为正数")
+    if request.seconds is not None and request.seconds <= 0:
+        raise HTTPException(status_code=400, detail="seconds必须为正数")
+
+    profiler = voice_service.gpt_sovits_service.profiler
+    try:
+        profiler.arm(mode=request.mode, requests=request.requests, seconds=request.seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return profiler.status()
+
+@router.get("/profile", dependencies=[Depends(verify_admin_token)])
+async def get_profiling_status():
+    """获取剖析状态和已生成的剖析文件"""
+    return voice_service.gpt_sovits_service.profiler.status()
+
+@router.delete("/profile", dependencies=[Depends(verify_admin_token)])
+async def stop_profiling():
+    """立即关闭性能剖析"""
+    profiler = voice_service.gpt_sovits_service.profiler
+    profiler.disarm()
+    return profiler.status()
@@ -3,15 +3,31 @@
 提供语音合成功能的REST API
 """
 
+import asyncio
+import base64
+import json
 import logging
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse
+import struct
+import threading
+import time
+import zipfile
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-import io
+from typing import List, Optional, Tuple, Union
 
+from app.services.audio_store import AudioStore
+from app.services.cancellation import (
+    CANCEL_DEADLINE, CancellationScope, RequestCancelled, cancellation_metrics
+)
 from app.services.deepseek_service import DeepSeekService
-from app.services.gpt_sovits_service import GPTSoVITSService
+from app.services.gpt_sovits_service import GPTSoVITSService, SynthesisCancelled
+from app.services.inference_queue import InProcessQueue, QueueDispatcher
+from app.services.job_service import FINISHED_STATES, JobService
+from app.services.log_service import preview_text
+from app.services.segment_planner import find_sentence_boundary
+from app.services.speculative_service import SpeculativeSynthesis
 
 logger = logging.getLogger(__name__)
 
@@ -20,56 +36,163 @@ router = APIRouter()
 class ChatRequest(BaseModel):
     message: str
     page: Optional[str] = "tts-chat"
+    speculate: Optional[bool] = True
+    latency_budget_ms: Optional[float] = None
 
 class SynthesisRequest(BaseModel):
     text: str
     page: Optional[str] = "tts-chat"
+    profile: Optional[str] = None
+    latency_budget_ms: Optional[float] = None
+    reply_id: Optional[str] = None
+
+class SynthesisJobRequest(BaseModel):
+    text: str
+    page: Optional[str] = "tts-chat"
+    profile: Optional[str] = None
+
+class BatchSynthesisRequest(BaseModel):
+    texts: List[str]
+    page: Optional[str] = "tts-chat"
+    format: Optional[str] = "ndjson"
+    profile: Optional[str] = None
+
+def _request_scope(http_request: Request, timeout_key: str, default_timeout: float, stage: str) -> CancellationScope:
+    """
+    创建请求的取消范围：截止时间取配置值，客户端可通过X-Request-Timeout-Ms请求头缩短
+    """
+    cancel_config = gpt_sovits_service.config.get("cancellation", {})
+    timeout = float(cancel_config.get(timeout_key, default_timeout)) or None
+
+    header = http_request.headers.get("x-request-timeout-ms")
+    if header and header.isdigit() and int(header) > 0:
+        client_timeout = int(header) / 1000
+        timeout = min(timeout, client_timeout) if timeout else client_timeout
+
+    return CancellationScope(timeout, stage=stage)
+
+def _watch_disconnect(scope: CancellationScope, http_request: Request):
+    """客户端断开时取消请求"""
+    interval = gpt_sovits_service.config.get("cancellation", {}).get("disconnect_poll_ms", 250) / 1000
+    scope.watch(http_request.is_disconnected, interval)
+
+def _cancelled_response(reason: Optional[str]) -> Response:
+    """已取消请求的响应：超时返回504，客户端断开返回499（客户端已不会收到）"""
+    if reason == CANCEL_DEADLINE:
+        raise HTTPException(status_code=504, detail="请求超时，已取消")
+    return Response(status_code=499)
 
 @router.post("/chat")
-async def chat_with_ai(request: ChatRequest):
+async def chat_with_ai(request: ChatRequest, http_request: Request):
     """
     与AI对话接口
 
+    客户端断开或超过截止时间时中止正在进行的DeepSeek调用。
+    启用预测合成时在后台提前合成回复语音，客户端以返回的reply_id请求合成即可直接取用。
+    latency_budget_ms为对话与语音合成共享的总时间预算：先按页面语音的实测语速为回复的合成预留一份，
+    DeepSeek调用（含重试）在其余预算内完成，剩余预算以synthesis_budget_ms返回，
+    客户端可作为合成请求的latency_budget_ms
+
     Args:
-        request: 包含用户消息和页面标识的请求
+        request: 包含用户消息和页面标识的请求，speculate为False时不做预测合成
 
     Returns:
-        AI回复内容
+        AI回复内容、回复ID（未安排预测合成时为None）与剩余的合成时间预算
     """
+    if request.latency_budget_ms is not None and request.latency_budget_ms <= 0:
+        raise HTTPException(status_code=400, detail="latency_budget_ms必须为正数")
+
+    scope = _request_scope(http_request, "chat_timeout_seconds", 60, stage="deepseek")
+    start = time.monotonic()
     try:
-        logger.info(f"💬 收到对话请求: {request.message[:50]}...")
+        logger.info("💬 收到对话请求", extra={"page": request.page, "text": preview_text(request.message)})
 
         # 获取页面配置
         page_config = gpt_sovits_service.get_page_config(request.page)
         personality = page_config.get("personality", "")
         chat_config = page_config.get("chat_config", {})
 
-        logger.info(f"📋 页面配置: page={request.page}, personality长度={len(personality)}, chat_config={bool(chat_config)}")
+        logger.debug("📋 页面配置: page=%s, personality长度=%d, chat_config=%s", request.page, len(personality), bool(chat_config))
 
         # 调用DeepSeek生成回复
-        ai_response = await deepseek_service.generate_fujian_response(
-            user_message=request.message,
-            personality=personality,
-            page=request.page
+        async with scope:
+            _watch_disconnect(scope, http_request)
+            budget_seconds = scope.remaining()
+            if request.latency_budget_ms is not None:
+                reserve_ms = _synthesis_reserve_ms(request.page, request.latency_budget_ms)
+                request_budget = (request.latency_budget_ms - reserve_ms) / 1000
+                budget_seconds = min(budget_seconds, request_budget) if budget_seconds is not None else request_budget
+            ai_response = await scope.run(
+                deepseek_service.generate_fujian_response(
+                    user_message=request.message,
+                    personality=personality,
+                    page=request.page,
+                    budget_seconds=budget_seconds
+                ),
+                stage="deepseek"
+            )
+
+        logger.debug("✅ AI回复生成完成: %d 字符", len(ai_response))
+
+        # 剩余预算留给语音合成（预算已用完时仍给出最小值，由档位选择退回最快档位）
+        synthesis_budget_ms = None
+        if request.latency_budget_ms is not None:
+            synthesis_budget_ms = max(1.0, request.latency_budget_ms - (time.monotonic() - start) * 1000)
+
+        reply_id = (
+            _schedule_speculation(ai_response, request.page, synthesis_budget_ms)
+            if request.speculate else None
         )
 
-        logger.info(f"✅ AI回复生成完成: {len(ai_response)} 字符")
-
         return {
             "success": True,
             "response": ai_response,
-            "page": request.page
+            "page": request.page,
+            "reply_id": reply_id,
+            "synthesis_budget_ms": round(synthesis_budget_ms) if synthesis_budget_ms is not None else None
         }
 
+    except RequestCancelled as e:
+        return _cancelled_response(e.reason)
     except Exception as e:
         logger.error(f"❌ 对话请求失败: {e}")
         raise HTTPException(status_code=500, detail=f"对话服务异常: {str(e)}")
 
+def _synthesis_reserve_ms(page: str, latency_budget_ms: float) -> float:
+    """
+    对话预算中为回复语音合成预留的时间
+
+    按页面语音以最快档位合成预计回复长度的耗时估算，最多占总预算的max_synthesis_share
+    """
+    chat_config = gpt_sovits_service.config.get("chat", {})
+    max_share = float(chat_config.get("max_synthesis_share", 0.5))
+    predicted = gpt_sovits_service.predict_synthesis_ms(page, int(chat_config.get("expected_reply_chars", 120)))
+    if predicted is None:
+        return latency_budget_ms * max_share
+    return min(predicted, latency_budget_ms * max_share)
+
+def _schedule_speculation(text: str, page: str, latency_budget_ms: Optional[float] = None) -> Optional[str]:
+    """安排回复语音的预测合成（按剩余预算或页面默认档位），返回回复ID"""
+    if not speculative_enabled or not text.strip():
+        return None
+    try:
+        profile = gpt_sovits_service.select_profile(page, text, latency_budget_ms=latency_budget_ms)
+    except ValueError:
+        return None
+    request_key = AudioStore.request_key(
+        text, page, gpt_sovits_service.get_voice_fingerprint(page), profile=profile
+    )
+    if audio_store.lookup(request_key):
+        return None
+    return speculative_synthesis.schedule(text, page, profile, request_key)
+
 @router.post("/synthesize")
-async def synthesize_speech(request: SynthesisRequest, background_tasks: BackgroundTasks):
+async def synthesize_speech(request: SynthesisRequest, http_request: Request):
     """
     语音合成接口
 
+    客户端断开或超过截止时间时，在片段之间和T2S解码步之间终止合成
+
     Args:
         request: 包含文本和页面标识的请求
 
@@ -77,45 +200,607 @@ async def synthesize_speech(request: SynthesisRequest, background_tasks: Backgro
         音频流
     """
     try:
-        # 编码验证和日志
-        logger.info(f"🎵 收到语音合成请求 - 原始文本: {repr(request.text)}")
-        logger.info(f"🎵 收到语音合成请求 - 显示文本: {request.text[:50]}...")
-
         # 验证文本编码
         if not request.text or request.text.strip() == "":
             raise HTTPException(status_code=400, detail="文本不能为空")
 
-        # 检查是否包含中文字符
-        has_chinese = any('\u4e00' <= char <= '\u9fff' for char in request.text)
-        logger.info(f"🎵 文本包含中文字符: {has_chinese}")
-
-        # 如果文本是乱码，尝试提示用户
-        if '??' in request.text and has_chinese:
+        # 如果文本是乱码，尝试提示用户（仅在出现"??"时才检查中文字符）
+        if '??' in request.text and any('\u4e00' <= char <= '\u9fff' for char in request.text):
             logger.warning("⚠️ 检测到可能的编码问题，请确保客户端使用UTF-8编码")
 
-        # 调用语音合成服务
-        audio_data = await gpt_sovits_service.synthesize_speech(
-            text=request.text,
-            page=request.page
+        # 选择合成档位：指定档位 > 延迟预算 > 页面配置
+        profile = _select_profile(request.page, request.text, request.profile, request.latency_budget_ms)
+
+        scope = _request_scope(http_request, "synthesize_timeout_seconds", 500, stage="synthesis")
+        async with scope:
+            _watch_disconnect(scope, http_request)
+            try:
+                audio_hash, audio_data = await _synthesize_cached(
+                    request.text, request.page, gpt_sovits_service.get_voice_fingerprint(request.page),
+                    cancel_event=scope.event,
+                    profile=profile,
+                    reply_id=request.reply_id
+                )
+            except SynthesisCancelled:
+                pass
+        if scope.cancelled:
+            return _cancelled_response(scope.reason)
+        if not audio_hash:
+            raise HTTPException(status_code=500, detail="语音合成失败")
+
+        # 返回音频，并通过Content-Location指向可缓存的内容寻址资源
+        return await _audio_response(request=None, audio_hash=audio_hash, audio_data=audio_data, headers={
+            "Content-Disposition": "attachment; filename=speech.wav",
+            "Content-Location": f"/api/voice/audio/{audio_hash}",
+            "Cache-Control": "no-store",
+            "X-Synthesis-Profile": profile
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 语音合成请求失败: {e}")
+        raise HTTPException(status_code=500, detail=f"语音合成服务异常: {str(e)}")
+
+def _select_profile(
+    page: str,
+    text: str,
+    requested: Optional[str] = None,
+    latency_budget_ms: Optional[float] = None
+) -> str:
+    """选择合成档位，档位不存在时返回400"""
+    if latency_budget_ms is not None and latency_budget_ms <= 0:
+        raise HTTPException(status_code=400, detail="latency_budget_ms必须为正数")
+    try:
+        return gpt_sovits_service.select_profile(page, text, requested=requested, latency_budget_ms=latency_budget_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _synthesize_cached(
+    text: str,
+    page: str,
+    voice_fingerprint: str,
+    cancel_event: Optional[threading.Event] = None,
+    profile: Optional[str] = None,
+    reply_id: Optional[str] = None
+) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    合成文本并存入内容寻址存储；相同文本、页面、语音指纹和档位的请求直接复用已合成的音频，
+    其次取用对话回复的预测合成结果，都没有时才作为真实请求合成（进行中的预测合成为其让出）
+
+    Returns:
+        (音频哈希, 新合成的音频)，命中存储时音频为None，合成失败时返回(None, None)
+    """
+    request_key = AudioStore.request_key(text, page, voice_fingerprint, profile=profile)
+    audio_hash = audio_store.lookup(request_key)
+    if audio_hash:
+        logger.debug("♻️ 命中已合成音频: %s", audio_hash)
+        return audio_hash, None
+
+    audio_data = await speculative_synthesis.claim(request_key, reply_id)
+    if audio_data:
+        logger.debug("🔮 命中预测合成结果")
+        return await audio_store.put(audio_data, request_key), audio_data
+
+    # 调用语音合成服务
+    async with speculative_synthesis.real_request():
+        audio_data = await synthesizer.synthesize_speech(
+            text=text, page=page, cancel_event=cancel_event, profile=profile
         )
+    if not audio_data:
+        return None, None
 
-        if not audio_data:
-            raise HTTPException(status_code=500, detail="语音合成失败")
+    return await audio_store.put(audio_data, request_key), audio_data
+
+@router.post("/synthesize/batch")
+async def synthesize_speech_batch(request: BatchSynthesisRequest):
+    """
+    批量语音合成接口
 
-        # 返回音频流
-        audio_stream = io.BytesIO(audio_data)
+    同一页面的多条文本按组合成：组内各条的片段一起分桶，不同条目的片段共享推理批次
+    （语音只解析一次，重复文本复用已合成的音频），结果按顺序流式返回，每条文本单独报告成功或失败
 
-        logger.info(f"✅ 语音合成完成: {len(audio_data)} bytes")
+    Args:
+        request: texts为文本列表；format为ndjson（每行一条JSON，音频以base64编码）
+                 或zip（每条音频一个WAV文件，末尾附manifest.json）
 
+    Returns:
+        流式响应
+    """
+    batch_config = gpt_sovits_service.config.get("batch", {})
+    max_items = int(batch_config.get("max_items", 200))
+
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="texts不能为空")
+    if len(request.texts) > max_items:
+        raise HTTPException(status_code=413, detail=f"单次最多合成 {max_items} 条文本")
+    if request.format not in ("ndjson", "zip"):
+        raise HTTPException(status_code=400, detail=f"不支持的格式: {request.format}")
+    if not gpt_sovits_service.get_page_config(request.page):
+        raise HTTPException(status_code=404, detail=f"页面配置不存在: {request.page}")
+
+    profile = _select_profile(request.page, "", request.profile)
+    logger.info(
+        "📚 收到批量合成请求",
+        extra={"page": request.page, "items": len(request.texts), "format": request.format, "profile": profile}
+    )
+
+    if request.format == "zip":
         return StreamingResponse(
-            audio_stream,
-            media_type="audio/wav",
-            headers={"Content-Disposition": "attachment; filename=speech.wav"}
+            _batch_zip_stream(request.texts, request.page, profile),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=speech_batch.zip"}
         )
 
+    async def ndjson_stream():
+        async for item, audio_data in _batch_results(request.texts, request.page, profile):
+            if audio_data is not None:
+                item["audio_base64"] = base64.b64encode(audio_data).decode("ascii")
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+async def _batch_results(texts: List[str], page: str, profile: str):
+    """
+    按组合成批量请求中的文本，按顺序产出 (条目状态, 音频数据) ，失败条目的音频为None
+
+    每组batch.group_items条，组内未命中存储的条目一起合成；
+    客户端断开时流式响应关闭生成器，正在进行的合成随之取消
+    """
+    voice_fingerprint = gpt_sovits_service.get_voice_fingerprint(page)
+    cancel_event = threading.Event()
+    group_items = max(1, int(gpt_sovits_service.config.get("batch", {}).get("group_items", 8)))
+
+    try:
+        for start in range(0, len(texts), group_items):
+            group = texts[start:start + group_items]
+            outcomes = await _synthesize_group(group, page, voice_fingerprint, cancel_event, profile)
+            for index, (audio_hash, audio_data, error) in enumerate(outcomes, start):
+                item = {"index": index, "success": False}
+                if error:
+                    item["error"] = error
+                    yield item, None
+                    continue
+
+                if audio_data is None:
+                    audio_data = await audio_store.get(audio_hash)
+                item.update({
+                    "success": audio_data is not None,
+                    "audio_hash": audio_hash,
+                    "audio_url": f"/api/voice/audio/{audio_hash}"
+                })
+                if audio_data is None:
+                    item["error"] = "音频已被淘汰"
+                yield item, audio_data
+    except (GeneratorExit, asyncio.CancelledError):
+        cancel_event.set()
+        cancellation_metrics.record("disconnect", "batch")
+        raise
+
+async def _synthesize_group(
+    texts: List[str],
+    page: str,
+    voice_fingerprint: str,
+    cancel_event: threading.Event,
+    profile: str
+) -> List[Tuple[Optional[str], Optional[Union[bytes, memoryview]], Optional[str]]]:
+    """
+    合成一组批量条目，返回与条目一一对应的 (音频哈希, 新合成的音频, 错误信息)
+
+    本地模式下未命中存储的条目一起规划片段，不同条目的片段共享推理批次，合成后按条目切分；
+    队列模式下模型在工作节点上，逐条经推理队列分发
+    """
+    outcomes: List[Optional[tuple]] = [None] * len(texts)
+    pending: List[Tuple[int, str, str]] = []
+    for position, text in enumerate(texts):
+        if not text or not text.strip():
+            outcomes[position] = (None, None, "文本不能为空")
+            continue
+        request_key = AudioStore.request_key(text, page, voice_fingerprint, profile=profile)
+        audio_hash = audio_store.lookup(request_key)
+        if audio_hash:
+            outcomes[position] = (audio_hash, None, None)
+        else:
+            pending.append((position, text, request_key))
+    if not pending:
+        return outcomes
+
+    if synthesizer is not gpt_sovits_service:
+        for position, text, _ in pending:
+            try:
+                audio_hash, audio_data = await _synthesize_cached(
+                    text, page, voice_fingerprint, cancel_event=cancel_event, profile=profile
+                )
+            except SynthesisCancelled:
+                raise
+            except Exception as e:
+                logger.error("❌ 批量合成条目失败: %s", e)
+                audio_hash, audio_data = None, None
+            outcomes[position] = (audio_hash, audio_data, None) if audio_hash else (None, None, "语音合成失败")
+        return outcomes
+
+    try:
+        async with speculative_synthesis.real_request():
+            audio_list = await gpt_sovits_service.synthesize_batch(
+                [text for _, text, _ in pending], page, cancel_event=cancel_event, profile=profile
+            )
+    except SynthesisCancelled:
+        raise
     except Exception as e:
-        logger.error(f"❌ 语音合成请求失败: {e}")
-        raise HTTPException(status_code=500, detail=f"语音合成服务异常: {str(e)}")
+        logger.error("❌ 批量合成失败: %s", e)
+        audio_list = [b""] * len(pending)
+
+    for (position, _, request_key), audio_data in zip(pending, audio_list):
+        if audio_data:
+            outcomes[position] = (await audio_store.put(audio_data, request_key), audio_data, None)
+        else:
+            outcomes[position] = (None, None, "语音合成失败")
+    return outcomes
+
+class _ZipChunkWriter:
+    """zipfile的只写输出目标：写入的数据暂存为块，由流式响应逐块取出"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+async def _batch_zip_stream(texts: List[str], page: str, profile: str):
+    """以不可寻址的ZIP流输出批量合成结果，音频不压缩（WAV压缩收益很小）"""
+    writer = _ZipChunkWriter()
+    manifest = []
+    with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        async for item, audio_data in _batch_results(texts, page, profile):
+            if audio_data is not None:
+                item["file"] = f"{item['index']:05d}.wav"
+                archive.writestr(item["file"], audio_data)
+            manifest.append(item)
+            chunk = writer.take()
+            if chunk:
+                yield chunk
+        archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    yield writer.take()
+
+def _parse_range(range_header: str, size: int):
+    """
+    解析单个字节范围的Range请求头
+
+    Returns:
+        (start, end) 闭区间；格式不支持时返回None；范围不可满足时抛出ValueError
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_str, _, end_str = spec.strip().partition("-")
+    if start_str == "":
+        if not end_str.isdigit() or int(end_str) == 0:
+            raise ValueError(range_header)
+        length = min(int(end_str), size)
+        return size - length, size - 1
+
+    if not start_str.isdigit() or (end_str and not end_str.isdigit()):
+        return None
+    start = int(start_str)
+    end = min(int(end_str), size - 1) if end_str else size - 1
+    if start >= size or start > end:
+        raise ValueError(range_header)
+    return start, end
+
+def _etag_matches(header_value: str, etag: str) -> bool:
+    """判断If-None-Match请求头是否包含当前ETag（弱比较）"""
+    if header_value.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header_value.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+async def _audio_response(
+    request: Optional[Request],
+    audio_hash: str,
+    audio_data: Optional[Union[bytes, memoryview]] = None,
+    headers: Optional[dict] = None
+) -> Response:
+    """
+    构建内容寻址音频的响应，支持条件请求(304)、Range请求(206)和HEAD
+
+    Args:
+        request: 当前请求，为None时直接返回完整音频
+        audio_hash: 音频内容哈希
+        audio_data: 已在内存中的音频内容，为None时从存储读取
+        headers: 额外的响应头
+    """
+    if audio_data is None:
+        audio_data = await audio_store.get(audio_hash)
+    if audio_data is None:
+        raise HTTPException(status_code=404, detail=f"音频不存在: {audio_hash}")
+    if not isinstance(audio_data, bytes):
+        # 合成结果为WAV的memoryview；Starlette 0.27的Response只原样发送bytes，其他类型会被当作str编码
+        audio_data = bytes(audio_data)
+
+    etag = f'"{audio_hash}"'
+    response_headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable",
+        **(headers or {})
+    }
+    size = len(audio_data)
+
+    if request is not None:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=response_headers)
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == etag):
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                return Response(status_code=416, headers={**response_headers, "Content-Range": f"bytes */{size}"})
+
+            if byte_range is not None:
+                start, end = byte_range
+                body = audio_data[start:end + 1] if request.method != "HEAD" else b""
+                return Response(
+                    content=body,
+                    status_code=206,
+                    media_type="audio/wav",
+                    headers={
+                        **response_headers,
+                        "Content-Range": f"bytes {start}-{end}/{size}",
+                        "Content-Length": str(end - start + 1)
+                    }
+                )
+
+        if request.method == "HEAD":
+            return Response(
+                status_code=200,
+                media_type="audio/wav",
+                headers={**response_headers, "Content-Length": str(size)}
+            )
+
+    return Response(content=audio_data, media_type="audio/wav", headers=response_headers)
+
+@router.api_route("/audio/{audio_hash}", methods=["GET", "HEAD"])
+async def get_audio(audio_hash: str, request: Request):
+    """
+    获取内容寻址的合成音频
+
+    使用强ETag和长期缓存，支持If-None-Match条件请求、Range分段请求和HEAD请求
+    """
+    if not AudioStore.is_valid_hash(audio_hash):
+        raise HTTPException(status_code=404, detail=f"音频不存在: {audio_hash}")
+    return await _audio_response(request, audio_hash)
+
+@router.post("/jobs", status_code=202)
+async def create_synthesis_job(request: SynthesisJobRequest):
+    """
+    提交异步语音合成任务（适用于长文本）
+
+    Args:
+        request: 包含文本和页面标识的请求
+
+    Returns:
+        任务信息，包含查询状态、订阅进度和获取结果的地址
+    """
+    if not request.text or request.text.strip() == "":
+        raise HTTPException(status_code=400, detail="文本不能为空")
+
+    if not gpt_sovits_service.get_page_config(request.page):
+        raise HTTPException(status_code=404, detail=f"页面配置不存在: {request.page}")
+
+    profile = _select_profile(request.page, request.text, request.profile)
+    job = await job_service.submit(request.text, request.page, profile=profile)
+    job_id = job["job_id"]
+    return {
+        **job,
+        "status_url": f"/api/voice/jobs/{job_id}",
+        "events_url": f"/api/voice/jobs/{job_id}/events",
+        "result_url": f"/api/voice/jobs/{job_id}/result"
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_synthesis_job(job_id: str):
+    """查询合成任务状态"""
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_synthesis_job_events(job_id: str):
+    """以Server-Sent Events推送任务进度，任务结束后关闭连接"""
+    if not job_service.get(job_id):
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+
+    async def event_stream():
+        queue = job_service.subscribe(job_id)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # 保活注释行，防止代理断开空闲连接
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield f"event: {event['status']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if event["status"] in FINISHED_STATES:
+                    break
+        finally:
+            job_service.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.get("/jobs/{job_id}/result")
+async def get_synthesis_job_result(job_id: str):
+    """获取合成任务的音频结果"""
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    if job["status"] not in FINISHED_STATES:
+        raise HTTPException(status_code=409, detail=f"任务尚未完成: {job['status']}")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"任务未成功: {job['status']}")
+
+    result_path = job_service.get_result_path(job_id)
+    if not result_path:
+        raise HTTPException(status_code=410, detail="任务结果已过期")
+
+    return FileResponse(
+        result_path,
+        media_type="audio/wav",
+        filename=f"{job_id}.wav"
+    )
+
+@router.delete("/jobs/{job_id}")
+async def cancel_synthesis_job(job_id: str):
+    """取消合成任务"""
+    job = job_service.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    return job
+
+# WebSocket二进制音频帧头: 序号(uint32) + 句子序号(uint32) + 采样率(uint32)，小端序，后接16bit单声道PCM
+WS_FRAME_HEADER = struct.Struct("<III")
+
+@router.websocket("/ws")
+async def voice_websocket(websocket: WebSocket, page: str = "tts-chat", profile: Optional[str] = None):
+    """
+    全双工语音合成WebSocket接口（profile查询参数可指定合成档位，如realtime）
+
+    客户端发送JSON文本消息:
+        {"type": "text", "text": "..."}  追加文本增量，遇到句末标点即开始合成
+        {"type": "flush"}                合成缓冲区中剩余的文本
+        {"type": "cancel"}               清空缓冲区并取消正在进行和排队的合成
+
+    服务端发送:
+        JSON消息 sentence_start / sentence_end / flushed / cancelled / error
+        二进制音频帧: WS_FRAME_HEADER + PCM数据
+    """
+    await websocket.accept()
+
+    if not gpt_sovits_service.get_page_config(page):
+        await websocket.send_json({"type": "error", "detail": f"页面配置不存在: {page}"})
+        await websocket.close(code=1008)
+        return
+    if profile is not None and profile not in gpt_sovits_service.synthesis_profiles.names:
+        await websocket.send_json({"type": "error", "detail": f"未知的合成档位: {profile}"})
+        await websocket.close(code=1008)
+        return
+
+    ws_config = gpt_sovits_service.config.get("websocket", {})
+    frame_ms = int(ws_config.get("frame_ms", 200))
+    max_buffer_chars = int(ws_config.get("max_buffer_chars", 120))
+
+    buffer = ""
+    sentences: asyncio.Queue = asyncio.Queue()
+    state = {"cancel_event": threading.Event(), "sentence_seq": 0, "frame_seq": 0}
+
+    async def synthesis_loop():
+        """按顺序合成缓冲出的句子并以二进制帧推送"""
+        while True:
+            item = await sentences.get()
+            if item is None:
+                await websocket.send_json({"type": "flushed"})
+                continue
+
+            sentence_seq, text, cancel_event = item
+            if cancel_event.is_set():
+                continue
+
+            await websocket.send_json({"type": "sentence_start", "sentence": sentence_seq, "text": text})
+            try:
+                # 队列模式下经推理队列由工作节点合成
+                async with speculative_synthesis.real_request():
+                    result = await synthesizer.synthesize_pcm(
+                        text, page, cancel_event=cancel_event, profile=profile
+                    )
+            except SynthesisCancelled:
+                continue
+
+            if cancel_event.is_set():
+                continue
+            if result is None:
+                await websocket.send_json({"type": "error", "sentence": sentence_seq, "detail": "语音合成失败"})
+                continue
+
+            sr, audio_data = result
+            # 按帧切片PCM的内存视图，不复制整段音频
+            pcm = memoryview(np.ascontiguousarray(audio_data)).cast("B")
+            frame_bytes = max(2, sr * frame_ms // 1000 * 2)
+            frames = 0
+            for offset in range(0, len(pcm), frame_bytes):
+                if cancel_event.is_set():
+                    break
+                header = WS_FRAME_HEADER.pack(state["frame_seq"], sentence_seq, sr)
+                await websocket.send_bytes(header + pcm[offset:offset + frame_bytes])
+                state["frame_seq"] += 1
+                frames += 1
+
+            await websocket.send_json({"type": "sentence_end", "sentence": sentence_seq, "frames": frames})
+
+    def enqueue(text: str):
+        text = text.strip()
+        if text:
+            sentences.put_nowait((state["sentence_seq"], text, state["cancel_event"]))
+            state["sentence_seq"] += 1
+
+    synthesis_task = asyncio.create_task(synthesis_loop())
+    logger.info("🔌 WebSocket语音连接已建立 (页面: %s)", page)
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            message_type = message.get("type")
+
+            if message_type == "text":
+                buffer += message.get("text", "")
+                boundary = find_sentence_boundary(buffer)
+                if boundary == 0 and len(buffer) >= max_buffer_chars:
+                    boundary = len(buffer)
+                if boundary:
+                    enqueue(buffer[:boundary])
+                    buffer = buffer[boundary:]
+
+            elif message_type == "flush":
+                enqueue(buffer)
+                buffer = ""
+                sentences.put_nowait(None)
+
+            elif message_type == "cancel":
+                buffer = ""
+                state["cancel_event"].set()
+                state["cancel_event"] = threading.Event()
+                while not sentences.empty():
+                    sentences.get_nowait()
+                await websocket.send_json({"type": "cancelled"})
+
+            else:
+                await websocket.send_json({"type": "error", "detail": f"未知消息类型: {message_type}"})
+
+    except WebSocketDisconnect:
+        logger.info("🔌 WebSocket语音连接已断开 (页面: %s)", page)
+    except Exception as e:
+        logger.error(f"❌ WebSocket语音连接异常: {e}")
+    finally:
+        state["cancel_event"].set()
+        synthesis_task.cancel()
 
 @router.get("/health")
 async def health_check():
@@ -135,6 +820,9 @@ async def health_check():
                 "deepseek": deepseek_status,
                 "gpt_sovits": gpt_sovits_status
             },
+            "cancellations": cancellation_metrics.stats(),
+            "inference_queue": inference_queue.stats() if inference_queue else None,
+            "speculative_synthesis": speculative_synthesis.stats() if speculative_enabled else None,
             "timestamp": deepseek_status.get("last_check", "")
         }
 
@@ -167,10 +855,18 @@ async def get_page_config(page: str):
 # 全局服务实例
 deepseek_service = None
 gpt_sovits_service = None
+# 合成入口：本地模式为gpt_sovits_service，队列模式为经推理队列分发的QueueDispatcher
+synthesizer = None
+inference_queue = None
+job_service = None
+audio_store = None
+speculative_synthesis = None
+speculative_enabled = False
 
 def init_services():
     """初始化服务实例"""
-    global deepseek_service, gpt_sovits_service
+    global deepseek_service, gpt_sovits_service, synthesizer, inference_queue, job_service, audio_store
+    global speculative_synthesis, speculative_enabled
 
     import os
     from dotenv import load_dotenv
@@ -178,15 +874,41 @@ def init_services():
     # 加载环境变量
     load_dotenv()
 
+    # 初始化GPT-SoVITS服务
+    gpt_sovits_service = GPTSoVITSService()
+
     # 初始化DeepSeek服务
     api_key = os.getenv("DEEPSEEK_API_KEY")
     if api_key:
-        deepseek_service = DeepSeekService(api_key)
+        deepseek_service = DeepSeekService.from_config(api_key, gpt_sovits_service.config.get("deepseek", {}))
     else:
         logger.warning("未设置DEEPSEEK_API_KEY")
 
-    # 初始化GPT-SoVITS服务
-    gpt_sovits_service = GPTSoVITSService()
+    # 队列模式下合成任务经推理队列分发到工作节点（本地工作协程在应用启动事件中启动）
+    gateway_config = gpt_sovits_service.config.get("gateway", {})
+    if gateway_config.get("mode", "local") == "queue":
+        inference_queue = InProcessQueue.from_config(gateway_config)
+        synthesizer = QueueDispatcher(
+            gpt_sovits_service,
+            inference_queue,
+            result_timeout_seconds=gateway_config.get("result_timeout_seconds", 600)
+        )
+        logger.info("✅ 网关以推理队列模式运行")
+    else:
+        synthesizer = gpt_sovits_service
+
+    # 初始化对话回复的预测合成（默认关闭；未启用时仍用于标记真实请求，开销可忽略）
+    speculative_config = gpt_sovits_service.config.get("speculative_synthesis", {})
+    speculative_enabled = bool(speculative_config.get("enabled", False))
+    speculative_synthesis = SpeculativeSynthesis.from_config(synthesizer, speculative_config)
+
+    # 初始化异步合成任务服务（工作协程在应用启动事件中启动；任务经本地服务或推理队列分发，均标记为真实请求）
+    job_service = JobService.from_config(
+        synthesizer, gpt_sovits_service.config.get("jobs", {}), speculative=speculative_synthesis
+    )
+
+    # 初始化内容寻址音频存储
+    audio_store = AudioStore.from_config(gpt_sovits_service, gpt_sovits_service.config.get("audio_store", {}))
 
 # 在模块导入时初始化服务
 init_services()
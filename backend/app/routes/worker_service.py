@@ -0,0 +1,90 @@
+"""
+推理工作节点接口路由
+网关以gateway.mode=queue运行时，远程推理工作节点通过这些接口领取合成任务并回传音频，
+需通过WORKER_TOKEN环境变量配置的令牌访问
+"""
+
+import logging
+import os
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from pydantic import BaseModel
+from typing import List, Optional
+
+from app.routes import voice_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 单次长轮询的最长等待时间（秒）
+MAX_LEASE_TIMEOUT = 30.0
+
+class LeaseRequest(BaseModel):
+    worker_id: str
+    voices: List[str] = []
+    timeout: float = 20.0
+
+class HeartbeatRequest(BaseModel):
+    worker_id: str
+    # 片段合成进度（可选）
+    completed: Optional[int] = None
+    total: Optional[int] = None
+
+class TaskErrorRequest(BaseModel):
+    worker_id: str
+    error: str = ""
+
+def verify_worker_token(x_worker_token: Optional[str] = Header(default=None)):
+    """校验工作节点令牌；未设置WORKER_TOKEN时不接受远程工作节点"""
+    worker_token = os.getenv("WORKER_TOKEN")
+    if not worker_token:
+        raise HTTPException(status_code=403, detail="工作节点接口未启用（未设置WORKER_TOKEN）")
+    if not x_worker_token or not secrets.compare_digest(x_worker_token, worker_token):
+        raise HTTPException(status_code=401, detail="工作节点令牌无效")
+
+def _get_queue():
+    if voice_service.inference_queue is None:
+        raise HTTPException(status_code=404, detail="网关未启用推理队列（gateway.mode不是queue）")
+    return voice_service.inference_queue
+
+@router.post("/lease", dependencies=[Depends(verify_worker_token)])
+async def lease_task(request: LeaseRequest):
+    """
+    领取一个合成任务（长轮询）
+
+    Returns:
+        任务描述；等待超时没有任务时返回204
+    """
+    timeout = min(max(request.timeout, 0.0), MAX_LEASE_TIMEOUT)
+    task = await _get_queue().lease(request.worker_id, request.voices, timeout=timeout)
+    if task is None:
+        return Response(status_code=204)
+    return task
+
+@router.post("/tasks/{task_id}/heartbeat", dependencies=[Depends(verify_worker_token)])
+async def task_heartbeat(task_id: str, request: HeartbeatRequest):
+    """续租执行中的任务；active为false时任务已被取消或转交，工作节点应中止合成"""
+    progress = (request.completed, request.total) if request.total is not None else None
+    active = await _get_queue().heartbeat(task_id, request.worker_id, progress=progress)
+    return {"task_id": task_id, "active": active}
+
+@router.post("/tasks/{task_id}/result", dependencies=[Depends(verify_worker_token)])
+async def submit_task_result(task_id: str, request: Request, x_worker_id: str = Header()):
+    """回传合成音频（请求体为WAV数据）"""
+    audio_data = await request.body()
+    if not audio_data:
+        raise HTTPException(status_code=400, detail="音频数据为空")
+    await _get_queue().complete(task_id, x_worker_id, audio_data)
+    return {"task_id": task_id, "accepted": True}
+
+@router.post("/tasks/{task_id}/error", dependencies=[Depends(verify_worker_token)])
+async def submit_task_error(task_id: str, request: TaskErrorRequest):
+    """报告任务失败"""
+    await _get_queue().fail(task_id, request.worker_id, request.error)
+    return {"task_id": task_id, "accepted": True}
+
+@router.get("/stats", dependencies=[Depends(verify_worker_token)])
+async def get_queue_stats():
+    """队列与工作节点状态"""
+    return _get_queue().stats()
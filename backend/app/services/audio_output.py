@@ -0,0 +1,147 @@
+"""
+音频输出
+推理输出到HTTP响应之间的PCM与WAV处理，尽量避免复制：
+    float_to_int16   浮点音频就地缩放、限幅后转换为16bit PCM（超出满幅的采样不再溢出回绕）
+    pcm_to_wav       预分配整个WAV文件的缓冲区，文件头与采样经memoryview直接写入，返回零复制视图
+    iter_wav_chunks  分块输出WAV，文件头使用流式长度，适合边合成边发送
+    wav_to_pcm       解析16bit单声道WAV，返回采样率与PCM的零复制视图
+一次请求的峰值内存约为一份PCM数据
+"""
+
+import struct
+from typing import Iterator, Tuple, Union
+
+import numpy as np
+
+# 16bit单声道PCM的WAV文件头（RIFF + fmt + data子块头），共44字节
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+WAV_HEADER_SIZE = WAV_HEADER.size
+
+# 流式WAV的长度占位值：总长度未知时RIFF与data子块长度写为最大值，播放器读到流结束为止
+STREAMING_SIZE = 0xFFFFFFFF
+
+_SAMPLE_WIDTH = 2
+_INT16_SCALE = 32768.0
+
+
+def float_to_int16(audio: np.ndarray) -> np.ndarray:
+    """
+    将[-1, 1]范围的浮点音频转换为16bit PCM
+
+    在可写的浮点数组上就地缩放和限幅，只在最后的类型转换分配一份int16数组；
+    已是int16的数组原样返回
+
+    Args:
+        audio: 推理输出的音频（调用方不再使用原数组）
+    """
+    if audio.dtype == np.int16:
+        return audio
+    if audio.dtype.kind != "f" or not audio.flags.writeable:
+        audio = audio.astype(np.float32)
+
+    np.multiply(audio, _INT16_SCALE, out=audio)
+    np.clip(audio, -_INT16_SCALE, _INT16_SCALE - 1, out=audio)
+    return audio.astype(np.int16)
+
+
+def wav_header(num_samples: int, sample_rate: int, streaming: bool = False) -> bytes:
+    """
+    16bit单声道WAV文件头
+
+    Args:
+        num_samples: 采样数
+        sample_rate: 采样率
+        streaming: 总长度未知，长度字段写为占位值
+    """
+    data_size = STREAMING_SIZE if streaming else num_samples * _SAMPLE_WIDTH
+    riff_size = STREAMING_SIZE if streaming else WAV_HEADER_SIZE - 8 + data_size
+    return WAV_HEADER.pack(*_header_fields(riff_size, data_size, sample_rate))
+
+
+def pcm_to_wav(pcm: np.ndarray, sample_rate: int) -> memoryview:
+    """
+    将16bit PCM封装为WAV文件
+
+    整个文件只分配一次：文件头经pack_into写入，采样经memoryview复制到文件头之后。
+    返回的memoryview可直接写入文件、计算哈希或经WebSocket发送；
+    作为HTTP Response内容时需转换为bytes（固定版本的Starlette只原样发送bytes）
+
+    Args:
+        pcm: 16bit单声道PCM
+        sample_rate: 采样率
+    """
+    pcm = np.ascontiguousarray(pcm, dtype=np.int16)
+    data_size = pcm.nbytes
+    buffer = bytearray(WAV_HEADER_SIZE + data_size)
+    WAV_HEADER.pack_into(buffer, 0, *_header_fields(WAV_HEADER_SIZE - 8 + data_size, data_size, sample_rate))
+
+    view = memoryview(buffer)
+    view[WAV_HEADER_SIZE:] = memoryview(pcm).cast("B")
+    return view
+
+
+def iter_wav_chunks(
+    pcm: Union[np.ndarray, memoryview],
+    sample_rate: int,
+    chunk_bytes: int = 64 * 1024,
+    streaming: bool = True
+) -> Iterator[Union[bytes, memoryview]]:
+    """
+    分块输出WAV：先输出文件头，再按块输出PCM的memoryview切片（不复制采样）
+
+    Args:
+        pcm: 16bit单声道PCM
+        sample_rate: 采样率
+        chunk_bytes: 每块的字节数（取偶数，避免拆开采样）
+        streaming: 文件头使用流式长度占位值；已知总长度时传False写入准确长度
+    """
+    view = memoryview(np.ascontiguousarray(pcm, dtype=np.int16)).cast("B") if isinstance(pcm, np.ndarray) else pcm.cast("B")
+    yield wav_header(len(view) // _SAMPLE_WIDTH, sample_rate, streaming=streaming)
+
+    chunk_bytes = max(_SAMPLE_WIDTH, chunk_bytes - chunk_bytes % _SAMPLE_WIDTH)
+    for offset in range(0, len(view), chunk_bytes):
+        yield view[offset:offset + chunk_bytes]
+
+
+def wav_to_pcm(data: Union[bytes, memoryview]) -> Tuple[int, np.ndarray]:
+    """
+    解析16bit单声道WAV（如经推理队列返回的音频），返回 (采样率, 16bit PCM)
+
+    PCM数组是data的只读视图，不复制采样
+
+    Raises:
+        ValueError: 不是16bit单声道PCM的WAV
+    """
+    view = memoryview(data).cast("B")
+    if len(view) < 12 or bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise ValueError("不是WAV数据")
+
+    sample_rate = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", view, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate = struct.unpack_from("<HHI", view, body)
+            bits = struct.unpack_from("<H", view, body + 14)[0]
+            if audio_format != 1 or channels != 1 or bits != _SAMPLE_WIDTH * 8:
+                raise ValueError("只支持16bit单声道PCM的WAV")
+        elif chunk_id == b"data":
+            if sample_rate is None:
+                raise ValueError("WAV缺少fmt子块")
+            # 流式长度占位值或截断的文件：取到数据末尾
+            end = min(len(view), body + chunk_size)
+            end -= (end - body) % _SAMPLE_WIDTH
+            return sample_rate, np.frombuffer(view[body:end], dtype=np.int16)
+        offset = body + chunk_size + (chunk_size & 1)
+    raise ValueError("WAV缺少data子块")
+
+
+def _header_fields(riff_size: int, data_size: int, sample_rate: int):
+    return (
+        b"RIFF", riff_size, b"WAVE",
+        b"fmt ", 16, 1, 1,                     # fmt子块大小、PCM格式、单声道
+        sample_rate, sample_rate * _SAMPLE_WIDTH, _SAMPLE_WIDTH, _SAMPLE_WIDTH * 8,
+        b"data", data_size,
+    )
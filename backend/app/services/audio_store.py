@@ -0,0 +1,234 @@
+"""
+内容寻址音频存储
+合成结果按音频内容的SHA-256存储，并记录合成请求到内容哈希的映射，
+相同请求可直接复用已合成的音频，音频资源可被浏览器和CDN长期缓存
+
+文件大小、访问顺序和请求键映射在启动时扫描一次后保存在内存中：
+lookup只查内存，put/get的磁盘读写经run_in_executor在线程池中执行，不阻塞事件循环；
+超出容量时按最近访问顺序淘汰音频，并一并删除指向它的请求键文件
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+AUDIO_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AudioStore:
+    """内容寻址的合成音频存储"""
+
+    def __init__(self, store_dir: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.store_dir = store_dir
+        self.audio_dir = os.path.join(store_dir, "audio")
+        self.keys_dir = os.path.join(store_dir, "keys")
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+
+        # 音频哈希 -> 文件大小（按最近访问排序），请求键 -> 音频哈希，音频哈希 -> 请求键
+        self._audio: "OrderedDict[str, int]" = OrderedDict()
+        self._keys: Dict[str, str] = {}
+        self._keys_by_audio: Dict[str, Set[str]] = {}
+        self._total_bytes = 0
+
+        os.makedirs(self.audio_dir, exist_ok=True)
+        os.makedirs(self.keys_dir, exist_ok=True)
+        self._load_index()
+
+    @classmethod
+    def from_config(cls, synthesizer, config: Dict[str, Any]) -> "AudioStore":
+        """从config.json中的audio_store配置创建"""
+        return cls(
+            synthesizer._resolve_backend_path(config.get("store_dir", "./data/audio")),
+            max_bytes=int(config.get("max_megabytes", 1024)) * 1024 * 1024
+        )
+
+    @staticmethod
+    def request_key(text: str, page: str, voice_fingerprint: str, **options) -> str:
+        """合成请求的键：文本、页面、语音指纹与其他影响输出的选项"""
+        raw = json.dumps(
+            {"text": text, "page": page, "voice": voice_fingerprint, "options": options},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_valid_hash(audio_hash: str) -> bool:
+        return bool(AUDIO_HASH_RE.match(audio_hash))
+
+    def _load_index(self):
+        """启动时扫描一次磁盘，建立内存索引（按文件访问时间恢复最近访问顺序）"""
+        entries = []
+        for name in os.listdir(self.audio_dir):
+            audio_hash, ext = os.path.splitext(name)
+            if ext != ".wav" or not self.is_valid_hash(audio_hash):
+                continue
+            stat = os.stat(os.path.join(self.audio_dir, name))
+            entries.append((max(stat.st_atime, stat.st_mtime), audio_hash, stat.st_size))
+        for _, audio_hash, size in sorted(entries):
+            self._audio[audio_hash] = size
+            self._total_bytes += size
+
+        for request_key in os.listdir(self.keys_dir):
+            key_path = self._key_path(request_key)
+            try:
+                with open(key_path, "r", encoding="utf-8") as f:
+                    audio_hash = f.read().strip()
+            except OSError:
+                continue
+            if audio_hash in self._audio:
+                self._link(request_key, audio_hash)
+            else:
+                # 指向已不存在音频的旧映射
+                self._remove_file(key_path)
+
+        logger.info(
+            "✅ 音频存储索引: %d 个文件, %.1fMB, %d 个请求映射",
+            len(self._audio), self._total_bytes / 1024 / 1024, len(self._keys)
+        )
+
+    def lookup(self, request_key: str) -> Optional[str]:
+        """查找请求对应的音频内容哈希（只查内存索引），音频已被淘汰时返回None"""
+        with self._lock:
+            audio_hash = self._keys.get(request_key)
+            if audio_hash is None or audio_hash not in self._audio:
+                return None
+            self._audio.move_to_end(audio_hash)
+            return audio_hash
+
+    async def put(self, audio_data: Union[bytes, memoryview], request_key: Optional[str] = None) -> str:
+        """写入音频并返回内容哈希，可同时记录请求键映射（磁盘写入在线程池中执行）"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.put_sync, audio_data, request_key)
+
+    async def get(self, audio_hash: str) -> Optional[bytes]:
+        """读取音频内容（磁盘读取在线程池中执行）"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_sync, audio_hash)
+
+    def put_sync(self, audio_data: Union[bytes, memoryview], request_key: Optional[str] = None) -> str:
+        """put的同步实现"""
+        audio_hash = hashlib.sha256(audio_data).hexdigest()
+        path = self.audio_path(audio_hash)
+
+        with self._lock:
+            stored = audio_hash in self._audio
+        if not stored:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio_data)
+            os.replace(tmp_path, path)
+
+        if request_key:
+            key_path = self._key_path(request_key)
+            with open(key_path, "w", encoding="utf-8") as f:
+                f.write(audio_hash)
+
+        with self._lock:
+            if audio_hash not in self._audio:
+                self._audio[audio_hash] = len(audio_data)
+                self._total_bytes += len(audio_data)
+            self._audio.move_to_end(audio_hash)
+            if request_key:
+                self._link(request_key, audio_hash)
+            evicted = self._select_evictions(keep=audio_hash)
+
+        self._delete(evicted, reason="音频存储超出容量")
+        return audio_hash
+
+    def get_sync(self, audio_hash: str) -> Optional[bytes]:
+        """get的同步实现"""
+        if not self.is_valid_hash(audio_hash):
+            return None
+        with self._lock:
+            if audio_hash not in self._audio:
+                return None
+            self._audio.move_to_end(audio_hash)
+        try:
+            with open(self.audio_path(audio_hash), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # 文件被外部删除：同步内存索引并删除指向它的请求键
+            self._delete(self._forget([audio_hash]), reason="音频文件已丢失")
+            return None
+
+    def audio_path(self, audio_hash: str) -> str:
+        return os.path.join(self.audio_dir, f"{audio_hash}.wav")
+
+    def _key_path(self, request_key: str) -> str:
+        return os.path.join(self.keys_dir, request_key)
+
+    def _link(self, request_key: str, audio_hash: str):
+        """记录请求键映射（须在持有锁时调用，启动扫描除外）"""
+        previous = self._keys.get(request_key)
+        if previous is not None and previous != audio_hash:
+            self._keys_by_audio.get(previous, set()).discard(request_key)
+        self._keys[request_key] = audio_hash
+        self._keys_by_audio.setdefault(audio_hash, set()).add(request_key)
+
+    def _select_evictions(self, keep: str) -> List[Tuple[str, List[str]]]:
+        """超出容量时按最近访问顺序选出要淘汰的音频（须在持有锁时调用）"""
+        victims = []
+        excess = self._total_bytes - self.max_bytes
+        for audio_hash, size in self._audio.items():
+            if excess <= 0:
+                break
+            if audio_hash != keep:
+                victims.append(audio_hash)
+                excess -= size
+        return self._forget_locked(victims)
+
+    def _forget(self, audio_hashes: List[str]) -> List[Tuple[str, List[str]]]:
+        with self._lock:
+            return self._forget_locked(audio_hashes)
+
+    def _forget_locked(self, audio_hashes: List[str]) -> List[Tuple[str, List[str]]]:
+        """从内存索引中移除音频及指向它的请求键，返回需删除的文件"""
+        removed = []
+        for audio_hash in audio_hashes:
+            size = self._audio.pop(audio_hash, None)
+            if size is None:
+                continue
+            self._total_bytes -= size
+            request_keys = sorted(self._keys_by_audio.pop(audio_hash, set()))
+            for request_key in request_keys:
+                if self._keys.get(request_key) == audio_hash:
+                    del self._keys[request_key]
+            removed.append((audio_hash, request_keys))
+        return removed
+
+    def _delete(self, removed: List[Tuple[str, List[str]]], reason: str):
+        """删除被淘汰的音频文件及其请求键文件（在锁外执行）"""
+        if not removed:
+            return
+        for audio_hash, request_keys in removed:
+            self._remove_file(self.audio_path(audio_hash))
+            for request_key in request_keys:
+                self._remove_file(self._key_path(request_key))
+        logger.info("🧹 %s，已清理 %d 个音频及其请求映射", reason, len(removed))
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("⚠️ 删除文件失败 %s: %s", path, e)
+
+    def stats(self) -> Dict[str, Any]:
+        """存储统计信息"""
+        with self._lock:
+            return {
+                "files": len(self._audio),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "request_keys": len(self._keys),
+            }
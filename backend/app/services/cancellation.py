@@ -0,0 +1,147 @@
+"""
+请求截止时间与取消
+每个请求携带截止时间并监视客户端断开；超时或断开时置位取消事件，
+由DeepSeek调用、片段循环和T2S解码循环在各自的检查点终止，已取消的工作计入统计
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CANCEL_DISCONNECT = "disconnect"
+CANCEL_DEADLINE = "deadline"
+
+
+class RequestCancelled(Exception):
+    """请求因客户端断开或超过截止时间被取消"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationMetrics:
+    """按原因和阶段统计被取消的请求"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+
+    def record(self, reason: str, stage: str):
+        with self._lock:
+            self._counts[(reason, stage)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_reason: Counter = Counter()
+            by_stage: Counter = Counter()
+            for (reason, stage), count in self._counts.items():
+                by_reason[reason] += count
+                by_stage[stage] += count
+            return {
+                "total": sum(self._counts.values()),
+                "by_reason": dict(by_reason),
+                "by_stage": dict(by_stage),
+            }
+
+
+cancellation_metrics = CancellationMetrics()
+
+
+class CancellationScope:
+    """
+    单个请求的取消范围
+
+    event为线程事件，传给推理线程在片段和解码步之间检查；
+    async with期间按截止时间定时取消，并可通过watch()监视客户端断开
+    """
+
+    def __init__(self, timeout_seconds: Optional[float] = None, stage: str = "request"):
+        self.event = threading.Event()
+        self.reason: Optional[str] = None
+        self.stage = stage
+        self.timeout_seconds = timeout_seconds
+        self.deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        self._cancelled = asyncio.Event()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的剩余秒数，无截止时间时返回None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str):
+        """取消请求（只记录第一次取消的原因）"""
+        if self.event.is_set():
+            return
+        self.reason = reason
+        self.event.set()
+        self._cancelled.set()
+        logger.info("🛑 请求已取消", extra={"reason": reason, "stage": self.stage})
+
+    def watch(self, is_disconnected: Callable[[], Awaitable[bool]], interval: float = 0.25):
+        """后台轮询客户端连接状态，断开时取消请求"""
+        async def poll():
+            while not self.event.is_set():
+                if await is_disconnected():
+                    self.cancel(CANCEL_DISCONNECT)
+                    return
+                await asyncio.sleep(interval)
+
+        self._watcher = asyncio.create_task(poll())
+
+    async def run(self, awaitable: Awaitable, stage: str):
+        """
+        执行可取消的协程，请求取消时立即中止它（如正在进行的DeepSeek调用）
+
+        Raises:
+            RequestCancelled: 请求已取消
+        """
+        self.stage = stage
+        self.raise_if_cancelled()
+
+        task = asyncio.ensure_future(awaitable)
+        waiter = asyncio.ensure_future(self._cancelled.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.raise_if_cancelled()
+        return task.result()
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise RequestCancelled(self.reason)
+
+    async def __aenter__(self) -> "CancellationScope":
+        remaining = self.remaining()
+        if remaining is not None:
+            self._timer = asyncio.get_running_loop().call_later(remaining, self.cancel, CANCEL_DEADLINE)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._watcher is not None:
+            self._watcher.cancel()
+        if self.event.is_set():
+            cancellation_metrics.record(self.reason, self.stage)
+        return False
@@ -0,0 +1,283 @@
+"""
+离线语料渲染
+将整份讲解稿等大批量文本离线合成为音频文件：输入为 (id, page, text) 的CSV或JSONL，
+按页面排序后分发到多个渲染进程（每个进程持有独立的常驻TTS管道），
+每完成一条即追加写入检查点，中断后以相同参数重新执行即可从断点继续。
+
+输出目录结构:
+    audio/<id>.wav      合成音频
+    manifest.jsonl      检查点：每条一行，记录时长、耗时与实时率
+    manifest.json       全部完成后汇总的清单
+
+用法（在backend目录下执行）:
+    python -m app.services.corpus_renderer corpus.jsonl --output ./data/corpus [--processes 4] [--threads 2]
+"""
+
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from app.services.audio_output import iter_wav_chunks
+
+logger = logging.getLogger(__name__)
+
+# 渲染进程内的服务实例（由进程初始化函数创建）
+_worker_service = None
+
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.\-]+")
+
+
+def read_corpus(path: str) -> List[Dict[str, str]]:
+    """读取CSV（需包含id、page、text列）或JSONL语料"""
+    items = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows: Iterator[Dict[str, Any]] = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        for line_number, row in enumerate(rows, start=1):
+            item_id = str(row.get("id") or "").strip()
+            text = str(row.get("text") or "").strip()
+            if not item_id or not text:
+                logger.warning(f"⚠️ 跳过第 {line_number} 条：缺少id或text")
+                continue
+            items.append({"id": item_id, "page": str(row.get("page") or "tts-chat"), "text": text})
+
+    ids = [item["id"] for item in items]
+    if len(ids) != len(set(ids)):
+        raise ValueError("语料中存在重复的id")
+    return items
+
+
+def audio_filename(item_id: str) -> str:
+    """由条目id生成安全的音频文件名"""
+    return f"{_UNSAFE_FILENAME_CHARS.sub('_', item_id)}.wav"
+
+
+def _init_worker(config_path: str, torch_threads: int):
+    """渲染进程初始化：限制计算线程数并创建本进程的GPT-SoVITS服务"""
+    global _worker_service
+
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    from app.services.gpt_sovits_service import GPTSoVITSService
+    from app.services.log_service import setup_logging
+
+    _worker_service = GPTSoVITSService(config_path)
+    setup_logging(_worker_service.config.get("logging", {}))
+    # 并行度由渲染进程提供，不再嵌套多进程推理池
+    _worker_service.inference_processes = 0
+    logger.info(f"✅ 渲染进程已就绪: pid={os.getpid()}, torch线程数={torch_threads}")
+
+
+def _render_item(item: Dict[str, str], audio_dir: str) -> Dict[str, Any]:
+    """在渲染进程中合成一条语料并写入音频文件，返回清单记录"""
+    record: Dict[str, Any] = {"id": item["id"], "page": item["page"], "chars": len(item["text"])}
+    start = time.perf_counter()
+    try:
+        voice = _worker_service._resolve_voice(item["page"])
+        if voice is None:
+            raise RuntimeError(f"页面语音配置无效: {item['page']}")
+        gpt_path, sovits_path, voice_params = voice
+
+        result = _worker_service._synthesize_pcm_sync(item["text"], gpt_path, sovits_path, voice_params)
+        if result is None:
+            raise RuntimeError("语音合成失败")
+        sr, audio_data = result
+
+        file_name = audio_filename(item["id"])
+        path = os.path.join(audio_dir, file_name)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            # 文件头与PCM分块直接写入文件，不在内存中拼出整个WAV
+            for chunk in iter_wav_chunks(audio_data, sr, streaming=False):
+                f.write(chunk)
+        os.replace(temp_path, path)
+
+        elapsed = time.perf_counter() - start
+        duration = len(audio_data) / sr
+        record.update({
+            "status": "ok",
+            "file": f"audio/{file_name}",
+            "sample_rate": sr,
+            "duration_seconds": round(duration, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "rtf": round(elapsed / duration, 4) if duration else None,
+        })
+    except Exception as e:
+        record.update({
+            "status": "failed",
+            "error": str(e),
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+        })
+    return record
+
+
+class CorpusRenderer:
+    """多进程语料渲染"""
+
+    def __init__(
+        self,
+        output_dir: str,
+        config_path: str = "./config.json",
+        processes: Optional[int] = None,
+        torch_threads: Optional[int] = None
+    ):
+        cpu_count = os.cpu_count() or 1
+        self.output_dir = output_dir
+        self.audio_dir = os.path.join(output_dir, "audio")
+        self.checkpoint_path = os.path.join(output_dir, "manifest.jsonl")
+        self.config_path = os.path.abspath(config_path)
+        self.processes = max(1, int(processes or max(1, cpu_count // 4)))
+        self.torch_threads = torch_threads or max(1, cpu_count // self.processes)
+
+    def load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        """读取检查点中已完成的条目（以最后一条记录为准，忽略中断时写了一半的行）"""
+        records: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.checkpoint_path):
+            return records
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["id"]] = record
+        return records
+
+    def render(self, items: List[Dict[str, str]], retry_failed: bool = False) -> Dict[str, Any]:
+        """
+        渲染语料
+
+        Args:
+            items: read_corpus() 读取的语料
+            retry_failed: 是否重新渲染检查点中失败的条目
+
+        Returns:
+            汇总信息
+        """
+        os.makedirs(self.audio_dir, exist_ok=True)
+        records = self.load_checkpoint()
+        done: Set[str] = {
+            item_id for item_id, record in records.items()
+            if record.get("status") == "ok" or (record.get("status") == "failed" and not retry_failed)
+        }
+
+        # 按页面排序，使每个进程尽量连续使用同一语音，减少权重切换
+        todo = sorted((item for item in items if item["id"] not in done), key=lambda item: item["page"])
+        logger.info(
+            f"📚 语料共 {len(items)} 条，已完成 {len(items) - len(todo)} 条，"
+            f"待渲染 {len(todo)} 条（{self.processes} 个进程 × {self.torch_threads} 个torch线程）"
+        )
+
+        start = time.perf_counter()
+        if todo:
+            self._render_pending(todo, records)
+        elapsed = time.perf_counter() - start
+
+        return self._write_manifest(items, records, elapsed)
+
+    def _render_pending(self, todo: List[Dict[str, str]], records: Dict[str, Dict[str, Any]]):
+        executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.config_path, self.torch_threads)
+        )
+        # 限制同时提交的任务数，避免大语料一次性进入进程间队列
+        max_in_flight = self.processes * 2
+        pending = set()
+        queue = iter(todo)
+        completed = 0
+
+        try:
+            with open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint:
+                while True:
+                    for item in queue:
+                        pending.add(executor.submit(_render_item, item, self.audio_dir))
+                        if len(pending) >= max_in_flight:
+                            break
+                    if not pending:
+                        break
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record = future.result()
+                        records[record["id"]] = record
+                        checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        checkpoint.flush()
+                        completed += 1
+
+                        if record["status"] == "ok":
+                            logger.info(
+                                f"✅ [{completed}/{len(todo)}] {record['id']}: "
+                                f"{record['duration_seconds']}s 音频, 耗时 {record['elapsed_seconds']}s"
+                            )
+                        else:
+                            logger.error(f"❌ [{completed}/{len(todo)}] {record['id']}: {record['error']}")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _write_manifest(
+        self,
+        items: List[Dict[str, str]],
+        records: Dict[str, Dict[str, Any]],
+        elapsed: float
+    ) -> Dict[str, Any]:
+        """按语料原顺序写出汇总清单"""
+        entries = [records[item["id"]] for item in items if item["id"] in records]
+        succeeded = [entry for entry in entries if entry.get("status") == "ok"]
+        audio_seconds = sum(entry["duration_seconds"] for entry in succeeded)
+        compute_seconds = sum(entry["elapsed_seconds"] for entry in succeeded)
+
+        summary = {
+            "total": len(items),
+            "succeeded": len(succeeded),
+            "failed": sum(1 for entry in entries if entry.get("status") == "failed"),
+            "audio_seconds": round(audio_seconds, 3),
+            "wall_seconds": round(elapsed, 3),
+            "mean_rtf": round(compute_seconds / audio_seconds, 4) if audio_seconds else None,
+            "processes": self.processes,
+            "torch_threads": self.torch_threads,
+        }
+        with open(os.path.join(self.output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "items": entries}, f, ensure_ascii=False, indent=2)
+        return summary
+
+
+def main():
+    """离线渲染语料"""
+    parser = argparse.ArgumentParser(description="多进程离线渲染GPT-SoVITS语料")
+    parser.add_argument("corpus", help="语料文件（.csv 或 .jsonl），包含id、page、text")
+    parser.add_argument("--output", required=True, help="输出目录")
+    parser.add_argument("--processes", type=int, help="渲染进程数，默认为CPU核数的1/4")
+    parser.add_argument("--threads", type=int, help="每个进程的torch线程数，默认平分CPU核数")
+    parser.add_argument("--retry-failed", action="store_true", help="重新渲染检查点中失败的条目")
+    parser.add_argument("--config", default="./config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    from app.services.log_service import setup_logging, shutdown_logging
+    setup_logging({"json": False})
+
+    try:
+        items = read_corpus(args.corpus)
+        renderer = CorpusRenderer(args.output, args.config, processes=args.processes, torch_threads=args.threads)
+        summary = renderer.render(items, retry_failed=args.retry_failed)
+        logger.info(f"📚 渲染完成: {json.dumps(summary, ensure_ascii=False)}")
+    except KeyboardInterrupt:
+        logger.info("🛑 渲染已中断，重新执行相同命令即可从检查点继续")
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+T2S解码看门狗
+GPT阶段偶尔不输出EOS，持续生成重复的语义token直到硬上限，单个请求就会长时间占用推理线程。
+看门狗在T2S模型上注册解码步钩子，逐步检查每条序列：
+    长度上限   语义token数超过片段字数×max_tokens_per_char
+    重复检测   token流末尾出现同一n-gram的连续重复（覆盖至少min_repeat_tokens个token）
+触发后在下一步强制该序列输出EOS（截断）；由调用方决定是否换一个随机种子重试一次。
+触发次数按语音记录
+
+钩子说明：
+    ar_audio_embedding 前置钩子  解码步的输入即上一步采样出的token（预填充时为参考音频的语义token）
+    ar_predict_layer   后置钩子  每步的logits，在此强制EOS；批量推理时已结束的序列会被移出批次，
+                                 按logits的argmax与top-k候选推断移出的是哪些序列
+"""
+
+import logging
+import math
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+import torch
+
+from app.services.segment_planner import segment_length
+
+logger = logging.getLogger(__name__)
+
+TRIP_LENGTH = "length"
+TRIP_REPETITION = "repetition"
+
+
+class _DecodeSession:
+    """一个批次的解码状态"""
+
+    def __init__(self, guard: "DecodeGuard", texts: List[str]):
+        self.guard = guard
+        self.texts = texts
+        self.caps = [guard.token_cap(text) for text in texts]
+        # 当前批次中各位置对应的原始序列；None表示尚未开始解码
+        self.alive: Optional[List[int]] = None
+        self.histories: Dict[int, List[int]] = {}
+        self.pending_stop: Set[int] = set()
+        self.trips: Dict[int, str] = {}
+        self.aligned = True
+        # 无法对齐序列时退化为按解码步数截断整个批次
+        self.steps = 0
+        self.force_all = False
+        self._next_row = 0
+        # 上一步logits推断的信息：argmax为EOS的位置、各位置可能采样到的token
+        self._argmax_eos: Set[int] = set()
+        self._candidates: Optional[List[Set[int]]] = None
+
+    def on_tokens(self, token_ids: torch.Tensor):
+        """ar_audio_embedding的输入"""
+        if token_ids.dim() != 2:
+            return
+        batch, length = token_ids.shape
+
+        if length > 1:
+            # 预填充：批量推理时一次开始所有序列，逐条推理时每次开始一条
+            if batch == 1 and len(self.texts) > 1:
+                self.alive = [self._next_row]
+                self.steps = 0
+            else:
+                self.alive = list(range(batch))
+                if batch != len(self.texts):
+                    self.aligned = False
+            self._next_row = self.alive[-1] + 1
+            return
+
+        tokens = token_ids[:, 0].tolist()
+        self.steps += 1
+        if self.alive is None:
+            self.alive = list(range(batch))
+            self._next_row = batch
+        elif self.aligned and len(tokens) != len(self.alive):
+            self._align(tokens)
+        if not self.aligned:
+            self.alive = [None] * len(tokens)
+            if self.steps >= max(self.caps) and not self.force_all:
+                self.force_all = True
+                self.trips[-1] = TRIP_LENGTH
+            return
+
+        for row, token in zip(self.alive, tokens):
+            history = self.histories.setdefault(row, [])
+            history.append(token)
+            if row in self.trips:
+                continue
+            trip = self.guard.check(history, self.caps[row] if row < len(self.caps) else max(self.caps))
+            if trip:
+                self.trips[row] = trip
+                self.pending_stop.add(row)
+
+    def _align(self, tokens: List[int]):
+        """批次缩小后推断哪些序列被移出（已结束的序列按原顺序移出）"""
+        survivors = [row for position, row in enumerate(self.alive) if position not in self._argmax_eos]
+        if len(survivors) == len(tokens):
+            self.alive = survivors
+            return
+
+        # 有序列按非argmax的采样结果输出了EOS：按top-k候选做保序匹配
+        if self._candidates is None:
+            self.aligned = False
+            return
+        matched = []
+        position = 0
+        for index, token in enumerate(tokens):
+            remaining = len(tokens) - index
+            while position <= len(self.alive) - remaining and token not in self._candidates[position]:
+                position += 1
+            if position > len(self.alive) - remaining:
+                self.aligned = False
+                return
+            matched.append(self.alive[position])
+            position += 1
+        self.alive = matched
+
+    def on_logits(self, module, logits: torch.Tensor) -> Optional[torch.Tensor]:
+        """ar_predict_layer的输出"""
+        if self.alive is None or logits.dim() != 2 or logits.shape[0] != len(self.alive):
+            return None
+
+        eos = module._eos_token
+        forced = None
+        if self.force_all:
+            forced = torch.full_like(logits, -1e4)
+            forced[:, eos] = 1e4
+        elif self.pending_stop:
+            stop_positions = [i for i, row in enumerate(self.alive) if row in self.pending_stop]
+            if stop_positions:
+                forced = logits.clone()
+                forced[stop_positions] = -1e4
+                forced[stop_positions, eos] = 1e4
+                self.pending_stop.difference_update(self.alive[i] for i in stop_positions)
+        output = logits if forced is None else forced
+
+        if len(self.alive) > 1:
+            self._argmax_eos = set(torch.nonzero(output.argmax(dim=-1) == eos).flatten().tolist())
+            k = min(self.guard.candidate_k, output.shape[-1])
+            self._candidates = [set(row) for row in output.topk(k, dim=-1).indices.tolist()]
+        else:
+            self._argmax_eos = set()
+            self._candidates = None
+        return forced
+
+
+class DecodeGuard:
+    """T2S解码看门狗"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_tokens_per_char: float = 12.0,
+        min_token_cap: int = 75,
+        max_ngram: int = 16,
+        min_repeat_tokens: int = 50,
+        min_repeats: int = 3,
+        retry: bool = True,
+        candidate_k: int = 64
+    ):
+        """
+        Args:
+            max_tokens_per_char: 每个字允许的语义token数（25Hz下约0.5秒/字）
+            min_token_cap: 短片段的最低token上限
+            max_ngram: 检测的最长重复单元
+            min_repeat_tokens: 重复段至少覆盖的token数（避免把停顿误判为循环）
+            min_repeats: 重复单元至少连续出现的次数
+            retry: 触发后是否换随机种子重试一次
+            candidate_k: 批次缩小时用于匹配序列的top-k候选数
+        """
+        self.enabled = enabled
+        self.max_tokens_per_char = max_tokens_per_char
+        self.min_token_cap = int(min_token_cap)
+        self.max_ngram = int(max_ngram)
+        self.min_repeat_tokens = int(min_repeat_tokens)
+        self.min_repeats = int(min_repeats)
+        self.retry = retry
+        self.candidate_k = int(candidate_k)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._trips: Dict[str, Counter] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DecodeGuard":
+        """从config.json中的decode_guard配置创建"""
+        return cls(
+            enabled=config.get("enabled", True),
+            max_tokens_per_char=config.get("max_tokens_per_char", 12.0),
+            min_token_cap=config.get("min_token_cap", 75),
+            max_ngram=config.get("max_ngram", 16),
+            min_repeat_tokens=config.get("min_repeat_tokens", 50),
+            min_repeats=config.get("min_repeats", 3),
+            retry=config.get("retry", True)
+        )
+
+    def token_cap(self, text: str) -> int:
+        return max(self.min_token_cap, math.ceil(segment_length(text) * self.max_tokens_per_char))
+
+    def check(self, history: List[int], cap: int) -> Optional[str]:
+        """检查一条序列，返回触发原因"""
+        if len(history) >= cap:
+            return TRIP_LENGTH
+        for size in range(1, self.max_ngram + 1):
+            repeats = max(self.min_repeats, math.ceil(self.min_repeat_tokens / size))
+            span = size * repeats
+            if len(history) < span:
+                continue
+            unit = history[-size:]
+            if history[-span:] == unit * repeats:
+                return TRIP_REPETITION
+        return None
+
+    def install(self, t2s_model):
+        """在T2S模型上注册钩子（每个模型只注册一次）"""
+        model = t2s_model.model
+        if getattr(model, "_decode_guard_installed", False):
+            return
+        model.ar_predict_layer._eos_token = model.EOS
+        model.ar_audio_embedding.register_forward_pre_hook(self._embedding_hook)
+        model.ar_predict_layer.register_forward_hook(self._logits_hook)
+        model._decode_guard_installed = True
+
+    def begin(self, texts: List[str]):
+        """开始监视一个批次的解码（与管道在同一线程调用）"""
+        self._local.session = _DecodeSession(self, texts) if self.enabled else None
+
+    def end(self) -> Dict[int, str]:
+        """结束监视，返回触发看门狗的序列及原因"""
+        session = getattr(self._local, "session", None)
+        self._local.session = None
+        if session is None:
+            return {}
+        if not session.aligned:
+            logger.debug("解码看门狗无法对齐批次序列，本批次只做了部分检查")
+        return session.trips
+
+    def record(self, voice_key: str, trips: Dict[int, str], retried: bool, retry_trips: Optional[Dict[int, str]] = None):
+        """
+        按语音记录触发次数
+
+        重试的触发同样计入各原因的次数；重试后仍触发（保留截断结果）的次数记为retry_failures
+        """
+        if not trips:
+            return
+        with self._lock:
+            counter = self._trips.setdefault(voice_key, Counter())
+            counter.update(trips.values())
+            if retried:
+                counter["retries"] += 1
+            if retry_trips:
+                counter.update(retry_trips.values())
+                counter["retry_failures"] += 1
+
+    def _embedding_hook(self, module, inputs):
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            session.on_tokens(inputs[0])
+        return None
+
+    def _logits_hook(self, module, inputs, logits):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            return None
+        return session.on_logits(module, logits)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "trips": {voice_key: dict(counter) for voice_key, counter in self._trips.items()},
+            }
@@ -3,21 +3,100 @@ DeepSeek AI服务
 处理与DeepSeek API的对话交互
 """
 
+import asyncio
 import json
 import logging
+import random
+import time
 import aiohttp
+from collections import Counter, deque
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 对话失败时的兜底回复（同时作为预渲染短语库的通用短语）
+FALLBACK_REPLY = "抱歉，我现在有点小问题，请稍后再试试吧"
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class _RetryableError(Exception):
+    """可重试的请求失败"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class DeepSeekService:
     """DeepSeek AI对话服务"""
 
-    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.deepseek.com/v1",
+        timeout_seconds: float = 30.0,
+        connect_timeout_seconds: float = 5.0,
+        max_attempts: int = 3,
+        retry_statuses: Optional[List[int]] = None,
+        backoff_base_ms: float = 250.0,
+        backoff_max_ms: float = 4000.0,
+        hedge_enabled: bool = True,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay_ms: float = 500.0,
+        latency_window: int = 200
+    ):
+        """
+        Args:
+            timeout_seconds: 单次请求的超时时间（不超过本次对话剩余的时间预算）
+            connect_timeout_seconds: 建立连接的超时时间
+            max_attempts: 最多请求次数（含首次），仅对超时、连接错误和可重试状态码重试
+            retry_statuses: 可重试的HTTP状态码
+            backoff_base_ms / backoff_max_ms: 指数退避的基数与上限，实际等待时间在[0, 退避值]内随机（full jitter）
+            hedge_enabled: 请求耗时超过历史延迟的hedge_percentile分位数时，再发一个相同请求，取先返回的结果
+            hedge_min_samples: 启用对冲请求所需的最少延迟样本数
+            hedge_min_delay_ms: 对冲请求的最短等待时间
+            latency_window: 保留的最近成功请求延迟样本数
+        """
         self.api_key = api_key
-        self.base_url = base_url
-        self.timeout = aiohttp.ClientTimeout(total=30)
+        self.base_url = base_url.rstrip("/")
+        self.timeout_seconds = timeout_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_statuses = set(retry_statuses or RETRYABLE_STATUSES)
+        self.backoff_base = backoff_base_ms / 1000
+        self.backoff_max = backoff_max_ms / 1000
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = int(hedge_min_samples)
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+
+        self._latencies: deque = deque(maxlen=int(latency_window))
+        self.counters: Counter = Counter()
+
+    @classmethod
+    def from_config(cls, api_key: str, config: Dict[str, Any]) -> "DeepSeekService":
+        """从config.json中的deepseek配置创建（DEEPSEEK_BASE_URL环境变量优先，便于指向本地桩服务）"""
+        import os
+
+        hedge_config = config.get("hedge", {})
+        return cls(
+            api_key,
+            base_url=os.getenv("DEEPSEEK_BASE_URL") or config.get("base_url", "https://api.deepseek.com/v1"),
+            timeout_seconds=config.get("timeout_seconds", 30.0),
+            connect_timeout_seconds=config.get("connect_timeout_seconds", 5.0),
+            max_attempts=config.get("max_attempts", 3),
+            retry_statuses=config.get("retry_statuses"),
+            backoff_base_ms=config.get("backoff_base_ms", 250.0),
+            backoff_max_ms=config.get("backoff_max_ms", 4000.0),
+            hedge_enabled=hedge_config.get("enabled", True),
+            hedge_percentile=hedge_config.get("percentile", 0.95),
+            hedge_min_samples=hedge_config.get("min_samples", 20),
+            hedge_min_delay_ms=hedge_config.get("min_delay_ms", 500.0)
+        )
 
     async def chat_completion(
         self,
@@ -25,75 +104,193 @@ class DeepSeekService:
         model: str = "deepseek-chat",
         temperature: float = 0.8,
         max_tokens: int = 1000,
+        budget_seconds: Optional[float] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
         调用DeepSeek API进行对话
 
+        超时、连接错误和可重试状态码按带随机抖动的指数退避重试；
+        单次请求耗时超过历史p95延迟时发出对冲请求，取先成功的结果。
+        所有请求、重试与退避共享budget_seconds时间预算
+
         Args:
             messages: 消息列表
             model: 模型名称
             temperature: 温度参数
             max_tokens: 最大token数
+            budget_seconds: 本次调用的总时间预算，None表示只受单次请求超时限制
             **kwargs: 其他参数
 
         Returns:
             API响应结果
         """
-        try:
-            url = f"{self.base_url}/chat/completions"
+        url = f"{self.base_url}/chat/completions"
 
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
 
-            payload = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                **kwargs
-            }
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **kwargs
+        }
+
+        logger.info(f"🤖 发送DeepSeek请求: {len(messages)} 条消息")
 
-            logger.info(f"🤖 发送DeepSeek请求: {len(messages)} 条消息")
+        start = time.monotonic()
+        deadline = start + budget_seconds if budget_seconds else None
+        self.counters["requests"] += 1
+        error = "未知错误"
+        attempt = 0
 
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
+        try:
+            async with aiohttp.ClientSession() as session:
+                while True:
+                    attempt += 1
+                    try:
+                        result = await self._hedged_post(session, url, headers, payload, deadline)
                         content = result["choices"][0]["message"]["content"]
 
-                        logger.info(f"✅ DeepSeek响应成功: {len(content)} 字符")
+                        logger.info(f"✅ DeepSeek响应成功: {len(content)} 字符, 第 {attempt} 次请求")
                         return {
                             "success": True,
                             "response": content,
                             "usage": result.get("usage", {}),
+                            "attempts": attempt,
+                            "elapsed_seconds": round(time.monotonic() - start, 3),
                             "timestamp": datetime.now().isoformat()
                         }
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ DeepSeek API错误: {response.status} - {error_text}")
-                        return {
-                            "success": False,
-                            "error": f"API请求失败: {response.status}",
-                            "timestamp": datetime.now().isoformat()
-                        }
-
+                    except _RetryableError as e:
+                        error = str(e)
+                        delay = self._backoff(attempt, e.retry_after)
+                        remaining = deadline - time.monotonic() if deadline else None
+                        if attempt >= self.max_attempts or (remaining is not None and remaining <= delay):
+                            break
+                        logger.warning(f"⚠️ DeepSeek请求失败（{error}），{delay:.2f}s 后重试")
+                        self.counters["retries"] += 1
+                        await asyncio.sleep(delay)
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"❌ DeepSeek服务异常: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            }
+            error = str(e)
+
+        self.counters["failures"] += 1
+        logger.error(f"❌ DeepSeek服务异常: {error}（共请求 {attempt} 次）")
+        return {
+            "success": False,
+            "error": error,
+            "attempts": attempt,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def _hedged_post(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        deadline: Optional[float]
+    ) -> Dict[str, Any]:
+        """发出一次请求，超过对冲延迟仍未返回时再发一个相同请求，返回先成功的结果"""
+        primary = asyncio.create_task(self._post(session, url, headers, payload, deadline))
+        tasks = {primary}
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done and (deadline is None or time.monotonic() < deadline):
+                    logger.info(f"🔀 DeepSeek请求超过 {hedge_delay:.2f}s 未返回，发出对冲请求")
+                    self.counters["hedges"] += 1
+                    tasks.add(asyncio.create_task(self._post(session, url, headers, payload, deadline)))
+
+            error: Optional[BaseException] = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _post(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        deadline: Optional[float]
+    ) -> Dict[str, Any]:
+        """单次请求；超时、连接错误和可重试状态码抛出_RetryableError"""
+        total = self.timeout_seconds
+        if deadline is not None:
+            total = min(total, deadline - time.monotonic())
+            if total <= 0:
+                raise RuntimeError("时间预算已用完")
+        timeout = aiohttp.ClientTimeout(total=total, connect=self.connect_timeout_seconds)
+
+        start = time.monotonic()
+        try:
+            async with session.post(url, headers=headers, json=payload, timeout=timeout) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    self._latencies.append(time.monotonic() - start)
+                    return result
+
+                error_text = await response.text()
+                logger.error(f"❌ DeepSeek API错误: {response.status} - {error_text[:200]}")
+                if response.status in self.retry_statuses:
+                    retry_after = response.headers.get("Retry-After", "")
+                    raise _RetryableError(
+                        f"API请求失败: {response.status}",
+                        retry_after=float(retry_after) if retry_after.isdigit() else None
+                    )
+                raise RuntimeError(f"API请求失败: {response.status}")
+        except asyncio.TimeoutError:
+            raise _RetryableError(f"请求超时（{total:.1f}s）")
+        except aiohttp.ClientConnectionError as e:
+            raise _RetryableError(f"连接失败: {e}")
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲请求的等待时间：最近成功请求延迟的分位数；样本不足或未启用时返回None"""
+        if not self.hedge_enabled or len(self._latencies) < self.hedge_min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile))
+        return max(self.hedge_min_delay, latencies[index])
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第attempt次失败后的退避时间（full jitter），服务端给出Retry-After时以其为准"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def stats(self) -> Dict[str, Any]:
+        hedge_delay = self.hedge_delay()
+        return {
+            **self.counters,
+            "latency_samples": len(self._latencies),
+            "hedge_delay_ms": round(hedge_delay * 1000) if hedge_delay is not None else None,
+        }
 
     async def generate_fujian_response(
         self,
         user_message: str,
         context: Optional[List[Dict]] = None,
         personality: str = "",
-        page: str = "tts-chat"
+        page: str = "tts-chat",
+        budget_seconds: Optional[float] = None
     ) -> str:
         """
         生成福建文化相关的回复
@@ -103,6 +300,7 @@ class DeepSeekService:
             context: 对话上下文
             personality: 角色人设（如果未提供，将从config.json读取）
             page: 页面标识，用于读取对应配置
+            budget_seconds: DeepSeek调用（含重试）的总时间预算
 
         Returns:
             AI回复内容
@@ -163,18 +361,19 @@ class DeepSeekService:
             result = await self.chat_completion(
                 messages=messages,
                 temperature=0.8,
-                max_tokens=800
+                max_tokens=800,
+                budget_seconds=budget_seconds
             )
 
             if result["success"]:
                 return result["response"]
             else:
                 logger.error(f"生成回复失败: {result.get('error', '未知错误')}")
-                return "抱歉，我现在有点小问题，请稍后再试试吧"
+                return FALLBACK_REPLY
 
         except Exception as e:
             logger.error(f"生成福建文化回复异常: {e}")
-            return "抱歉，我现在有点小问题，请稍后再试试吧"
+            return FALLBACK_REPLY
 
     async def health_check(self) -> Dict[str, Any]:
         """健康检查"""
@@ -194,6 +393,7 @@ class DeepSeekService:
                 "status": "healthy" if result["success"] else "unhealthy",
                 "api_key_configured": bool(self.api_key),
                 "base_url": self.base_url,
+                "calls": self.stats(),
                 "last_check": datetime.now().isoformat()
             }
 
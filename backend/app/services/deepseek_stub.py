@@ -0,0 +1,175 @@
+"""
+DeepSeek API本地桩服务
+模拟 /v1/chat/completions 接口，可注入延迟、长尾延迟和故障，
+用于在本地验证重试、退避、对冲请求和时间预算的行为。
+
+用法（在backend目录下执行）:
+    python -m app.services.deepseek_stub --port 8099 --latency-ms 300 --tail-rate 0.1 --tail-ms 5000 --fault-rate 0.2
+
+    # 另一个终端中让后端指向桩服务
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8099/v1 DEEPSEEK_API_KEY=stub python main.py
+
+    # 或直接对桩服务发起一批请求，输出成功率与延迟分布
+    python -m app.services.deepseek_stub --port 8099 --fault-rate 0.2 --probe 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+STUB_REPLY = "福州有三坊七巷，是闽都文化的缩影。"
+
+
+class DeepSeekStub:
+    """可注入延迟与故障的DeepSeek桩服务"""
+
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        jitter_ms: float = 50.0,
+        tail_rate: float = 0.0,
+        tail_ms: float = 5000.0,
+        fault_rate: float = 0.0,
+        fault_status: int = 503,
+        retry_after: int = 0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            latency_ms / jitter_ms: 正常响应的延迟与随机抖动
+            tail_rate / tail_ms: 长尾请求的比例与延迟（用于触发对冲请求）
+            fault_rate / fault_status: 返回错误状态码的比例与状态码
+            retry_after: 错误响应附带的Retry-After秒数，0表示不附带
+        """
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.tail_rate = tail_rate
+        self.tail = tail_ms / 1000
+        self.fault_rate = fault_rate
+        self.fault_status = fault_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.counters: Counter = Counter()
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.counters["requests"] += 1
+
+        if self.random.random() < self.fault_rate:
+            self.counters["faults"] += 1
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after else {}
+            return web.json_response({"error": {"message": "injected fault"}}, status=self.fault_status, headers=headers)
+
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if self.random.random() < self.tail_rate:
+            self.counters["tail"] += 1
+            delay = self.tail
+        await asyncio.sleep(delay)
+
+        content = STUB_REPLY[:max(1, int(payload.get("max_tokens", 800)))]
+        return web.json_response({
+            "id": f"stub-{self.counters['requests']}",
+            "object": "chat.completion",
+            "model": payload.get("model", "deepseek-chat"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content), "total_tokens": len(content)},
+        })
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.counters))
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+async def _probe(base_url: str, count: int, config_path: str):
+    """用DeepSeekService对桩服务依次发起请求，统计成功率、请求次数和延迟"""
+    from app.services.deepseek_service import DeepSeekService
+
+    with open(config_path, "r", encoding="utf-8") as f:
+        deepseek_config = json.load(f).get("deepseek", {})
+    service = DeepSeekService.from_config("stub", {**deepseek_config, "base_url": base_url})
+
+    latencies = []
+    succeeded = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        result = await service.chat_completion([{"role": "user", "content": "你好"}], max_tokens=20)
+        latencies.append(time.perf_counter() - start)
+        succeeded += result["success"]
+
+    latencies.sort()
+    logger.info(
+        f"📊 成功 {succeeded}/{count}, p50={latencies[len(latencies) // 2] * 1000:.0f}ms, "
+        f"p95={latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:.0f}ms, "
+        f"max={latencies[-1] * 1000:.0f}ms, {json.dumps(service.stats(), ensure_ascii=False)}"
+    )
+
+
+async def _serve(stub: DeepSeekStub, host: str, port: int, probe: int, config_path: str):
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"🧪 DeepSeek桩服务已启动: http://{host}:{port}/v1")
+    try:
+        if probe:
+            await _probe(f"http://{host}:{port}/v1", probe, config_path)
+            logger.info(f"🧪 桩服务统计: {dict(stub.counters)}")
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    """启动DeepSeek桩服务"""
+    parser = argparse.ArgumentParser(description="可注入延迟与故障的DeepSeek API桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="正常响应延迟")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="延迟的随机抖动")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="长尾请求比例")
+    parser.add_argument("--tail-ms", type=float, default=5000.0, help="长尾请求延迟")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="返回错误状态码的比例")
+    parser.add_argument("--fault-status", type=int, default=503, help="注入的错误状态码")
+    parser.add_argument("--retry-after", type=int, default=0, help="错误响应的Retry-After秒数")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    parser.add_argument("--probe", type=int, default=0, help="发起指定次数的请求后退出，输出统计")
+    parser.add_argument("--config", default="./config.json", help="配置文件路径（读取deepseek配置）")
+    args = parser.parse_args()
+
+    from app.services.log_service import setup_logging, shutdown_logging
+    setup_logging({"json": False})
+
+    stub = DeepSeekStub(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        fault_rate=args.fault_rate,
+        fault_status=args.fault_status,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    try:
+        asyncio.run(_serve(stub, args.host, args.port, args.probe, args.config))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,13 +9,18 @@ import logging
 import os
 import sys
 import asyncio
-import gc
+import contextvars
+import hashlib
+import inspect
 import math
 import random
 import time
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
-from typing import Dict, List, Optional, Any, Tuple, Union, Generator
+from functools import partial
+from typing import Callable, Dict, List, Optional, Any, Tuple, Union, Generator
 
 import torch
 import torch.nn.functional as F
@@ -28,20 +33,36 @@ import soundfile as sf
 import yaml
 from transformers import AutoModelForMaskedLM, AutoTokenizer
 
+from app.services.audio_output import float_to_int16, pcm_to_wav
+from app.services.decode_guard import DecodeGuard
+from app.services.log_service import preview_text, stage_timer
+from app.services.memory_manager import memory_manager, tensor_bytes
+from app.services.phrase_bank import PhraseBank
+from app.services.profiler_service import ProfilerService
+from app.services.prompt_state import PromptStateCache
+from app.services.segment_planner import BucketResult, SegmentBucket, SegmentPlan, SegmentPlanner
+from app.services.semantic_cache import SemanticTokenCache
+from app.services.static_kv_cache import StaticKVCache
+from app.services.synthesis_profiles import SynthesisProfiles
+from app.services.text_feature_cache import TextFeatureCache
+from app.services.text_normalizer import TextNormalizer
+from app.services.voice_weights import VoiceWeightSwitcher
+
 # GPT_SoVITS 动态导入模块
 # 不使用直接导入，改为运行时动态导入
 
 logger = logging.getLogger(__name__)
 
-# 音频重采样缓存
-resample_transform_dict = {}
-
 def resample(audio_tensor, sr0, sr1, device):
-    global resample_transform_dict
-    key = "%s-%s-%s" % (sr0, sr1, str(device))
-    if key not in resample_transform_dict:
-        resample_transform_dict[key] = torchaudio.transforms.Resample(sr0, sr1).to(device)
-    return resample_transform_dict[key](audio_tensor)
+    # 重采样变换由内存管理器缓存，数量受resample_cache_entries限制
+    key = "resample:%s-%s-%s" % (sr0, sr1, str(device))
+    transform = memory_manager.get_or_create(
+        key,
+        lambda: torchaudio.transforms.Resample(sr0, sr1).to(device),
+        cost=lambda: tensor_bytes(memory_manager.get(key)),
+        group_limit=memory_manager.resample_cache_entries
+    )
+    return transform(audio_tensor)
 
 # 语言设置
 language = os.environ.get("language", "Auto")
@@ -148,6 +169,13 @@ class DictToAttrRecursive(dict):
 class NO_PROMPT_ERROR(Exception):
     pass
 
+class SynthesisCancelled(Exception):
+    """合成任务在片段之间被取消"""
+    pass
+
+# 进度回调: (已完成片段数, 片段总数)
+ProgressCallback = Callable[[int, int], None]
+
 class GPTSoVITSService:
     """GPT-SoVITS推理服务"""
 
@@ -163,6 +191,9 @@ class GPTSoVITSService:
         self.config = self._load_config()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
+        # 内存预算（常驻模型、缓存和变换对象统一管理）
+        memory_manager.configure(self.config.get("memory", {}))
+
         # 计算GPT_SoVITS路径
         current_dir = os.path.dirname(os.path.abspath(__file__))
         self.project_root = os.path.abspath(os.path.join(current_dir, "../../.."))
@@ -181,6 +212,80 @@ class GPTSoVITSService:
         # 动态导入的模块缓存
         self._modules_cache = {}
 
+        # 文本前端特征缓存（音素ID + BERT特征）
+        self.text_feature_cache = self._create_text_feature_cache()
+        if self.text_feature_cache is not None:
+            memory_manager.register(
+                "text_feature_cache",
+                self.text_feature_cache,
+                cost=self.text_feature_cache.memory_bytes,
+                on_evict=lambda cache: cache.clear(),
+                retain=True
+            )
+
+        # T2S语义token缓存：重新渲染（如调整语速）时跳过自回归解码，只执行VITS解码
+        self.semantic_cache = self._create_semantic_cache()
+        if self.semantic_cache is not None:
+            memory_manager.register(
+                "semantic_cache",
+                self.semantic_cache,
+                cost=self.semantic_cache.memory_bytes,
+                on_evict=lambda cache: cache.clear(),
+                retain=True
+            )
+
+        # 文本规范化（去除标记与表情、展开数字读法、折叠标点），在片段规划之前执行
+        self.text_normalizer = TextNormalizer.from_config(self.config.get("text_normalizer", {}))
+
+        # 片段规划器（合并短片段、拆分长片段、按长度分桶组批）
+        self.segment_planner = SegmentPlanner.from_config(self.config.get("segment_planner", {}))
+
+        # 合成档位（采样参数、批大小、片段长度等按档位打包，按请求或页面选择）
+        self.synthesis_profiles = SynthesisProfiles.from_config(self.config)
+
+        # 推理工作线程：阻塞的推理计算不在事件循环中执行
+        inference_config = self.config.get("inference", {})
+        self.inference_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(inference_config.get("workers", 1))),
+            thread_name_prefix="gpt-sovits-infer"
+        )
+
+        # 多进程推理池：长文本的批次分发到多个进程并行合成（延迟创建）
+        self.inference_processes = int(inference_config.get("processes", 0))
+        self.parallel_min_buckets = max(2, int(inference_config.get("parallel_min_buckets", 2)))
+        self._inference_pool = None
+
+        # 角色权重增量切换（最近使用的T2S/VITS权重常驻内存）
+        self.voice_switcher = VoiceWeightSwitcher(
+            self.config.get("voice_switching", {}).get("max_resident_voices", 3)
+        )
+
+        # 各语音的参考prompt状态常驻缓存（切换回来时跳过参考音频与参考文本的编码）
+        self.prompt_states = PromptStateCache.from_config(self.config.get("prompt_state", {}))
+
+        # 当前TTS管道对应的模型与参考prompt状态；同一管道不可并发使用
+        self._pipeline_weights: Optional[Tuple[str, str]] = None
+        self._pipeline_prompt_state: Optional[str] = None
+        self._pipeline_lock = threading.Lock()
+
+        # 当前批次的取消事件，由T2S解码步钩子读取；被中止的解码批次计数
+        self._decode_cancel_event: Optional[threading.Event] = None
+        self.decode_cancellations = 0
+        # 最近一次推理中批内各片段的采样点数、采样率与语速，用于按片段切分批次音频
+        self._fragment_samples: Optional[Tuple[List[int], int, float]] = None
+
+        # T2S解码看门狗（截断不输出EOS或陷入重复的序列）
+        self.decode_guard = DecodeGuard.from_config(self.config.get("decode_guard", {}))
+
+        # T2S解码的静态KV缓存（预分配缓冲区，避免每步拼接）
+        self.static_kv_cache = StaticKVCache.from_config(self.config.get("static_kv_cache", {}))
+
+        # 按需性能剖析（由管理接口开启）
+        self.profiler = ProfilerService.from_config(self, self.config.get("profiler", {}))
+
+        # 预渲染短语库（常用语句直接返回预先合成的音频）
+        self.phrase_bank = PhraseBank.from_config(self, self.config.get("phrase_bank", {}))
+
         # 设置模块路径
         self._setup_module_paths()
 
@@ -366,6 +471,44 @@ class GPTSoVITSService:
             logger.error(f"❌ TTS管道初始化失败: {e}")
             self.tts_pipeline = None
 
+    def _resolve_backend_path(self, path: str) -> str:
+        """将配置中的相对路径解析为相对backend目录的绝对路径"""
+        if os.path.isabs(path):
+            return path
+        return os.path.abspath(os.path.join(self.project_root, "backend", path))
+
+    def _create_text_feature_cache(self) -> Optional[TextFeatureCache]:
+        """根据配置创建文本特征缓存"""
+        cache_config = self.config.get("text_feature_cache", {})
+        if not cache_config.get("enabled", True):
+            logger.info("ℹ️ 文本特征缓存已禁用")
+            return None
+
+        cache_dir = cache_config.get("cache_dir")
+        if cache_dir:
+            cache_dir = self._resolve_backend_path(cache_dir)
+
+        return TextFeatureCache(
+            max_entries=cache_config.get("max_entries", 2048),
+            cache_dir=cache_dir
+        )
+
+    def _create_semantic_cache(self) -> Optional[SemanticTokenCache]:
+        """根据配置创建语义token缓存"""
+        cache_config = self.config.get("semantic_cache", {})
+        if not cache_config.get("enabled", True):
+            logger.info("ℹ️ 语义token缓存已禁用")
+            return None
+
+        cache_dir = cache_config.get("cache_dir")
+        if cache_dir:
+            cache_dir = self._resolve_backend_path(cache_dir)
+
+        return SemanticTokenCache(
+            max_entries=cache_config.get("max_entries", 4096),
+            cache_dir=cache_dir
+        )
+
     def _load_config(self) -> Dict:
         """加载配置文件"""
         try:
@@ -414,7 +557,7 @@ class GPTSoVITSService:
         except Exception as e:
             logger.error(f"❌ 读取config.json失败: {e}")
 
-        # 如果读取失败，返回基本的默认配置
+        # 如果读取失败，返回基本的默认配置；其他配置节的默认值由各组件的from_config提供
         logger.warning("⚠️ 使用基本默认配置")
         return {
             "pages": {},
@@ -441,7 +584,11 @@ class GPTSoVITSService:
     async def synthesize_speech(
         self,
         text: str,
-        page: str = "tts-chat"
+        page: str = "tts-chat",
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        use_phrase_bank: bool = True,
+        profile: Optional[str] = None
     ) -> bytes:
         """
         语音合成
@@ -449,137 +596,690 @@ class GPTSoVITSService:
         Args:
             text: 要合成的文本
             page: 页面标识，用于获取对应配置
+            progress_callback: 每完成一批片段后调用，参数为(已完成片段数, 片段总数)
+            cancel_event: 置位后在片段之间终止合成并抛出SynthesisCancelled
+            use_phrase_bank: 是否优先使用预渲染短语库
+            profile: 合成档位，默认使用页面配置的档位
 
         Returns:
             音频字节数据
         """
         try:
-            # 获取页面配置
-            page_config = self.config.get("pages", {}).get(page, {})
-            voice_config = page_config.get("voice_config", {})
+            if use_phrase_bank:
+                audio_data = self.phrase_bank.lookup(text, page)
+                if audio_data:
+                    return audio_data
 
-            if not voice_config:
-                logger.error(f"❌ 页面 '{page}' 的语音配置不存在")
+            voice = self._resolve_voice(page)
+            if voice is None:
                 return b""
-
-            # 获取模型路径
-            gpt_model = voice_config.get("gpt_model")
-            sovits_model = voice_config.get("sovits_model")
-
-            if not gpt_model or not sovits_model:
-                logger.error(f"❌ 页面 '{page}' 的模型配置不完整")
-                return b""
-
-            # 检查模型文件是否存在
-            gpt_path = os.path.join(self.gpt_weights_dir, gpt_model)
-            sovits_path = os.path.join(self.sovits_weights_dir, sovits_model)
-
-            if not os.path.exists(gpt_path) or not os.path.exists(sovits_path):
-                logger.error(f"❌ 模型文件不存在: GPT={gpt_path}, SoVITS={sovits_path}")
-                return b""
-
-            logger.info(f"🎵 开始合成语音: '{text}' (页面: {page})")
+            gpt_path, sovits_path, voice_params = voice
 
             # 调用真实的GPT-SoVITS推理
             audio_data = await self._run_inference(
-                text, gpt_path, sovits_path, voice_config.get("voice_params", {})
+                text, gpt_path, sovits_path, voice_params,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                profile=profile or self.get_page_profile(page)
             )
 
-            logger.info(f"✅ 语音合成完成，音频大小: {len(audio_data)} bytes")
+            logger.debug("✅ 语音合成完成，音频大小: %d bytes", len(audio_data))
             return audio_data
 
+        except SynthesisCancelled:
+            raise
         except Exception as e:
-            logger.error(f"❌ 语音合成失败: {e}")
+            logger.error("❌ 语音合成失败: %s", e)
             return b""
 
+    async def synthesize_batch(
+        self,
+        texts: List[str],
+        page: str = "tts-chat",
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> List[Union[bytes, memoryview]]:
+        """
+        批量语音合成
+
+        各条文本的片段一起规划、分桶，不同条目的片段可以共享同一个推理批次，合成后按条目切分音频
+
+        Args:
+            texts: 要合成的文本列表
+            page: 页面标识，用于获取对应配置
+            cancel_event: 置位后在批次之间终止合成并抛出SynthesisCancelled
+            profile: 合成档位，默认使用页面配置的档位
+
+        Returns:
+            与texts一一对应的WAV音频，失败或没有可合成内容的条目为空字节
+        """
+        audio_list: List[Union[bytes, memoryview]] = [b""] * len(texts)
+        pending = []
+        for position, text in enumerate(texts):
+            audio_data = self.phrase_bank.lookup(text, page)
+            if audio_data:
+                audio_list[position] = audio_data
+            else:
+                pending.append(position)
+        if not pending:
+            return audio_list
+
+        voice = self._resolve_voice(page)
+        if voice is None:
+            return audio_list
+        gpt_path, sovits_path, voice_params = voice
+
+        loop = asyncio.get_running_loop()
+        synthesized = await loop.run_in_executor(
+            self.inference_executor,
+            contextvars.copy_context().run,
+            partial(
+                self._synthesize_batch_sync,
+                [texts[position] for position in pending], gpt_path, sovits_path, voice_params,
+                cancel_event=cancel_event,
+                profile=profile or self.get_page_profile(page)
+            )
+        )
+        for position, audio_data in zip(pending, synthesized):
+            audio_list[position] = audio_data
+        return audio_list
+
+    def _synthesize_batch_sync(
+        self,
+        texts: List[str],
+        gpt_path: str,
+        sovits_path: str,
+        voice_params: Dict,
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> List[Union[bytes, memoryview]]:
+        """执行批量推理，按条目切分音频并分别封装为WAV"""
+        with self.profiler.profile_request("batch"):
+            synthesis_profile = self.synthesis_profiles.get(profile)
+            plan, spans = synthesis_profile.planner.plan_items(
+                [self.text_normalizer.normalize(text) for text in texts]
+            )
+            if not plan.buckets:
+                return [b""] * len(texts)
+
+            start = time.perf_counter()
+            results, parallel = self._synthesize_plan(
+                plan, gpt_path, sovits_path, voice_params,
+                cancel_event=cancel_event,
+                profile=synthesis_profile.name
+            )
+            sr = results[0].sr
+            for bucket, result in zip(plan.buckets, results):
+                self.segment_planner.record_bucket(bucket, result.elapsed, len(result.audio) / sr)
+            parts = plan.ordered_audio(results)
+
+            memory_manager.enforce(protect=(
+                "tts_pipeline", f"voice_t2s:{gpt_path}", f"voice_vits:{sovits_path}"
+            ))
+            logger.info(
+                "✅ 批量推理完成",
+                extra={
+                    "event": "batch_inference",
+                    "items": len(texts),
+                    "segments": len(plan.segments),
+                    "buckets": len(plan.buckets),
+                    "padding_ratio": round(plan.padding_ratio, 4),
+                    "parallel": parallel,
+                    "profile": synthesis_profile.name,
+                    "inference_ms": round((time.perf_counter() - start) * 1000, 1),
+                }
+            )
+            return [
+                pcm_to_wav(np.concatenate(parts[span.start:span.stop]), sr) if span else b""
+                for span in spans
+            ]
+
+    async def synthesize_pcm(
+        self,
+        text: str,
+        page: str = "tts-chat",
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        语音合成（返回原始PCM，用于流式输出）
+
+        Args:
+            text: 要合成的文本
+            page: 页面标识，用于获取对应配置
+            cancel_event: 置位后在片段之间终止合成并抛出SynthesisCancelled
+            profile: 合成档位，默认使用页面配置的档位
+
+        Returns:
+            (采样率, 16bit PCM音频)，失败时返回None
+        """
+        voice = self._resolve_voice(page)
+        if voice is None:
+            return None
+        gpt_path, sovits_path, voice_params = voice
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.inference_executor,
+            contextvars.copy_context().run,
+            partial(
+                self._synthesize_pcm_sync,
+                text, gpt_path, sovits_path, voice_params,
+                cancel_event=cancel_event,
+                profile=profile or self.get_page_profile(page)
+            )
+        )
+
+    def _resolve_voice(self, page: str) -> Optional[Tuple[str, str, Dict]]:
+        """解析页面对应的模型路径与语音参数，配置不完整或模型不存在时返回None"""
+        # 获取页面配置
+        page_config = self.config.get("pages", {}).get(page, {})
+        voice_config = page_config.get("voice_config", {})
+
+        if not voice_config:
+            logger.error("❌ 页面 '%s' 的语音配置不存在", page)
+            return None
+
+        # 获取模型路径
+        gpt_model = voice_config.get("gpt_model")
+        sovits_model = voice_config.get("sovits_model")
+
+        if not gpt_model or not sovits_model:
+            logger.error("❌ 页面 '%s' 的模型配置不完整", page)
+            return None
+
+        # 检查模型文件是否存在
+        gpt_path = os.path.join(self.gpt_weights_dir, gpt_model)
+        sovits_path = os.path.join(self.sovits_weights_dir, sovits_model)
+
+        if not os.path.exists(gpt_path) or not os.path.exists(sovits_path):
+            logger.error("❌ 模型文件不存在: GPT=%s, SoVITS=%s", gpt_path, sovits_path)
+            return None
+
+        return gpt_path, sovits_path, voice_config.get("voice_params", {})
+
     async def _run_inference(
         self,
         text: str,
         gpt_path: str,
         sovits_path: str,
-        voice_params: Dict
+        voice_params: Dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
     ) -> bytes:
+        """在推理工作线程中执行GPT-SoVITS推理（复制上下文以保留请求ID）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.inference_executor,
+            contextvars.copy_context().run,
+            partial(
+                self._run_inference_sync,
+                text, gpt_path, sovits_path, voice_params,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                profile=profile
+            )
+        )
+
+    def _run_inference_sync(
+        self,
+        text: str,
+        gpt_path: str,
+        sovits_path: str,
+        voice_params: Dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> Union[bytes, memoryview]:
+        """执行GPT-SoVITS推理并封装为WAV文件"""
+        result = self._synthesize_pcm_sync(
+            text, gpt_path, sovits_path, voice_params,
+            progress_callback=progress_callback,
+            cancel_event=cancel_event,
+            profile=profile
+        )
+        if result is None:
+            return b""
+        sr, audio_data = result
+
+        # 封装为WAV文件（预分配缓冲区，返回零复制视图）
+        return pcm_to_wav(audio_data, sr)
+
+    def _synthesize_pcm_sync(
+        self,
+        text: str,
+        gpt_path: str,
+        sovits_path: str,
+        voice_params: Dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> Optional[Tuple[int, np.ndarray]]:
+        """执行GPT-SoVITS推理（剖析开启时记录本次请求）"""
+        with self.profiler.profile_request("synthesis"):
+            return self._synthesize_pcm_impl(
+                text, gpt_path, sovits_path, voice_params,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                profile=profile
+            )
+
+    def _synthesize_pcm_impl(
+        self,
+        text: str,
+        gpt_path: str,
+        sovits_path: str,
+        voice_params: Dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> Optional[Tuple[int, np.ndarray]]:
         """
         执行GPT-SoVITS推理
 
-        基于GPT-SoVITS源码的完整推理流程
+        基于GPT-SoVITS源码的完整推理流程，返回(采样率, 16bit PCM音频)，失败时返回None
         """
+        timings: Dict[str, float] = {}
         try:
-            logger.info("🎯 开始GPT-SoVITS推理流程...")
+            synthesis_profile = self.synthesis_profiles.get(profile)
+
+            # 1. 规范化文本后规划片段：按档位的片段长度合并短片段、拆分长片段并按长度分桶
+            with self.profiler.stage("plan"), stage_timer(timings, "plan"):
+                normalized_text = self.text_normalizer.normalize(text)
+                plan = synthesis_profile.planner.plan(normalized_text)
+            if not plan.buckets:
+                logger.error("❌ 文本中没有可合成的内容")
+                return None
 
-            # 1. 创建TTS配置
-            tts_config = self._create_tts_config(gpt_path, sovits_path)
-            logger.info("✅ TTS配置创建完成")
+            # 2. 执行推理
+            inference_start = time.perf_counter()
+            results, parallel = self._synthesize_plan(
+                plan, gpt_path, sovits_path, voice_params,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                profile=synthesis_profile.name
+            )
+            timings["inference"] = round((time.perf_counter() - inference_start) * 1000, 1)
+
+            # 3. 按片段边界切分各批次音频并按原文顺序拼接（每个片段末尾已包含片段间隔静音）
+            sr = results[0].sr
+            for bucket, result in zip(plan.buckets, results):
+                self.segment_planner.record_bucket(bucket, result.elapsed, len(result.audio) / sr)
+            # 只有一个批次时直接使用其音频（桶内片段按原文顺序排列），避免多一次复制
+            if len(results) == 1:
+                audio_data = results[0].audio
+            else:
+                audio_data = np.concatenate(plan.ordered_audio(results))
+            # 命中语义token缓存的片段跳过了T2S解码，耗时不代表该档位的实时率，不记录
+            cached_segments = sum(result.cached_segments for result in results)
+            if not cached_segments:
+                self.synthesis_profiles.record(
+                    self._voice_key_for(gpt_path, sovits_path), synthesis_profile.name,
+                    len(normalized_text), len(audio_data) / sr, timings["inference"] / 1000
+                )
+
+            # 4. 仅在超出内存预算时淘汰常驻对象并回收（请求路径上不淘汰正在使用的管道和权重）
+            with stage_timer(timings, "memory"):
+                memory_manager.enforce(protect=(
+                    "tts_pipeline", f"voice_t2s:{gpt_path}", f"voice_vits:{sovits_path}"
+                ))
+
+            logger.info(
+                "✅ 推理完成",
+                extra={
+                    "event": "inference",
+                    "text": preview_text(text),
+                    "chars": len(text),
+                    "segments": len(plan.segments),
+                    "cached_segments": cached_segments,
+                    "buckets": len(plan.buckets),
+                    "padding_ratio": round(plan.padding_ratio, 4),
+                    "parallel": parallel,
+                    "profile": synthesis_profile.name,
+                    "audio_seconds": round(len(audio_data) / sr, 2),
+                    "timings_ms": timings,
+                }
+            )
+            return sr, audio_data
 
-            # 2. 初始化TTS管道
-            TTS_class = self._import_module_from_file("TTS_infer_pack/TTS.py", "TTS")
-            if TTS_class is None:
-                logger.error("❌ 无法导入TTS类")
-                return b""
-            tts_pipeline = TTS_class(tts_config)
-            logger.info("✅ TTS管道初始化完成")
+        except SynthesisCancelled:
+            raise
+        except Exception as e:
+            logger.error("❌ GPT-SoVITS推理失败: %s", e, exc_info=True)
+            return None
 
-            # 3. 获取角色配置
-            role_config = self._get_role_config_by_model(gpt_path, sovits_path)
-            if not role_config:
-                logger.error("❌ 未找到角色配置")
-                return b""
+    def _synthesize_plan(
+        self,
+        plan: SegmentPlan,
+        gpt_path: str,
+        sovits_path: str,
+        voice_params: Dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> Tuple[List[BucketResult], bool]:
+        """
+        合成规划中的所有批次，返回 (与plan.buckets一一对应的批次结果, 是否并行合成)
 
-            # 4. 获取参考音频路径
-            ref_audio_path = role_config.get("ref_audio_path")
-            if not ref_audio_path or not os.path.exists(ref_audio_path):
-                logger.error(f"❌ 参考音频不存在: {ref_audio_path}")
-                return b""
+        批次较多时分发到多个推理进程并行合成，否则在本进程内顺序合成。
+        桶内片段在原文中可以不相邻，无法按片段切分的多片段批次逐片段重新合成，
+        保证plan.ordered_audio总能还原原文顺序
+        """
+        pool = self._get_inference_pool() if len(plan.buckets) >= self.parallel_min_buckets else None
+        if pool is not None:
+            results = pool.synthesize_buckets(
+                plan, gpt_path, sovits_path, voice_params,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+                profile=profile
+            )
+        else:
+            results = []
+            completed_segments = 0
+            for bucket in plan.buckets:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("🛑 合成已取消: 完成 %d/%d 个片段", completed_segments, len(plan.segments))
+                    raise SynthesisCancelled()
+
+                results.append(self.synthesize_bucket(
+                    gpt_path, sovits_path, voice_params, bucket.texts,
+                    cancel_event=cancel_event, profile=profile
+                ))
+
+                completed_segments += len(bucket.segments)
+                if progress_callback is not None:
+                    progress_callback(completed_segments, len(plan.segments))
+
+        for position, (bucket, result) in enumerate(zip(plan.buckets, results)):
+            if result.splittable(bucket):
+                continue
+            logger.warning("⚠️ 桶%d无法按片段切分，逐片段重新合成", bucket.index)
+            single_plan = SegmentPlan(
+                segments=bucket.segments,
+                buckets=[SegmentBucket(index=i, segments=[seg]) for i, seg in enumerate(bucket.segments)]
+            )
+            singles, _ = self._synthesize_plan(
+                single_plan, gpt_path, sovits_path, voice_params, cancel_event=cancel_event, profile=profile
+            )
+            results[position] = BucketResult(
+                sr=singles[0].sr,
+                audio=np.concatenate([single.audio for single in singles]),
+                elapsed=result.elapsed + sum(single.elapsed for single in singles),
+                cached_segments=sum(single.cached_segments for single in singles),
+                segment_ends=np.cumsum([len(single.audio) for single in singles]).tolist()
+            )
+        return results, pool is not None
 
-            # 5. 设置参考音频
-            tts_pipeline.set_ref_audio(ref_audio_path)
-            logger.info(f"✅ 参考音频设置完成: {ref_audio_path}")
+    def synthesize_bucket(
+        self,
+        gpt_path: str,
+        sovits_path: str,
+        voice_params: Dict,
+        texts: List[str],
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> BucketResult:
+        """
+        在本进程的TTS管道上合成一个批次
+
+        Args:
+            gpt_path: GPT模型路径
+            sovits_path: SoVITS模型路径
+            voice_params: 页面语音参数
+            texts: 批次内按原文顺序排列的片段
+            cancel_event: 置位后在下一个解码步结束T2S解码并抛出SynthesisCancelled
+            profile: 合成档位（决定采样与后处理参数）
 
-            # 6. 准备推理参数
+        Returns:
+            批次结果：采样率、16bit PCM音频、耗时秒数、命中语义token缓存的片段数与各片段的结束位置
+        """
+        with self._pipeline_lock:
+            with self.profiler.stage("prepare_pipeline"):
+                tts_pipeline, base_params = self._prepare_pipeline(gpt_path, sovits_path, voice_params)
+            self._install_decode_cancel_hook(tts_pipeline)
+            self._install_fragment_capture(tts_pipeline)
+            self.decode_guard.install(tts_pipeline.t2s_model)
+            self.static_kv_cache.install(tts_pipeline.t2s_model)
+            if self.semantic_cache is not None:
+                self.semantic_cache.install(tts_pipeline.t2s_model)
+
+            bucket_start = time.perf_counter()
             inference_params = {
-                "text": text,
-                "text_lang": "zh",  # 中文
-                "ref_audio_path": ref_audio_path,
-                "prompt_text": role_config.get("prompt_text", ""),
-                "prompt_lang": "zh",
-                "top_k": 5,
-                "top_p": 1.0,
-                "temperature": 1.0,
-                "text_split_method": "cut5",
-                "batch_size": 1,
-                "speed_factor": voice_params.get("speed", 1.0),
-                "fragment_interval": 0.3,
-                "seed": -1,
-                "parallel_infer": False,  # 禁用并行处理，保证句子顺序
-                "repetition_penalty": 1.35
+                **self.synthesis_profiles.get(profile).run_params,
+                **base_params,
+                "text": "\n".join(texts),
+                "batch_size": len(texts),
             }
+            self._decode_cancel_event = cancel_event
+            try:
+                sr, audio_data, trips, cached_segments = self._run_guarded(tts_pipeline, inference_params, texts)
+                self.prompt_states.save(tts_pipeline, self._pipeline_prompt_state)
+
+                # 看门狗触发时换一个随机种子重试一次，再次触发则保留截断后的结果
+                retried = False
+                retry_trips = {}
+                if trips and self.decode_guard.retry and not (cancel_event is not None and cancel_event.is_set()):
+                    retried = True
+                    retry_params = {**inference_params, "seed": random.randrange(2 ** 31)}
+                    sr, audio_data, retry_trips, retry_cached = self._run_guarded(tts_pipeline, retry_params, texts)
+                    cached_segments += retry_cached
+                    logger.warning(
+                        "⚠️ T2S解码看门狗触发，已换种子重试",
+                        extra={"trips": list(trips.values()), "retry_trips": list(retry_trips.values())}
+                    )
+                elif trips:
+                    logger.warning("⚠️ T2S解码看门狗触发，已截断", extra={"trips": list(trips.values())})
+                self.decode_guard.record(self._voice_key_for(gpt_path, sovits_path), trips, retried, retry_trips)
+            finally:
+                self._decode_cancel_event = None
+
+        if cancel_event is not None and cancel_event.is_set():
+            self.decode_cancellations += 1
+            raise SynthesisCancelled()
+
+        # 转换为16bit PCM（就地缩放并限幅）
+        audio_data = float_to_int16(audio_data)
+
+        return BucketResult(
+            sr=sr,
+            audio=audio_data,
+            elapsed=time.perf_counter() - bucket_start,
+            cached_segments=cached_segments,
+            segment_ends=self._segment_ends(len(texts), len(audio_data), sr)
+        )
+
+    def _prepare_pipeline(self, gpt_path: str, sovits_path: str, voice_params: Dict):
+        """获取（必要时创建）对应模型的TTS管道，并设置参考音频，返回管道和基础推理参数"""
+        # 1. 获取角色配置
+        role_config = self._get_role_config_by_model(gpt_path, sovits_path)
+        if not role_config:
+            raise RuntimeError("未找到角色配置")
+
+        # 2. 获取参考音频路径
+        ref_audio_path = role_config.get("ref_audio_path")
+        if not ref_audio_path or not os.path.exists(ref_audio_path):
+            raise RuntimeError(f"参考音频不存在: {ref_audio_path}")
+
+        # 3. 所有角色共用一个TTS管道（共享BERT与CNHuBERT编码器），首次使用时创建
+        if self.tts_pipeline is None:
+            tts_config = self._create_tts_config(gpt_path, sovits_path)
+            logger.info("✅ TTS配置创建完成")
+
+            TTS_class = self._import_module_from_file("TTS_infer_pack/TTS.py", "TTS")
+            if TTS_class is None:
+                raise RuntimeError("无法导入TTS类")
 
-            logger.info(f"🎵 开始语音合成: '{text}'")
+            self.tts_pipeline = None
+            self.tts_pipeline = TTS_class(tts_config)
+            self._pipeline_weights = (gpt_path, sovits_path)
+            self._pipeline_prompt_state = None
+            if self.text_feature_cache is not None:
+                self.text_feature_cache.install(self.tts_pipeline.text_preprocessor)
+
+            pipeline = self.tts_pipeline
+            memory_manager.register(
+                "tts_pipeline",
+                pipeline,
+                cost=lambda: self._pipeline_bytes(pipeline),
+                on_evict=self._release_pipeline
+            )
+            logger.info("✅ TTS管道初始化完成")
+        else:
+            memory_manager.touch("tts_pipeline")
+
+            # 切换角色时只替换发生变化的T2S/VITS权重
+            if self._pipeline_weights != (gpt_path, sovits_path):
+                _, vits_changed = self.voice_switcher.switch(self.tts_pipeline, gpt_path, sovits_path)
+                self._pipeline_weights = (gpt_path, sovits_path)
+                if vits_changed:
+                    # 参考音频的语义token由VITS编码，需换成该权重对应的参考prompt状态
+                    self._pipeline_prompt_state = None
+
+        # 4. 设置参考音频（优先恢复常驻的参考prompt状态）
+        prompt_state = self.prompt_states.state_key(sovits_path, ref_audio_path)
+        if self._pipeline_prompt_state != prompt_state:
+            if self.prompt_states.restore(self.tts_pipeline, prompt_state):
+                logger.info("♻️ 恢复常驻的参考prompt状态: %s", ref_audio_path)
+            else:
+                self.tts_pipeline.set_ref_audio(ref_audio_path)
+                logger.info("✅ 参考音频设置完成: %s", ref_audio_path)
+            self._pipeline_prompt_state = prompt_state
+
+        # 5. 基础推理参数（采样与后处理参数由合成档位提供）
+        base_params = {
+            "text_lang": "zh",  # 中文
+            "ref_audio_path": ref_audio_path,
+            "prompt_text": role_config.get("prompt_text", ""),
+            "prompt_lang": "zh",
+            "text_split_method": "cut0",  # 片段已由规划器切分
+            "split_bucket": False,  # 批内保持原文顺序
+        }
+        if "speed" in voice_params:
+            base_params["speed_factor"] = voice_params["speed"]
+        return self.tts_pipeline, base_params
 
-            # 7. 执行推理
-            sr, audio_data = next(tts_pipeline.run(inference_params))
+    def _run_guarded(self, pipeline, inference_params: Dict, texts: List[str]):
+        """
+        在解码看门狗监视下执行一次管道推理，返回 (采样率, 音频, 看门狗触发记录, 命中语义token缓存的片段数)
 
-            # 8. 转换为16bit PCM
-            if audio_data.dtype != np.int16:
-                audio_data = (audio_data * 32768).astype(np.int16)
+        新解码的语义token只在未被取消、未触发看门狗时写入语义token缓存
+        """
+        self.decode_guard.begin(texts)
+        if self.semantic_cache is not None:
+            self.semantic_cache.begin(self._pipeline_weights[0])
+        completed = False
+        cached_segments = 0
+        self._fragment_samples = None
+        try:
+            with self.profiler.stage("tts_run"):
+                sr, audio_data = next(pipeline.run(inference_params))
+            completed = True
+        finally:
+            trips = self.decode_guard.end()
+            if self.semantic_cache is not None:
+                cancel_event = self._decode_cancel_event
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                cached_segments = self.semantic_cache.end(commit=completed and not trips and not cancelled)["hits"]
+        return sr, audio_data, trips, cached_segments
+
+    def _install_decode_cancel_hook(self, pipeline):
+        """
+        在T2S输出层上注册解码步钩子（每个T2S模型只注册一次，切换权重后对新模型补注册）
 
-            # 9. 创建WAV文件
-            wav_data = self._create_wav_file(audio_data.tobytes(), sr)
+        取消时将该步的logits改为只允许EOS，解码循环在下一步自然结束，
+        不必抛出异常（管道内的异常处理会重新加载全部权重）
+        """
+        model = pipeline.t2s_model.model
+        layer = model.ar_predict_layer
+        if getattr(layer, "_cancel_hook_installed", False):
+            return
+        layer._eos_token = model.EOS
+        layer.register_forward_hook(self._decode_cancel_hook)
+        layer._cancel_hook_installed = True
+
+    def _install_fragment_capture(self, pipeline):
+        """
+        包装管道的audio_postprocess，记录批内各片段拼接前的采样点数与语速（每个管道只包装一次）
 
-            logger.info(f"✅ 推理完成，音频大小: {len(wav_data)} bytes, 采样率: {sr}Hz")
+        用于把批次音频按片段切开：桶内片段在原文中可以不相邻，需要按片段还原原文顺序。
+        audio_postprocess在拼接后才按speed_factor整体变速，片段边界须按语速换算
+        """
+        if getattr(pipeline, "_fragment_capture_installed", False):
+            return
+        original = pipeline.audio_postprocess
+        signature = inspect.signature(original)
 
-            # 10. 清理资源
-            del tts_pipeline
-            gc.collect()
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
+        def audio_postprocess(audio, sr, *args, **kwargs):
+            arguments = signature.bind(audio, sr, *args, **kwargs).arguments
+            speed_factor = float(arguments.get("speed_factor") or 1.0)
+            self._fragment_samples = ([len(fragment) for batch in audio for fragment in batch], sr, speed_factor)
+            return original(audio, sr, *args, **kwargs)
 
-            return wav_data
+        pipeline.audio_postprocess = audio_postprocess
+        pipeline._fragment_capture_installed = True
 
-        except Exception as e:
-            logger.error(f"❌ GPT-SoVITS推理失败: {e}")
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return b""
+    def _segment_ends(self, segment_count: int, output_samples: int, output_sr: int) -> Optional[List[int]]:
+        """
+        由最近一次推理记录的片段长度计算各片段在输出音频中的结束位置
+
+        每个片段后追加的间隔静音长度相同，由输出总长度反推；拼接后的变速使所有长度按1/speed_factor缩放，
+        超采样时再按采样率换算。片段数与批内文本数不一致（管道合并或拆分了行）时返回None
+        """
+        captured = self._fragment_samples
+        if captured is None:
+            return None
+        lengths, sr, speed_factor = captured
+        if len(lengths) != segment_count:
+            return None
+        # 拼接前的1个采样点对应输出中的scale个采样点
+        scale = (output_sr / sr if sr else 1.0) / (speed_factor if speed_factor > 0 else 1.0)
+        silence = max(0.0, (output_samples / scale - sum(lengths)) / segment_count)
+
+        ends, position = [], 0.0
+        for length in lengths:
+            position += length + silence
+            ends.append(min(output_samples, round(position * scale)))
+        ends[-1] = output_samples
+        return ends
+
+    def _decode_cancel_hook(self, module, inputs, logits):
+        cancel_event = self._decode_cancel_event
+        if cancel_event is None or not cancel_event.is_set():
+            return None
+        # 有限的大数而非-inf：首步EOS被屏蔽时仍可正常采样
+        forced = torch.full_like(logits, -1e4)
+        forced[..., module._eos_token] = 1e4
+        return forced
+
+    @staticmethod
+    def _pipeline_bytes(pipeline) -> int:
+        """估算TTS管道中各模型的参数占用"""
+        return sum(
+            tensor_bytes(getattr(pipeline, name, None))
+            for name in ("t2s_model", "vits_model", "bert_model", "cnhuhbert_model", "sv_model", "vocoder")
+        )
+
+    def _release_pipeline(self, pipeline):
+        """内存管理器淘汰TTS管道时释放引用，下次合成时重新加载"""
+        with self._pipeline_lock:
+            if self.tts_pipeline is pipeline:
+                self.tts_pipeline = None
+                self._pipeline_weights = None
+                self._pipeline_prompt_state = None
+
+    def _get_inference_pool(self):
+        """获取多进程推理池（首次使用时创建），未启用时返回None"""
+        if self.inference_processes <= 1:
+            return None
+        if self._inference_pool is None:
+            from app.services.inference_pool import InferencePool
+            self._inference_pool = InferencePool(
+                self.config_path,
+                self.inference_processes,
+                logging_config=self.config.get("logging", {})
+            )
+        return self._inference_pool
 
     def _create_tts_config(self, gpt_path: str, sovits_path: str):
         """创建TTS配置字典"""
@@ -641,59 +1341,96 @@ class GPTSoVITSService:
 
         return None
 
-    def _create_wav_file(self, pcm_data: bytes, sample_rate: int = 44100) -> bytes:
+    def get_page_config(self, page: str) -> Dict:
+        """获取页面配置"""
+        return self.config.get("pages", {}).get(page, {})
+
+    def get_voice_key(self, page: str) -> Optional[str]:
+        """页面使用的语音（GPT与SoVITS权重组合），用于推理任务的语音亲和调度和延迟统计"""
+        voice_config = self.get_page_config(page).get("voice_config", {})
+        gpt_model = voice_config.get("gpt_model")
+        sovits_model = voice_config.get("sovits_model")
+        if not gpt_model or not sovits_model:
+            return None
+        return self._voice_key_for(gpt_model, sovits_model)
+
+    @staticmethod
+    def _voice_key_for(gpt_path: str, sovits_path: str) -> str:
+        return f"{os.path.basename(gpt_path)}|{os.path.basename(sovits_path)}"
+
+    def current_voice_keys(self) -> List[str]:
+        """TTS管道当前加载的语音"""
+        if self._pipeline_weights is None:
+            return []
+        return [self._voice_key_for(*self._pipeline_weights)]
+
+    def get_page_profile(self, page: str) -> Optional[str]:
+        """页面配置的合成档位，未配置时返回None（使用默认档位）"""
+        return self.get_page_config(page).get("synthesis_profile")
+
+    def select_profile(
+        self,
+        page: str,
+        text: str,
+        requested: Optional[str] = None,
+        latency_budget_ms: Optional[float] = None
+    ) -> str:
         """
-        创建WAV文件格式
+        选择请求的合成档位：请求指定 > 延迟预算 > 页面配置 > 默认档位
 
-        Args:
-            pcm_data: PCM音频数据（16bit, 单声道）
-            sample_rate: 采样率
+        Raises:
+            ValueError: 指定的档位不存在
+        """
+        # 与实测记录一致，按规范化后的文本计算字数
+        return self.synthesis_profiles.select(
+            self.get_voice_key(page),
+            self.text_normalizer.normalize(text),
+            requested=requested,
+            page_profile=self.get_page_profile(page),
+            latency_budget_ms=latency_budget_ms
+        )
+
+    def predict_synthesis_ms(self, page: str, chars: int) -> Optional[float]:
+        """页面语音以最快档位合成chars个字的预计耗时，无法预测时返回None"""
+        return self.synthesis_profiles.predict_latency_ms(
+            self.get_voice_key(page), self.synthesis_profiles.names[0], max(1, chars)
+        )
+
+    def get_voice_fingerprint(self, page: str) -> str:
+        """
+        页面语音指纹
 
-        Returns:
-            完整的WAV文件数据
+        由语音配置以及GPT/SoVITS模型文件和参考音频的大小、修改时间计算，
+        任一项变化时指纹随之变化，用于判断已合成的音频是否仍然有效。
         """
-        try:
-            # WAV文件头结构
-            # RIFF头
-            riff_header = b'RIFF'
-            file_size = 36 + len(pcm_data)  # 36是WAV头的固定大小
-            riff_size = file_size.to_bytes(4, 'little')
-
-            # WAVE标识
-            wave_header = b'WAVE'
-
-            # fmt子块
-            fmt_header = b'fmt '
-            fmt_size = (16).to_bytes(4, 'little')  # fmt子块大小
-            audio_format = (1).to_bytes(2, 'little')  # PCM格式
-            num_channels = (1).to_bytes(2, 'little')  # 单声道
-            sample_rate_bytes = sample_rate.to_bytes(4, 'little')
-            byte_rate = (sample_rate * 1 * 16 // 8).to_bytes(4, 'little')  # 字节率
-            block_align = (1 * 16 // 8).to_bytes(2, 'little')  # 块对齐
-            bits_per_sample = (16).to_bytes(2, 'little')  # 16位
-
-            # data子块
-            data_header = b'data'
-            data_size = len(pcm_data).to_bytes(4, 'little')
-
-            # 组合所有部分
-            wav_file = (
-                riff_header + riff_size + wave_header +
-                fmt_header + fmt_size + audio_format + num_channels +
-                sample_rate_bytes + byte_rate + block_align + bits_per_sample +
-                data_header + data_size + pcm_data
-            )
+        voice_config = self.get_page_config(page).get("voice_config", {})
+        parts = [json.dumps(voice_config, ensure_ascii=False, sort_keys=True)]
 
-            logger.info(f"✅ WAV文件创建成功: {len(wav_file)} bytes, 采样率: {sample_rate}Hz")
-            return wav_file
+        gpt_path = os.path.join(self.gpt_weights_dir, voice_config.get("gpt_model") or "")
+        sovits_path = os.path.join(self.sovits_weights_dir, voice_config.get("sovits_model") or "")
+        role_config = self._get_role_config_by_model(gpt_path, sovits_path) or {}
 
-        except Exception as e:
-            logger.error(f"❌ 创建WAV文件失败: {e}")
-            return b""
+        for path in (gpt_path, sovits_path, role_config.get("ref_audio_path")):
+            try:
+                stat = os.stat(path)
+                parts.append(f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}")
+            except (OSError, TypeError):
+                parts.append(f"{path}:missing")
 
-    def get_page_config(self, page: str) -> Dict:
-        """获取页面配置"""
-        return self.config.get("pages", {}).get(page, {})
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def worker_stats(self) -> Dict[str, Any]:
+        """推理进程内的统计（随批次结果回传给主进程的推理池）"""
+        return {
+            "text_feature_cache": self.text_feature_cache.stats() if self.text_feature_cache else None,
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None,
+            "prompt_state": self.prompt_states.stats(),
+            "voice_switching": self.voice_switcher.stats(),
+            "decode_cancellations": self.decode_cancellations,
+            "decode_guard": self.decode_guard.stats(),
+            "static_kv_cache": self.static_kv_cache.stats(),
+            "profiler": self.profiler.status(),
+        }
 
     async def health_check(self) -> Dict[str, Any]:
         """健康检查"""
@@ -714,7 +1451,19 @@ class GPTSoVITSService:
                 "sovits_model_exists": sovits_exists,
                 "gpt_weights_dir": self.gpt_weights_dir,
                 "sovits_weights_dir": self.sovits_weights_dir,
-                "config_loaded": bool(self.config)
+                "config_loaded": bool(self.config),
+                "text_feature_cache": self.text_feature_cache.stats() if self.text_feature_cache else None,
+                "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None,
+                "segment_buckets": self.segment_planner.stats(),
+                "synthesis_profiles": self.synthesis_profiles.stats(),
+                "phrase_bank": self.phrase_bank.stats(),
+                "memory": memory_manager.stats(),
+                "voice_switching": self.voice_switcher.stats(),
+                "prompt_state": self.prompt_states.stats(),
+                "decode_cancellations": self.decode_cancellations,
+                "decode_guard": self.decode_guard.stats(),
+                "static_kv_cache": self.static_kv_cache.stats(),
+                "inference_pool": self._inference_pool.stats() if self._inference_pool else None
             }
 
         except Exception as e:
@@ -0,0 +1,181 @@
+"""
+多进程推理池
+长文本的各个批次分发到多个推理进程并行合成，每个进程持有独立的常驻TTS管道，
+结果按原文顺序重新拼接
+
+取消：每次并行合成分配一个令牌，取消时写入共享的取消表；推理进程中的监视线程
+发现令牌被取消后置位本地cancel_event，正在解码的批次在下一个解码步结束。
+统计：每个批次的结果附带所在进程的看门狗、缓存、剖析等统计，由主进程汇总到健康检查
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.segment_planner import BucketResult
+
+logger = logging.getLogger(__name__)
+
+# 共享取消表的槽位数（同时进行的并行合成远少于此）
+CANCEL_SLOTS = 64
+# 推理进程检查取消表的间隔（秒）
+CANCEL_POLL_SECONDS = 0.05
+
+# 推理进程内的服务实例与共享取消表（由进程初始化函数设置）
+_worker_service = None
+_cancel_table = None
+
+
+def _init_worker(config_path: str, torch_threads: int, logging_config: Dict, cancel_table):
+    """推理进程初始化：限制计算线程数并创建本进程的GPT-SoVITS服务"""
+    global _worker_service, _cancel_table
+    _cancel_table = cancel_table
+
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    from app.services.log_service import setup_logging
+    setup_logging(logging_config)
+
+    from app.services.gpt_sovits_service import GPTSoVITSService
+    _worker_service = GPTSoVITSService(config_path)
+    logger.info(f"✅ 推理进程已就绪: pid={os.getpid()}, torch线程数={torch_threads}")
+
+
+def _synthesize_bucket(
+    gpt_path: str,
+    sovits_path: str,
+    voice_params: Dict,
+    texts: List[str],
+    profile: Optional[str],
+    cancel_token: int
+) -> Tuple[BucketResult, int, Dict[str, Any]]:
+    """在推理进程中合成一个批次，返回 (批次结果, 进程号, 本进程统计)"""
+    cancel_event = threading.Event()
+    finished = threading.Event()
+
+    def watch_cancel():
+        slot = cancel_token % CANCEL_SLOTS
+        while not finished.wait(CANCEL_POLL_SECONDS):
+            if _cancel_table[slot] == cancel_token:
+                cancel_event.set()
+                return
+
+    threading.Thread(target=watch_cancel, name="bucket-cancel-watch", daemon=True).start()
+    try:
+        result = _worker_service.synthesize_bucket(
+            gpt_path, sovits_path, voice_params, texts, cancel_event=cancel_event, profile=profile
+        )
+    finally:
+        finished.set()
+    return result, os.getpid(), _worker_service.worker_stats()
+
+
+class InferencePool:
+    """多进程推理池"""
+
+    def __init__(
+        self,
+        config_path: str,
+        processes: int,
+        torch_threads: Optional[int] = None,
+        logging_config: Optional[Dict] = None
+    ):
+        self.processes = max(1, int(processes))
+        cpu_count = os.cpu_count() or 1
+        self.torch_threads = torch_threads or max(1, cpu_count // self.processes)
+
+        context = multiprocessing.get_context("spawn")
+        # 槽位记录被取消的令牌；令牌递增，槽位被后续请求复用时旧令牌自然失效
+        self._cancel_table = context.RawArray("q", CANCEL_SLOTS)
+        self._tokens = itertools.count(1)
+        self._worker_stats: Dict[int, Dict[str, Any]] = {}
+        self._stats_lock = threading.Lock()
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(config_path, self.torch_threads, logging_config or {}, self._cancel_table)
+        )
+        logger.info(f"✅ 多进程推理池已创建: {self.processes} 个进程, 每进程 {self.torch_threads} 个torch线程")
+
+    def synthesize_buckets(
+        self,
+        plan,
+        gpt_path: str,
+        sovits_path: str,
+        voice_params: Dict,
+        progress_callback=None,
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> List[BucketResult]:
+        """
+        并行合成规划中的所有批次
+
+        Args:
+            plan: SegmentPlan 片段规划结果
+            gpt_path: GPT模型路径
+            sovits_path: SoVITS模型路径
+            voice_params: 页面语音参数
+            progress_callback: 每完成一个批次后调用，参数为(已完成片段数, 片段总数)
+            cancel_event: 置位后取消尚未开始的批次、中止正在解码的批次并抛出SynthesisCancelled
+            profile: 合成档位名称（由各推理进程按自身配置解析）
+
+        Returns:
+            按批次顺序排列的批次结果
+        """
+        from app.services.gpt_sovits_service import SynthesisCancelled
+
+        cancel_token = next(self._tokens)
+        futures: Dict[Future, int] = {}
+        for bucket in plan.buckets:
+            future = self._executor.submit(
+                _synthesize_bucket, gpt_path, sovits_path, voice_params, bucket.texts, profile, cancel_token
+            )
+            futures[future] = bucket.index
+
+        results: List[Optional[BucketResult]] = [None] * len(plan.buckets)
+        pending = set(futures)
+        completed_segments = 0
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    # 通知推理进程中止正在解码的批次
+                    self._cancel_table[cancel_token % CANCEL_SLOTS] = cancel_token
+                    logger.info("🛑 并行合成已取消: 完成 %d/%d 个片段", completed_segments, len(plan.segments))
+                    raise SynthesisCancelled()
+
+                for future in done:
+                    index = futures[future]
+                    results[index], pid, worker_stats = future.result()
+                    with self._stats_lock:
+                        self._worker_stats[pid] = {**worker_stats, "updated_at": time.time()}
+                    completed_segments += len(plan.buckets[index].segments)
+                    if progress_callback is not None:
+                        progress_callback(completed_segments, len(plan.segments))
+        finally:
+            for future in pending:
+                future.cancel()
+
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """推理池与各推理进程的统计（进程统计随最近一次完成的批次更新）"""
+        with self._stats_lock:
+            workers = {str(pid): stats for pid, stats in self._worker_stats.items()}
+        return {
+            "processes": self.processes,
+            "torch_threads": self.torch_threads,
+            "workers": workers,
+        }
+
+    def shutdown(self):
+        """关闭推理进程"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
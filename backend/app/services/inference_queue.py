@@ -0,0 +1,405 @@
+"""
+推理任务队列
+网关把合成任务放入队列，推理工作节点按语音亲和性领取任务并回传音频，
+HTTP层与模型推理可以分开部署、分别扩容。
+
+队列实现可替换，工作节点只依赖 lease / heartbeat / complete / fail 四个协程。
+执行中的工作节点定期发送心跳续租，心跳同时携带片段合成进度（进度变化时立即发送）；
+心跳返回False表示任务已被取消或已转交其他节点，工作节点随即中止合成：
+    InProcessQueue     网关进程内的队列；本地工作协程直接领取（也用于测试），
+                       远程工作节点通过 /api/worker 接口领取
+    RemoteQueueClient  远程工作节点通过HTTP访问网关队列的客户端
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from app.services.audio_output import wav_to_pcm
+from app.services.log_service import request_id_var
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SynthesisTask:
+    """队列中的一次合成任务"""
+    task_id: str
+    text: str
+    page: str
+    voice_key: str
+    profile: Optional[str]
+    request_id: str
+    created_at: float
+    future: asyncio.Future = field(repr=False)
+    worker_id: Optional[str] = None
+    leased_at: Optional[float] = None
+    attempts: int = 0
+    # 工作节点经心跳上报的进度 (已完成片段数, 片段总数)
+    progress: Optional[Tuple[int, int]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """发给工作节点的任务描述"""
+        return {
+            "task_id": self.task_id,
+            "text": self.text,
+            "page": self.page,
+            "voice_key": self.voice_key,
+            "profile": self.profile,
+            "request_id": self.request_id,
+        }
+
+
+class InProcessQueue:
+    """
+    网关进程内的推理任务队列
+
+    领取任务时优先分配工作节点已加载语音的任务；其他任务只有在没有存活节点加载该语音，
+    或等待时间超过affinity_wait_ms时才分配，避免频繁切换权重。
+    执行中的任务靠心跳续租，租约超时未续租的任务（节点崩溃）重新排队，超过max_attempts次后失败
+    """
+
+    def __init__(
+        self,
+        lease_timeout_seconds: float = 120.0,
+        affinity_wait_ms: float = 500.0,
+        max_attempts: int = 2,
+        heartbeat_seconds: float = 5.0
+    ):
+        self.lease_timeout = lease_timeout_seconds
+        # 心跳间隔不超过租约的1/3，偶尔丢失一两次心跳不会导致任务被转交
+        self.heartbeat_seconds = min(heartbeat_seconds, lease_timeout_seconds / 3)
+        self.affinity_wait = affinity_wait_ms / 1000.0
+        self.max_attempts = max(1, int(max_attempts))
+
+        self._pending: List[SynthesisTask] = []
+        self._leased: Dict[str, SynthesisTask] = {}
+        # 工作节点 -> (已加载的语音, 最近一次领取时间)
+        self._workers: Dict[str, tuple] = {}
+        # 队列变化时置位并替换，唤醒所有长轮询中的领取请求
+        self._changed = asyncio.Event()
+        self.counters: Counter = Counter()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "InProcessQueue":
+        """从config.json中的gateway配置创建"""
+        return cls(
+            lease_timeout_seconds=config.get("lease_timeout_seconds", 120.0),
+            affinity_wait_ms=config.get("affinity_wait_ms", 500.0),
+            max_attempts=config.get("max_attempts", 2),
+            heartbeat_seconds=config.get("heartbeat_seconds", 5.0)
+        )
+
+    async def submit(self, text: str, page: str, voice_key: str, profile: Optional[str] = None) -> SynthesisTask:
+        """提交任务，通过task.future等待音频结果（失败时结果为空字节）"""
+        task = SynthesisTask(
+            task_id=uuid.uuid4().hex,
+            text=text,
+            page=page,
+            voice_key=voice_key,
+            profile=profile,
+            request_id=request_id_var.get(),
+            created_at=time.monotonic(),
+            future=asyncio.get_running_loop().create_future()
+        )
+        self._pending.append(task)
+        self.counters["submitted"] += 1
+        self._notify()
+        return task
+
+    def cancel(self, task_id: str):
+        """取消任务：排队中的直接移除；已领取的移出租约，执行节点在下一次心跳时中止合成"""
+        for task in self._pending:
+            if task.task_id == task_id:
+                self._pending.remove(task)
+                self._resolve(task, b"", "cancelled")
+                return
+        task = self._leased.pop(task_id, None)
+        if task is not None:
+            self._resolve(task, b"", "cancelled")
+
+    async def lease(self, worker_id: str, voices: List[str], timeout: float = 20.0) -> Optional[Dict[str, Any]]:
+        """
+        工作节点领取一个任务，队列为空时最多等待timeout秒
+
+        Args:
+            worker_id: 工作节点标识
+            voices: 工作节点当前已加载的语音
+            timeout: 长轮询等待时间
+
+        Returns:
+            任务描述，超时返回None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            self._workers[worker_id] = (set(voices), now)
+            self._requeue_expired(now)
+
+            task = self._pick(worker_id, set(voices), now)
+            if task is not None:
+                self._pending.remove(task)
+                task.worker_id = worker_id
+                task.leased_at = now
+                task.attempts += 1
+                self._leased[task.task_id] = task
+                self.counters["affinity_hits" if task.voice_key in voices else "affinity_misses"] += 1
+                return {**task.to_dict(), "heartbeat_seconds": self.heartbeat_seconds}
+
+            remaining = deadline - now
+            if remaining <= 0:
+                return None
+            # 有等待中的任务时按亲和等待时间重新评估
+            wait = min(remaining, self.affinity_wait) if self._pending else remaining
+            try:
+                await asyncio.wait_for(self._changed.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def heartbeat(self, task_id: str, worker_id: str, progress: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        工作节点续租执行中的任务
+
+        Args:
+            progress: 片段合成进度 (已完成片段数, 片段总数)
+
+        Returns:
+            任务是否仍由该节点执行；False表示已被取消或已转交，节点应中止合成
+        """
+        task = self._leased.get(task_id)
+        if task is None or task.worker_id != worker_id:
+            return False
+        now = time.monotonic()
+        task.leased_at = now
+        if progress is not None:
+            task.progress = (int(progress[0]), int(progress[1]))
+        if worker_id in self._workers:
+            self._workers[worker_id] = (self._workers[worker_id][0], now)
+        return True
+
+    async def complete(self, task_id: str, worker_id: str, audio_data: bytes):
+        """工作节点回传音频"""
+        task = self._take_leased(task_id, worker_id)
+        if task is not None:
+            self._resolve(task, audio_data, "completed")
+
+    async def fail(self, task_id: str, worker_id: str, error: str):
+        """工作节点报告任务失败"""
+        task = self._take_leased(task_id, worker_id)
+        if task is not None:
+            logger.error("❌ 推理任务失败: %s (%s): %s", task_id, worker_id, error)
+            self._resolve(task, b"", "failed")
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _pick(self, worker_id: str, voices: set, now: float) -> Optional[SynthesisTask]:
+        """按语音亲和性选择任务"""
+        for task in self._pending:
+            if task.voice_key in voices:
+                return task
+
+        live_voices = set()
+        for other_id, (other_voices, last_seen) in self._workers.items():
+            if other_id != worker_id and now - last_seen <= self.lease_timeout:
+                live_voices |= other_voices
+
+        for task in self._pending:
+            if task.voice_key not in live_voices or now - task.created_at >= self.affinity_wait:
+                return task
+        return None
+
+    def _requeue_expired(self, now: float):
+        """租约超时的任务重新排队（保持原有先后顺序）"""
+        for task in list(self._leased.values()):
+            if now - task.leased_at <= self.lease_timeout:
+                continue
+            del self._leased[task.task_id]
+            logger.warning("⚠️ 推理任务租约超时: %s (%s)", task.task_id, task.worker_id)
+            if task.attempts >= self.max_attempts:
+                self._resolve(task, b"", "failed")
+            else:
+                task.worker_id = None
+                task.leased_at = None
+                self._pending.insert(0, task)
+                self.counters["requeued"] += 1
+                self._notify()
+
+    def _take_leased(self, task_id: str, worker_id: str) -> Optional[SynthesisTask]:
+        task = self._leased.get(task_id)
+        if task is None or task.worker_id != worker_id:
+            return None
+        return self._leased.pop(task_id)
+
+    def _resolve(self, task: SynthesisTask, audio_data: bytes, outcome: str):
+        self.counters[outcome] += 1
+        if not task.future.done():
+            task.future.set_result(audio_data)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "pending": len(self._pending),
+            "leased": len(self._leased),
+            "workers": {
+                worker_id: {"voices": sorted(voices), "idle_seconds": round(now - last_seen, 1)}
+                for worker_id, (voices, last_seen) in self._workers.items()
+                if now - last_seen <= self.lease_timeout
+            },
+            **self.counters,
+        }
+
+
+class RemoteQueueClient:
+    """远程工作节点访问网关队列的HTTP客户端（接口见 app/routes/worker_service.py）"""
+
+    def __init__(self, gateway_url: str, token: Optional[str] = None, request_timeout: float = 60.0):
+        self.base_url = gateway_url.rstrip("/") + "/api/worker"
+        self.headers = {"X-Worker-Token": token} if token else {}
+        self.request_timeout = request_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers=self.headers)
+        return self._session
+
+    async def lease(self, worker_id: str, voices: List[str], timeout: float = 20.0) -> Optional[Dict[str, Any]]:
+        payload = {"worker_id": worker_id, "voices": voices, "timeout": timeout}
+        client_timeout = aiohttp.ClientTimeout(total=timeout + self.request_timeout)
+        async with self._get_session().post(f"{self.base_url}/lease", json=payload, timeout=client_timeout) as response:
+            if response.status == 204:
+                return None
+            response.raise_for_status()
+            return await response.json()
+
+    async def heartbeat(self, task_id: str, worker_id: str, progress: Optional[Tuple[int, int]] = None) -> bool:
+        payload: Dict[str, Any] = {"worker_id": worker_id}
+        if progress is not None:
+            payload.update(completed=progress[0], total=progress[1])
+        async with self._get_session().post(
+            f"{self.base_url}/tasks/{task_id}/heartbeat",
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        ) as response:
+            response.raise_for_status()
+            return bool((await response.json()).get("active"))
+
+    async def complete(self, task_id: str, worker_id: str, audio_data: bytes):
+        async with self._get_session().post(
+            f"{self.base_url}/tasks/{task_id}/result",
+            data=audio_data,
+            headers={"X-Worker-ID": worker_id, "Content-Type": "audio/wav"},
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        ) as response:
+            response.raise_for_status()
+
+    async def fail(self, task_id: str, worker_id: str, error: str):
+        async with self._get_session().post(
+            f"{self.base_url}/tasks/{task_id}/error",
+            json={"worker_id": worker_id, "error": error},
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        ) as response:
+            response.raise_for_status()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class QueueDispatcher:
+    """
+    网关侧的合成入口：与GPTSoVITSService.synthesize_speech接口一致，
+    合成任务经队列分发到推理工作节点；配置、语音指纹等其余属性委托给本地服务
+    """
+
+    def __init__(self, synthesizer, queue: InProcessQueue, result_timeout_seconds: float = 600.0):
+        self.synthesizer = synthesizer
+        self.queue = queue
+        self.result_timeout = result_timeout_seconds
+
+    def __getattr__(self, name: str):
+        return getattr(self.synthesizer, name)
+
+    async def synthesize_speech(
+        self,
+        text: str,
+        page: str = "tts-chat",
+        progress_callback=None,
+        cancel_event: Optional[threading.Event] = None,
+        use_phrase_bank: bool = True,
+        profile: Optional[str] = None
+    ) -> bytes:
+        """
+        经队列合成语音
+
+        Returns:
+            音频字节数据，失败或超时返回空字节
+
+        Raises:
+            SynthesisCancelled: cancel_event被置位
+        """
+        from app.services.gpt_sovits_service import SynthesisCancelled
+
+        if use_phrase_bank:
+            audio_data = self.synthesizer.phrase_bank.lookup(text, page)
+            if audio_data:
+                return audio_data
+
+        voice_key = self.synthesizer.get_voice_key(page)
+        if voice_key is None:
+            return b""
+
+        task = await self.queue.submit(text, page, voice_key, profile=profile)
+        deadline = time.monotonic() + self.result_timeout
+        reported = None
+        try:
+            while True:
+                try:
+                    audio_data = await asyncio.wait_for(asyncio.shield(task.future), 0.25)
+                    break
+                except asyncio.TimeoutError:
+                    # 转发工作节点经心跳上报的片段进度
+                    if progress_callback is not None and task.progress is not None and task.progress != reported:
+                        reported = task.progress
+                        progress_callback(*reported)
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise SynthesisCancelled()
+                    if time.monotonic() > deadline:
+                        logger.error("❌ 推理任务等待超时: %s", task.task_id)
+                        return b""
+        finally:
+            if not task.future.done():
+                self.queue.cancel(task.task_id)
+
+        if progress_callback is not None and audio_data:
+            total = task.progress[1] if task.progress is not None else 1
+            if reported != (total, total):
+                progress_callback(total, total)
+        return audio_data
+
+    async def synthesize_pcm(
+        self,
+        text: str,
+        page: str = "tts-chat",
+        cancel_event: Optional[threading.Event] = None,
+        profile: Optional[str] = None
+    ) -> Optional[Tuple[int, Any]]:
+        """
+        经队列合成语音并返回原始PCM（用于WebSocket流式输出），接口与GPTSoVITSService.synthesize_pcm一致
+
+        Returns:
+            (采样率, 16bit PCM音频)，失败时返回None
+        """
+        audio_data = await self.synthesize_speech(text, page, cancel_event=cancel_event, profile=profile)
+        if not audio_data:
+            return None
+        return wav_to_pcm(audio_data)
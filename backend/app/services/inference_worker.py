@@ -0,0 +1,151 @@
+"""
+推理工作节点
+加载GPTSoVITSService，从推理任务队列领取合成任务并回传音频。
+网关以gateway.mode=queue运行时，本地工作协程直接消费进程内队列；
+其他机器上的工作节点通过HTTP向网关领取任务，增加节点即可线性提升吞吐。
+执行任务期间按网关下发的间隔发送心跳续租，片段进度变化时立即发送心跳上报进度；
+心跳表明任务已被取消或转交时中止合成。
+
+远程工作节点（在backend目录下执行）:
+    WORKER_TOKEN=... python -m app.services.inference_worker --gateway http://gateway:8000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+from typing import Optional
+
+from app.services.log_service import request_id_var
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceWorker:
+    """从队列领取任务并在本地模型上合成的工作循环"""
+
+    def __init__(self, synthesizer, queue, worker_id: Optional[str] = None, lease_timeout: float = 20.0):
+        self.synthesizer = synthesizer
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_timeout = lease_timeout
+        self._stopping = False
+
+    async def run(self):
+        """持续领取并执行任务，直到stop()"""
+        logger.info(f"👷 推理工作节点已启动: {self.worker_id}")
+        while not self._stopping:
+            try:
+                task = await self.queue.lease(
+                    self.worker_id, self.synthesizer.current_voice_keys(), timeout=self.lease_timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ 领取推理任务失败: {e}")
+                await asyncio.sleep(1.0)
+                continue
+
+            if task is not None:
+                await self._execute(task)
+
+        logger.info(f"👷 推理工作节点已停止: {self.worker_id}")
+
+    async def _execute(self, task: dict):
+        from app.services.gpt_sovits_service import SynthesisCancelled
+
+        token = request_id_var.set(task.get("request_id") or "-")
+        cancel_event = threading.Event()
+        progress = {"value": None, "changed": asyncio.Event()}
+        loop = asyncio.get_running_loop()
+
+        def on_progress(completed: int, total: int):
+            # 在推理线程中调用
+            progress["value"] = (completed, total)
+            loop.call_soon_threadsafe(progress["changed"].set)
+
+        heartbeat = asyncio.create_task(self._heartbeat(task, cancel_event, progress))
+        try:
+            # 网关已查询过预渲染短语库和音频存储
+            audio_data = await self.synthesizer.synthesize_speech(
+                task["text"], task["page"], use_phrase_bank=False, profile=task.get("profile"),
+                cancel_event=cancel_event, progress_callback=on_progress
+            )
+            if audio_data:
+                await self.queue.complete(task["task_id"], self.worker_id, audio_data)
+            else:
+                await self.queue.fail(task["task_id"], self.worker_id, "语音合成失败")
+        except SynthesisCancelled:
+            logger.info("🛑 推理任务已取消或已转交: %s", task["task_id"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ 推理任务执行失败: {task['task_id']}: {e}")
+            try:
+                await self.queue.fail(task["task_id"], self.worker_id, str(e))
+            except Exception:
+                pass
+        finally:
+            heartbeat.cancel()
+            request_id_var.reset(token)
+
+    async def _heartbeat(self, task: dict, cancel_event: threading.Event, progress: dict):
+        """执行期间定期续租并上报进度（进度变化时提前发送）；任务已被取消或转交时置位cancel_event"""
+        interval = float(task.get("heartbeat_seconds") or 5.0)
+        while True:
+            try:
+                await asyncio.wait_for(progress["changed"].wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            progress["changed"].clear()
+            try:
+                active = await self.queue.heartbeat(task["task_id"], self.worker_id, progress=progress["value"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 偶尔失败的心跳由租约余量吸收
+                logger.warning("⚠️ 推理任务心跳失败: %s: %s", task["task_id"], e)
+                continue
+            if not active:
+                cancel_event.set()
+                return
+
+    def stop(self):
+        """当前任务完成后停止"""
+        self._stopping = True
+
+
+def main():
+    """远程推理工作节点"""
+    parser = argparse.ArgumentParser(description="GPT-SoVITS推理工作节点")
+    parser.add_argument("--gateway", required=True, help="网关地址，如 http://gateway:8000")
+    parser.add_argument("--worker-id", help="工作节点标识，默认为 主机名-进程号")
+    parser.add_argument("--config", default="./config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    from app.services.gpt_sovits_service import GPTSoVITSService
+    from app.services.inference_queue import RemoteQueueClient
+    from app.services.log_service import setup_logging
+
+    setup_logging()
+    service = GPTSoVITSService(args.config)
+    setup_logging(service.config.get("logging", {}))
+
+    async def run():
+        client = RemoteQueueClient(args.gateway, token=os.getenv("WORKER_TOKEN"))
+        worker = InferenceWorker(service, client, worker_id=args.worker_id)
+        try:
+            await worker.run()
+        finally:
+            await client.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
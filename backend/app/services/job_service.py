@@ -0,0 +1,323 @@
+"""
+异步语音合成任务服务
+长文本合成以任务形式提交，客户端轮询状态或订阅进度事件，结果写入本地结果存储并在TTL后过期
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Union
+
+from app.services.gpt_sovits_service import GPTSoVITSService, SynthesisCancelled
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED}
+
+
+class JobService:
+    """语音合成任务队列与结果存储"""
+
+    def __init__(
+        self,
+        synthesizer: GPTSoVITSService,
+        store_dir: str,
+        workers: int = 1,
+        result_ttl_seconds: int = 3600,
+        cleanup_interval_seconds: int = 300,
+        speculative=None
+    ):
+        """
+        Args:
+            synthesizer: 提供synthesize_speech的合成服务（本地服务或推理队列分发器）
+            store_dir: 任务与结果的存储目录
+            workers: 任务工作协程数
+            result_ttl_seconds: 结果保留时间
+            cleanup_interval_seconds: 清理过期结果的间隔
+            speculative: 预测合成调度器，任务执行期间标记为真实请求，进行中的预测合成让出
+        """
+        self.synthesizer = synthesizer
+        self.speculative = speculative
+        self.jobs_dir = os.path.join(store_dir, "jobs")
+        self.results_dir = os.path.join(store_dir, "results")
+        self.workers = max(1, int(workers))
+        self.result_ttl_seconds = int(result_ttl_seconds)
+        self.cleanup_interval_seconds = int(cleanup_interval_seconds)
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, synthesizer: GPTSoVITSService, config: Dict[str, Any], speculative=None) -> "JobService":
+        """从config.json中的jobs配置创建"""
+        store_dir = synthesizer._resolve_backend_path(config.get("store_dir", "./data/jobs"))
+        return cls(
+            synthesizer,
+            store_dir=store_dir,
+            workers=config.get("workers", 1),
+            result_ttl_seconds=config.get("result_ttl_seconds", 3600),
+            cleanup_interval_seconds=config.get("cleanup_interval_seconds", 300),
+            speculative=speculative
+        )
+
+    async def start(self):
+        """启动任务工作协程，并恢复重启前未完成的任务"""
+        if self._tasks:
+            return
+
+        self._queue = asyncio.Queue()
+        recovered = self._recover_jobs()
+
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+        logger.info(f"✅ 合成任务服务已启动: {self.workers} 个工作协程, 恢复 {recovered} 个排队任务")
+
+    async def stop(self):
+        """停止任务工作协程（未完成的任务保留在存储中，下次启动时恢复）"""
+        for event in self._cancel_events.values():
+            event.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("🛑 合成任务服务已停止")
+
+    async def submit(self, text: str, page: str, profile: Optional[str] = None) -> Dict[str, Any]:
+        """提交合成任务，立即返回任务信息"""
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": JOB_QUEUED,
+            "text": text,
+            "page": page,
+            "profile": profile,
+            "progress": {"completed": 0, "total": 0},
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": None,
+        }
+        self._jobs[job["job_id"]] = job
+        self._persist(job)
+        await self._queue.put(job["job_id"])
+
+        logger.info("📥 合成任务已提交: %s (%d 字符, 页面: %s)", job["job_id"], len(text), page)
+        return self._public(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态"""
+        job = self._jobs.get(job_id)
+        return self._public(job) if job else None
+
+    def get_result_path(self, job_id: str) -> Optional[str]:
+        """获取已完成任务的结果文件路径，过期或不存在时返回None"""
+        job = self._jobs.get(job_id)
+        if not job or job["status"] != JOB_SUCCEEDED:
+            return None
+        if job["expires_at"] and job["expires_at"] < time.time():
+            return None
+        path = self._result_path(job_id)
+        return path if os.path.exists(path) else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消任务：排队中的任务直接取消，运行中的任务在下一个片段前停止"""
+        job = self._jobs.get(job_id)
+        if not job:
+            return None
+
+        if job["status"] == JOB_QUEUED:
+            self._update(job, status=JOB_CANCELLED)
+        elif job["status"] == JOB_RUNNING:
+            event = self._cancel_events.get(job_id)
+            if event is not None:
+                event.set()
+            logger.info("🛑 请求取消运行中的任务: %s", job_id)
+
+        return self._public(job)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """订阅任务进度事件，先推送当前状态"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        job = self._jobs.get(job_id)
+        if job:
+            queue.put_nowait(self._public(job))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        """取消订阅"""
+        queues = self._subscribers.get(job_id, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self._subscribers.pop(job_id, None)
+
+    async def _worker(self, worker_id: int):
+        """任务工作协程：从队列取任务并交给推理工作线程执行"""
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if not job or job["status"] != JOB_QUEUED:
+                continue
+
+            cancel_event = threading.Event()
+            self._cancel_events[job_id] = cancel_event
+            self._update(job, status=JOB_RUNNING)
+            logger.info("🎯 工作协程%d 开始执行任务: %s", worker_id, job_id)
+
+            loop = asyncio.get_running_loop()
+
+            def on_progress(completed: int, total: int, job=job):
+                loop.call_soon_threadsafe(
+                    self._update, job, progress={"completed": completed, "total": total}
+                )
+
+            try:
+                real_request = self.speculative.real_request() if self.speculative is not None else nullcontext()
+                async with real_request:
+                    audio_data = await self.synthesizer.synthesize_speech(
+                        text=job["text"],
+                        page=job["page"],
+                        progress_callback=on_progress,
+                        cancel_event=cancel_event,
+                        profile=job.get("profile")
+                    )
+                if not audio_data:
+                    self._update(job, status=JOB_FAILED, error="语音合成失败")
+                    continue
+
+                # 大的WAV结果在线程池中写入，不阻塞事件循环
+                await asyncio.get_running_loop().run_in_executor(None, self._write_result, job_id, audio_data)
+                self._update(
+                    job,
+                    status=JOB_SUCCEEDED,
+                    expires_at=time.time() + self.result_ttl_seconds
+                )
+                logger.info("✅ 任务完成: %s, 音频大小: %d bytes", job_id, len(audio_data))
+
+            except SynthesisCancelled:
+                self._update(job, status=JOB_CANCELLED)
+            except asyncio.CancelledError:
+                # 服务关闭：任务保持排队状态，重启后恢复
+                self._update(job, status=JOB_QUEUED)
+                raise
+            except Exception as e:
+                logger.error("❌ 任务执行失败 %s: %s", job_id, e)
+                self._update(job, status=JOB_FAILED, error=str(e))
+            finally:
+                self._cancel_events.pop(job_id, None)
+
+    async def _cleanup_loop(self):
+        """定期清理过期的任务结果"""
+        while True:
+            await asyncio.sleep(self.cleanup_interval_seconds)
+            try:
+                self._cleanup_expired()
+            except Exception as e:
+                logger.warning(f"⚠️ 清理过期任务失败: {e}")
+
+    def _cleanup_expired(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATES
+            and (job["expires_at"] or job["updated_at"] + self.result_ttl_seconds) < now
+        ]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            for path in (self._result_path(job_id), self._job_path(job_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+        if expired:
+            logger.info(f"🧹 已清理 {len(expired)} 个过期任务")
+
+    def _recover_jobs(self) -> int:
+        """从存储中加载任务，将排队中和中断的任务重新入队"""
+        recovered = 0
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ 读取任务文件失败 {name}: {e}")
+                continue
+
+            self._jobs[job["job_id"]] = job
+            if job["status"] in (JOB_QUEUED, JOB_RUNNING):
+                job["status"] = JOB_QUEUED
+                job["progress"] = {"completed": 0, "total": 0}
+                self._persist(job)
+                self._queue.put_nowait(job["job_id"])
+                recovered += 1
+
+        self._cleanup_expired()
+        return recovered
+
+    def _update(self, job: Dict[str, Any], **changes):
+        """更新任务状态、持久化并通知订阅者"""
+        job.update(changes)
+        job["updated_at"] = time.time()
+        if "status" in changes:
+            self._persist(job)
+
+        event = self._public(job)
+        for queue in self._subscribers.get(job["job_id"], []):
+            queue.put_nowait(event)
+
+    def _persist(self, job: Dict[str, Any]):
+        path = self._job_path(job["job_id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _write_result(self, job_id: str, audio_data: Union[bytes, memoryview]):
+        """写入任务结果（先写临时文件再替换，读取方不会看到写了一半的文件）"""
+        path = self._result_path(job_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio_data)
+        os.replace(tmp_path, path)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self.results_dir, f"{job_id}.wav")
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        """对外返回的任务信息（不包含完整文本）"""
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "page": job["page"],
+            "profile": job.get("profile"),
+            "progress": dict(job["progress"]),
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "expires_at": job["expires_at"],
+        }
@@ -0,0 +1,133 @@
+"""
+结构化日志
+日志记录在请求路径上只做%参数替换后入队（未启用的级别不会走到这一步），由后台线程格式化为JSON并写出；
+每条日志带请求ID，支持按阶段记录耗时，请求文本按配置截断
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# 当前请求ID（由HTTP中间件设置，推理线程通过复制上下文继承）
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+# 文本预览的最大长度与完整文本的采样率
+_text_limit = 32
+_payload_sample_rate = 0.0
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# LogRecord的标准属性，其余属性视为结构化字段
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _RequestContextQueueHandler(logging.handlers.QueueHandler):
+    """入队前记录请求ID并替换消息参数，JSON序列化与写出留给后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        # 参数可能是调用方之后还会修改的dict/list，在调用线程中替换为文本，后台线程看到的是记录时的值
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            # 异常对象无法跨线程安全保留，先格式化堆栈
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None):
+    """
+    配置队列日志
+
+    Args:
+        config: config.json中的logging配置
+            level: 日志级别
+            json: 是否输出JSON（否则沿用文本格式）
+            max_text_chars: 请求文本预览的最大字符数
+            payload_sample_rate: 完整记录请求文本的采样率（0~1）
+            file: 额外写入的日志文件
+    """
+    global _listener, _text_limit, _payload_sample_rate
+
+    config = config or {}
+    _text_limit = int(config.get("max_text_chars", 32))
+    _payload_sample_rate = float(config.get("payload_sample_rate", 0.0))
+
+    if config.get("json", True):
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if config.get("file"):
+        handlers.append(logging.handlers.WatchedFileHandler(config["file"], encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_RequestContextQueueHandler(log_queue))
+    root.setLevel(config.get("level", "INFO"))
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """停止后台日志线程并写出剩余日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def preview_text(text: str) -> str:
+    """请求文本的日志预览：按采样率保留全文，否则截断"""
+    if _payload_sample_rate and random.random() < _payload_sample_rate:
+        return text
+    if len(text) <= _text_limit:
+        return text
+    return f"{text[:_text_limit]}…(共{len(text)}字)"
+
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str):
+    """记录阶段耗时（毫秒）到timings字典"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
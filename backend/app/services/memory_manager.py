@@ -0,0 +1,286 @@
+"""
+内存预算管理
+统一登记常驻模型、缓存和变换对象及其占用，超出进程RSS或设备显存预算时
+先执行一次垃圾回收再测量，仍超出时按"闲置时长 × 占用"从高到低淘汰，
+直到被淘汰对象的登记占用抵消超出的部分（RSS在释放后通常不会立即下降，不以其为停止条件）。
+淘汰回调在释放管理器的锁之后执行，回调中可以获取其他锁
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:  # psutil为可选依赖，缺失时读取/proc
+    psutil = None
+
+CostType = Union[int, Callable[[], int]]
+
+
+def tensor_bytes(obj: Any) -> int:
+    """估算模块、张量或其容器占用的字节数"""
+    if obj is None:
+        return 0
+    if isinstance(obj, torch.Tensor):
+        return obj.numel() * obj.element_size()
+    if isinstance(obj, torch.nn.Module):
+        params = sum(p.numel() * p.element_size() for p in obj.parameters())
+        buffers = sum(b.numel() * b.element_size() for b in obj.buffers())
+        return params + buffers
+    if isinstance(obj, (list, tuple)):
+        return sum(tensor_bytes(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(tensor_bytes(item) for item in obj.values())
+    return 0
+
+
+def process_rss_bytes() -> int:
+    """当前进程的常驻内存（RSS）"""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def device_allocated_bytes() -> int:
+    """当前设备已分配的显存"""
+    if torch.cuda.is_available():
+        return torch.cuda.memory_allocated()
+    return 0
+
+
+class _Entry:
+    __slots__ = ("name", "obj", "cost", "on_evict", "pinned", "retain", "last_used")
+
+    def __init__(
+        self,
+        name: str,
+        obj: Any,
+        cost: CostType,
+        on_evict: Optional[Callable[[Any], None]],
+        pinned: bool,
+        retain: bool
+    ):
+        self.name = name
+        self.obj = obj
+        self.cost = cost
+        self.on_evict = on_evict
+        self.pinned = pinned
+        self.retain = retain
+        self.last_used = time.monotonic()
+
+    def cost_bytes(self) -> int:
+        try:
+            return int(self.cost() if callable(self.cost) else self.cost)
+        except Exception:
+            return 0
+
+
+class MemoryManager:
+    """常驻对象的内存预算管理器"""
+
+    def __init__(self, rss_budget_mb: int = 0, device_budget_mb: int = 0, resample_cache_entries: int = 8):
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.configure({
+            "rss_budget_mb": rss_budget_mb,
+            "device_budget_mb": device_budget_mb,
+            "resample_cache_entries": resample_cache_entries,
+        })
+        self.evictions = 0
+        self.collections = 0
+
+    def configure(self, config: Dict[str, Any]):
+        """从config.json中的memory配置更新预算（0表示不限制）"""
+        self.rss_budget = int(config.get("rss_budget_mb", 0)) * 1024 * 1024
+        self.device_budget = int(config.get("device_budget_mb", 0)) * 1024 * 1024
+        self.resample_cache_entries = max(1, int(config.get("resample_cache_entries", 8)))
+
+    def register(
+        self,
+        name: str,
+        obj: Any,
+        cost: CostType,
+        on_evict: Optional[Callable[[Any], None]] = None,
+        pinned: bool = False,
+        retain: bool = False
+    ):
+        """
+        登记常驻对象
+
+        Args:
+            name: 唯一名称，重复登记会替换旧条目
+            obj: 对象本身
+            cost: 占用字节数，或在需要时计算占用的函数
+            on_evict: 淘汰时的回调，负责释放对象的引用（在管理器的锁之外调用）
+            pinned: 固定的对象不参与淘汰
+            retain: 淘汰时只调用回调（如清空缓存），保留登记继续跟踪占用
+        """
+        with self._lock:
+            self._entries[name] = _Entry(name, obj, cost, on_evict, pinned, retain)
+            self._entries.move_to_end(name)
+
+    def get(self, name: str) -> Any:
+        """获取对象并刷新最近使用时间，不存在时返回None"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(name)
+            return entry.obj
+
+    def touch(self, name: str):
+        """刷新对象的最近使用时间"""
+        self.get(name)
+
+    def unregister(self, name: str) -> Any:
+        """移除登记（不调用淘汰回调），返回对象"""
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            return entry.obj if entry else None
+
+    def get_or_create(self, name: str, factory: Callable[[], Any], cost: CostType = 0, group_limit: Optional[int] = None) -> Any:
+        """
+        获取对象，不存在时创建并登记
+
+        Args:
+            group_limit: 同前缀（name中第一个":"之前的部分）对象的最大数量，超出时淘汰最久未用的
+        """
+        obj = self.get(name)
+        if obj is not None:
+            return obj
+
+        obj = factory()
+        self.register(name, obj, cost)
+
+        if group_limit is not None:
+            prefix = name.split(":", 1)[0] + ":"
+            with self._lock:
+                group = [n for n in self._entries if n.startswith(prefix)]
+                victims = [self._detach(self._entries[n]) for n in group[:max(0, len(group) - group_limit)]]
+            for victim in victims:
+                self._release(victim)
+        return obj
+
+    def over_budget(self) -> bool:
+        """是否超出RSS或显存预算"""
+        if self.rss_budget and process_rss_bytes() > self.rss_budget:
+            return True
+        if self.device_budget and device_allocated_bytes() > self.device_budget:
+            return True
+        return False
+
+    def _excess_bytes(self) -> int:
+        """超出RSS或显存预算的字节数（取两者中较大的），未超出时为0"""
+        excess = 0
+        if self.rss_budget:
+            excess = max(excess, process_rss_bytes() - self.rss_budget)
+        if self.device_budget:
+            excess = max(excess, device_allocated_bytes() - self.device_budget)
+        return excess
+
+    def enforce(self, protect: Iterable[str] = ()) -> int:
+        """
+        检查内存预算，超出时淘汰常驻对象并执行回收
+
+        超预算时先回收一次再测量超出量；仍超出时按"闲置时长 × 占用"从高到低淘汰，
+        被淘汰对象的登记占用之和达到超出量即停止，最后再回收一次
+
+        Args:
+            protect: 本次不淘汰的对象名称（如请求路径上正在使用的TTS管道和当前权重）
+
+        Returns:
+            本次淘汰的对象数
+        """
+        if not self.over_budget():
+            return 0
+        self._collect()
+        excess = self._excess_bytes()
+        if excess <= 0:
+            return 0
+
+        protected = set(protect)
+        freed = 0
+        victims = []
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                (e, e.cost_bytes()) for e in self._entries.values()
+                if not e.pinned and e.name not in protected
+            ]
+            candidates = [(e, cost) for e, cost in candidates if cost > 0]
+            candidates.sort(key=lambda item: (now - item[0].last_used + 1.0) * item[1], reverse=True)
+            for entry, cost in candidates:
+                if freed >= excess:
+                    break
+                victims.append(self._detach(entry, cost))
+                freed += cost
+
+        if freed < excess:
+            logger.warning("⚠️ 内存仍超出预算，但没有更多可淘汰的对象（超出 %.1fMB）", (excess - freed) / 1024 / 1024)
+        for victim in victims:
+            self._release(victim)
+        if victims:
+            self._collect()
+        return len(victims)
+
+    def _detach(self, entry: _Entry, cost: Optional[int] = None):
+        """从登记中移除（保留登记的对象除外），须在持有锁时调用；回调由_release在锁外执行"""
+        if not entry.retain:
+            self._entries.pop(entry.name, None)
+        self.evictions += 1
+        return entry, entry.cost_bytes() if cost is None else cost
+
+    @staticmethod
+    def _release(victim):
+        entry, cost = victim
+        logger.info("🧹 淘汰常驻对象: %s (%.1fMB)", entry.name, cost / 1024 / 1024)
+        if entry.on_evict is not None:
+            try:
+                entry.on_evict(entry.obj)
+            except Exception as e:
+                logger.warning("⚠️ 淘汰回调失败 %s: %s", entry.name, e)
+
+    def _collect(self):
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        self.collections += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """内存使用与登记对象统计"""
+        with self._lock:
+            entries = {
+                name: {
+                    "megabytes": round(e.cost_bytes() / 1024 / 1024, 2),
+                    "idle_seconds": round(time.monotonic() - e.last_used, 1),
+                    "pinned": e.pinned,
+                }
+                for name, e in self._entries.items()
+            }
+        return {
+            "rss_mb": round(process_rss_bytes() / 1024 / 1024, 1),
+            "rss_budget_mb": self.rss_budget // (1024 * 1024),
+            "device_mb": round(device_allocated_bytes() / 1024 / 1024, 1),
+            "device_budget_mb": self.device_budget // (1024 * 1024),
+            "evictions": self.evictions,
+            "collections": self.collections,
+            "entries": entries,
+        }
+
+
+# 进程内共享的内存管理器，由GPTSoVITSService按配置初始化
+memory_manager = MemoryManager()
@@ -0,0 +1,225 @@
+"""
+预渲染短语库
+常用语句（兜底回复、问候语、页面介绍等）在启动时或通过离线命令预先合成，
+与模型存放在一起，合成请求按原文或规范化文本命中时直接返回，无需推理。
+语音模型或参考音频变化时自动重新渲染。
+
+离线渲染（在backend目录下执行）:
+    python -m app.services.phrase_bank [--page tts-chat] [--force]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_phrase(text: str) -> str:
+    """规范化短语：全半角统一、去除空白和标点，仅保留文字与数字"""
+    text = unicodedata.normalize("NFKC", text)
+    return "".join(char for char in text if char.isalnum()).lower()
+
+
+class PhraseBank:
+    """按页面组织的预渲染短语库"""
+
+    def __init__(self, synthesizer, bank_dir: str, common_phrases: Optional[List[str]] = None):
+        self.synthesizer = synthesizer
+        self.bank_dir = bank_dir
+        self.common_phrases = list(common_phrases or [])
+        self._lock = threading.Lock()
+
+        # 页面 -> 清单（fingerprint, phrases: 规范化文本 -> 条目）
+        self._manifests: Dict[str, Dict[str, Any]] = {}
+        # 音频文件路径 -> 音频内容
+        self._audio_cache: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_config(cls, synthesizer, config: Dict[str, Any]) -> "PhraseBank":
+        """从config.json中的phrase_bank配置创建"""
+        from app.services.deepseek_service import FALLBACK_REPLY
+
+        common_phrases = config.get("common_phrases", [])
+        if FALLBACK_REPLY not in common_phrases:
+            common_phrases = [FALLBACK_REPLY] + common_phrases
+
+        return cls(
+            synthesizer,
+            bank_dir=synthesizer._resolve_backend_path(config.get("bank_dir", "../models/GPT-SoVITS/phrase_bank")),
+            common_phrases=common_phrases
+        )
+
+    def phrases_for_page(self, page: str) -> List[str]:
+        """页面需要预渲染的短语：通用短语 + 页面配置中的phrase_bank"""
+        page_phrases = self.synthesizer.get_page_config(page).get("phrase_bank", [])
+        phrases = []
+        seen = set()
+        for phrase in self.common_phrases + page_phrases:
+            key = normalize_phrase(phrase)
+            if key and key not in seen:
+                seen.add(key)
+                phrases.append(phrase)
+        return phrases
+
+    def lookup(self, text: str, page: str) -> Optional[bytes]:
+        """
+        查找预渲染音频
+
+        先按原文精确匹配，再按规范化文本匹配；语音指纹与渲染时不一致时视为未命中。
+        """
+        manifest = self._load_manifest(page)
+        if not manifest or not manifest.get("phrases"):
+            return None
+
+        key = normalize_phrase(text)
+        entry = manifest["phrases"].get(key)
+        if entry is None:
+            return None
+        if manifest.get("fingerprint") != self.synthesizer.get_voice_fingerprint(page):
+            return None
+
+        match = "精确" if entry["text"] == text else "规范化"
+        audio_data = self._read_audio(os.path.join(self.bank_dir, page, entry["file"]))
+        if audio_data:
+            logger.info("⚡ 命中预渲染短语（%s匹配）: %s (页面: %s)", match, entry["text"][:30], page)
+        return audio_data
+
+    async def render_all(self, force: bool = False):
+        """渲染所有页面的短语库"""
+        for page in self.synthesizer.config.get("pages", {}):
+            await self.render_page(page, force=force)
+
+    async def render_page(self, page: str, force: bool = False) -> int:
+        """
+        渲染页面短语库，仅合成缺失的短语；语音指纹变化或force时全部重新渲染
+
+        Returns:
+            本次合成的短语数
+        """
+        phrases = self.phrases_for_page(page)
+        if not phrases:
+            return 0
+
+        fingerprint = self.synthesizer.get_voice_fingerprint(page)
+        manifest = self._load_manifest(page) or {}
+        if force or manifest.get("fingerprint") != fingerprint:
+            if manifest:
+                logger.info(f"🔄 页面 '{page}' 的语音模型或参考音频已变化，重新渲染短语库")
+            manifest = {"fingerprint": fingerprint, "phrases": {}}
+
+        page_dir = os.path.join(self.bank_dir, page)
+        os.makedirs(page_dir, exist_ok=True)
+
+        rendered = 0
+        for phrase in phrases:
+            key = normalize_phrase(phrase)
+            entry = manifest["phrases"].get(key)
+            if entry and os.path.exists(os.path.join(page_dir, entry["file"])):
+                continue
+
+            audio_data = await self.synthesizer.synthesize_speech(phrase, page, use_phrase_bank=False)
+            if not audio_data:
+                logger.warning(f"⚠️ 短语渲染失败: {phrase[:30]} (页面: {page})")
+                continue
+
+            file_name = f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.wav"
+            with open(os.path.join(page_dir, file_name), "wb") as f:
+                f.write(audio_data)
+            manifest["phrases"][key] = {"text": phrase, "file": file_name, "bytes": len(audio_data)}
+            rendered += 1
+
+            # 每渲染一条即保存清单，中断后可继续
+            self._save_manifest(page, manifest)
+
+        self._save_manifest(page, manifest)
+        logger.info(f"✅ 页面 '{page}' 短语库就绪: 共 {len(manifest['phrases'])} 条, 本次渲染 {rendered} 条")
+        return rendered
+
+    def _manifest_path(self, page: str) -> str:
+        return os.path.join(self.bank_dir, page, "manifest.json")
+
+    def _load_manifest(self, page: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if page in self._manifests:
+                return self._manifests[page]
+
+        path = self._manifest_path(page)
+        manifest = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ 读取短语库清单失败 {path}: {e}")
+
+        with self._lock:
+            self._manifests[page] = manifest
+        return manifest
+
+    def _save_manifest(self, page: str, manifest: Dict[str, Any]):
+        path = self._manifest_path(page)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._manifests[page] = manifest
+            self._audio_cache.clear()
+
+    def _read_audio(self, path: str) -> Optional[bytes]:
+        with self._lock:
+            audio_data = self._audio_cache.get(path)
+        if audio_data is not None:
+            return audio_data
+
+        try:
+            with open(path, "rb") as f:
+                audio_data = f.read()
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            self._audio_cache[path] = audio_data
+        return audio_data
+
+    def stats(self) -> Dict[str, Any]:
+        """短语库统计信息"""
+        with self._lock:
+            return {
+                page: len(manifest.get("phrases", {})) if manifest else 0
+                for page, manifest in self._manifests.items()
+            }
+
+
+def main():
+    """离线渲染短语库"""
+    parser = argparse.ArgumentParser(description="预渲染GPT-SoVITS短语库")
+    parser.add_argument("--page", help="只渲染指定页面，默认渲染所有页面")
+    parser.add_argument("--force", action="store_true", help="忽略已有结果，全部重新渲染")
+    parser.add_argument("--config", default="./config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from app.services.gpt_sovits_service import GPTSoVITSService
+    service = GPTSoVITSService(args.config)
+
+    if args.page:
+        asyncio.run(service.phrase_bank.render_page(args.page, force=args.force))
+    else:
+        asyncio.run(service.phrase_bank.render_all(force=args.force))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+按需性能剖析
+通过管理接口开启后，对接下来的N次合成请求或T秒内的合成请求进行剖析，
+输出Chrome Trace（torch.profiler）或speedscope（采样剖析）文件，完成后自动关闭。
+未开启时只做一次属性判断，不产生额外开销
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+_NULL_CONTEXT = nullcontext()
+
+PROFILE_MODES = ("torch", "sampling")
+
+
+class _StackSampler:
+    """采样剖析器：后台线程定期采集目标线程的调用栈，输出speedscope格式"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames: List[Dict[str, Any]] = []
+        self._frame_index: Dict[tuple, int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._ended = time.perf_counter()
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_name, code.co_filename, code.co_firstlineno)
+                index = self._frame_index.get(key)
+                if index is None:
+                    index = len(self.frames)
+                    self._frame_index[key] = index
+                    self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+                stack.append(index)
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self._ended - self._started,
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+            "exporter": "gpt-sovits-backend",
+        }
+
+
+class ProfilerService:
+    """合成请求的按需剖析"""
+
+    def __init__(self, output_dir: str, sampling_interval_ms: float = 5.0):
+        self.output_dir = output_dir
+        self.sampling_interval = sampling_interval_ms / 1000.0
+        self._lock = threading.Lock()
+
+        # 是否处于剖析状态（热路径只读取该属性）
+        self.armed = False
+        self.mode = "torch"
+        self._remaining_requests: Optional[int] = None
+        self._deadline: Optional[float] = None
+        # T秒到期时关闭剖析，不依赖下一次请求来检查截止时间
+        self._timer: Optional[threading.Timer] = None
+        self._active_torch_profiles = 0
+        self._active_captures = 0
+        self.files: List[str] = []
+
+    @classmethod
+    def from_config(cls, synthesizer, config: Dict[str, Any]) -> "ProfilerService":
+        """从config.json中的profiler配置创建"""
+        return cls(
+            synthesizer._resolve_backend_path(config.get("output_dir", "./data/profiles")),
+            sampling_interval_ms=config.get("sampling_interval_ms", 5.0)
+        )
+
+    def arm(self, mode: str = "torch", requests: Optional[int] = None, seconds: Optional[float] = None):
+        """
+        开启剖析
+
+        Args:
+            mode: torch（torch.profiler，输出Chrome Trace）或 sampling（采样剖析，输出speedscope）
+            requests: 剖析接下来的N次合成请求
+            seconds: 剖析T秒内开始的合成请求；两者都未指定时默认剖析1次请求
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"不支持的剖析模式: {mode}")
+        if requests is None and seconds is None:
+            requests = 1
+
+        with self._lock:
+            self._cancel_timer()
+            self.mode = mode
+            self._remaining_requests = requests
+            self._deadline = time.monotonic() + seconds if seconds else None
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.armed = True
+            if seconds:
+                self._timer = threading.Timer(seconds, self._expire, args=(self._deadline,))
+                self._timer.daemon = True
+                self._timer.start()
+
+        logger.info(f"🔬 性能剖析已开启: mode={mode}, requests={requests}, seconds={seconds}")
+
+    def disarm(self):
+        """关闭剖析"""
+        with self._lock:
+            was_armed = self.armed
+            self._cancel_timer()
+            self.armed = False
+            self._remaining_requests = None
+            self._deadline = None
+        if was_armed:
+            logger.info("🔬 性能剖析已关闭")
+
+    def _expire(self, deadline: float):
+        """定时器回调：剖析时间到期后关闭；已开始的请求剖析在请求结束时照常写出"""
+        with self._lock:
+            if self._deadline != deadline or not self.armed:
+                return
+            self._timer = None
+            self.armed = False
+            self._remaining_requests = None
+            self._deadline = None
+            in_flight = self._active_captures
+        logger.info(f"🔬 剖析时间已到，性能剖析自动关闭（进行中的剖析: {in_flight}）")
+
+    def _cancel_timer(self):
+        """取消到期定时器（需持有锁）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def profile_request(self, label: str):
+        """包裹一次合成请求；未开启时返回空上下文"""
+        if not self.armed:
+            return _NULL_CONTEXT
+        return self._profile_request(label)
+
+    def stage(self, name: str):
+        """标记请求内的阶段（在torch trace中显示为record_function区间）"""
+        if not self._active_torch_profiles:
+            return _NULL_CONTEXT
+        return torch.profiler.record_function(f"stage::{name}")
+
+    def _claim(self) -> Optional[str]:
+        """为一次请求占用剖析名额，返回剖析模式；名额或时间用尽时自动关闭"""
+        exhausted = False
+        with self._lock:
+            if not self.armed:
+                return None
+            if self._deadline is not None and time.monotonic() > self._deadline:
+                self.armed = False
+                return None
+            if self._remaining_requests is not None:
+                if self._remaining_requests <= 0:
+                    self.armed = False
+                    return None
+                self._remaining_requests -= 1
+                if self._remaining_requests == 0:
+                    # N次与T秒同时指定时，先用尽者生效
+                    self.armed = False
+                    self._deadline = None
+                    self._cancel_timer()
+                    exhausted = True
+            self._active_captures += 1
+            mode = self.mode
+        if exhausted:
+            logger.info("🔬 剖析名额已用完，性能剖析自动关闭")
+        return mode
+
+    @contextmanager
+    def _profile_request(self, label: str):
+        mode = self._claim()
+        if mode is None:
+            yield
+            return
+
+        try:
+            base_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{os.getpid()}-{threading.get_ident()}"
+            if mode == "torch":
+                activities = [torch.profiler.ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+                with self._lock:
+                    self._active_torch_profiles += 1
+                try:
+                    with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+                        yield
+                finally:
+                    with self._lock:
+                        self._active_torch_profiles -= 1
+                self._export_torch(prof, base_name)
+            else:
+                sampler = _StackSampler(threading.get_ident(), self.sampling_interval)
+                sampler.start()
+                try:
+                    yield
+                finally:
+                    sampler.stop()
+                self._write_json(f"{base_name}.speedscope.json", sampler.to_speedscope(label))
+        finally:
+            with self._lock:
+                self._active_captures -= 1
+
+    def _export_torch(self, prof, base_name: str):
+        """导出Chrome Trace及按算子汇总的CPU耗时"""
+        trace_path = os.path.join(self.output_dir, f"{base_name}.trace.json")
+        prof.export_chrome_trace(trace_path)
+        self._add_file(trace_path)
+
+        operators = [
+            {
+                "name": event.key,
+                "count": event.count,
+                "cpu_time_total_us": event.cpu_time_total,
+                "self_cpu_time_total_us": event.self_cpu_time_total,
+            }
+            for event in prof.key_averages()
+        ]
+        operators.sort(key=lambda item: item["self_cpu_time_total_us"], reverse=True)
+        self._write_json(f"{base_name}.operators.json", operators)
+
+    def _write_json(self, file_name: str, data: Any):
+        path = os.path.join(self.output_dir, file_name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        self._add_file(path)
+
+    def _add_file(self, path: str):
+        with self._lock:
+            self.files.append(path)
+        logger.info(f"🔬 剖析结果已写入: {path}")
+
+    def status(self) -> Dict[str, Any]:
+        """剖析状态与已生成的文件"""
+        with self._lock:
+            remaining_seconds = max(0.0, self._deadline - time.monotonic()) if self._deadline else None
+            return {
+                "armed": self.armed,
+                "mode": self.mode,
+                "remaining_requests": self._remaining_requests,
+                "remaining_seconds": round(remaining_seconds, 1) if remaining_seconds is not None else None,
+                "output_dir": self.output_dir,
+                "files": [os.path.basename(path) for path in self.files[-50:]],
+            }
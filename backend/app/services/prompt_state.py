@@ -0,0 +1,128 @@
+"""
+参考prompt状态缓存
+同一语音的每次合成都使用相同的前缀：参考音频的语义token、频谱（v2Pro还有说话人向量），
+以及参考文本的音素与BERT特征。上游管道只保留最近一次设置的参考音频，切换页面后
+set_ref_audio需要重新执行CNHuBERT编码、VITS量化和频谱计算，参考文本也要重新提取特征。
+
+本缓存为每个 (SoVITS权重, 参考音频) 保存管道prompt_cache的快照，常驻内存（由内存管理器统一淘汰），
+切换回该语音时把快照复制回管道（只复制容器，张量共享，上游不会就地修改这些张量），
+跳过上述全部编码。键中包含参考音频和SoVITS权重文件的修改时间与大小，任一文件被替换后旧状态失效。
+
+T2S对 [参考音素; 目标音素] 做双向注意力，参考前缀在Transformer中的注意力状态依赖于新文本，
+无法在请求间复用；Transformer之前的部分全部复用，每个请求的编码只涉及新文本
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.memory_manager import memory_manager, tensor_bytes
+
+logger = logging.getLogger(__name__)
+
+_NAME_PREFIX = "prompt_state:"
+
+
+def _file_fingerprint(path: str) -> Tuple[int, int]:
+    """文件的修改时间与大小，文件不存在时为 (0, 0)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0, 0
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _copy_state(prompt_cache: Dict[str, Any]) -> Dict[str, Any]:
+    """复制prompt_cache的容器（上游会就地替换refer_spec等列表中的元素），张量共享"""
+    return {
+        name: list(value) if isinstance(value, list) else value
+        for name, value in prompt_cache.items()
+    }
+
+
+class PromptStateCache:
+    """各语音参考prompt状态的常驻缓存"""
+
+    def __init__(self, enabled: bool = True, max_entries: int = 8):
+        self.enabled = enabled
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        # (SoVITS权重, 参考音频) -> 当前有效的状态键，文件指纹变化时用于移除旧状态
+        self._current: Dict[Tuple[str, str], str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PromptStateCache":
+        """从config.json中的prompt_state配置创建"""
+        return cls(
+            enabled=config.get("enabled", True),
+            max_entries=config.get("max_entries", 8)
+        )
+
+    def state_key(self, sovits_path: str, ref_audio_path: str) -> str:
+        """参考prompt状态的键：SoVITS权重与参考音频的路径及文件指纹"""
+        raw = "|".join(map(str, (
+            os.path.abspath(sovits_path), *_file_fingerprint(sovits_path),
+            os.path.abspath(ref_audio_path), *_file_fingerprint(ref_audio_path),
+        )))
+        key = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            previous = self._current.get((sovits_path, ref_audio_path))
+            self._current[(sovits_path, ref_audio_path)] = key
+        if previous is not None and previous != key:
+            # 参考音频或权重文件已被替换
+            if memory_manager.unregister(_NAME_PREFIX + previous) is not None:
+                self.invalidations += 1
+                logger.info("🔄 参考音频或SoVITS权重已变化，丢弃旧的参考prompt状态: %s", ref_audio_path)
+        return key
+
+    def restore(self, pipeline: Any, key: str) -> bool:
+        """把缓存的状态复制回管道，命中时返回True"""
+        if not self.enabled:
+            return False
+        state = memory_manager.get(_NAME_PREFIX + key)
+        if state is None:
+            self.misses += 1
+            return False
+        pipeline.prompt_cache.update(_copy_state(state))
+        self.hits += 1
+        return True
+
+    def save(self, pipeline: Any, key: str):
+        """
+        保存管道当前的prompt状态（在一次推理完成后调用，此时参考文本特征也已计算）
+
+        已保存且参考文本未变化时不重复保存
+        """
+        if not self.enabled:
+            return
+        name = _NAME_PREFIX + key
+        prompt_cache = pipeline.prompt_cache
+        state: Optional[Dict[str, Any]] = memory_manager.get(name)
+        if state is not None and state.get("prompt_text") == prompt_cache.get("prompt_text"):
+            return
+
+        snapshot = _copy_state(prompt_cache)
+        memory_manager.unregister(name)
+        memory_manager.get_or_create(
+            name,
+            lambda: snapshot,
+            cost=tensor_bytes(snapshot),
+            group_limit=self.max_entries
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
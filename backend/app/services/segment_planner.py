@@ -0,0 +1,362 @@
+"""
+文本片段规划器
+位于文本切分与推理之间：合并过短片段、在韵律边界处拆分过长片段，
+并将片段按长度分桶后再组批，减少批内填充带来的无效计算。
+分桶在相邻片段组成的窗口内按长度排序进行，桶内片段可以不相邻，
+合成后按片段边界切分各桶音频并还原原文顺序
+"""
+
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# cut5 使用的切分标点
+SPLIT_PUNCTUATION = {",", ".", ";", "?", "!", "、", "，", "。", "？", "！", "；", "：", "…"}
+
+# 句末标点（强边界），用于流式输入的句子边界判断
+SENTENCE_END_PUNCTUATION = {".", "?", "!", "。", "？", "！", "…", ";", "；"}
+
+# 拆分过长片段时依次尝试的韵律边界（由强到弱）
+PROSODIC_BOUNDARIES = [
+    SENTENCE_END_PUNCTUATION,
+    {",", "，", "：", ":"},
+    {"、"},
+    {" ", "　"},
+]
+
+# TTS管道会把短于此字符数的行与相邻行合并，这样的片段无法从批次音频中单独切出
+PIPELINE_MIN_TEXT_CHARS = 5
+
+_NON_SPEECH_RE = re.compile(r"[\s" + re.escape("".join(SPLIT_PUNCTUATION)) + r"]")
+
+
+def segment_length(text: str) -> int:
+    """片段的有效长度（不计空白与标点），近似对应音素序列长度"""
+    return len(_NON_SPEECH_RE.sub("", text))
+
+
+def split_text(text: str) -> List[str]:
+    """
+    按标点切分文本（与cut5行为一致：每个标点后切分，数字中的小数点除外）
+
+    Args:
+        text: 待切分文本
+
+    Returns:
+        片段列表（保留标点）
+    """
+    text = text.strip("\n")
+    segments = []
+    current = []
+    for i, char in enumerate(text):
+        current.append(char)
+        if char in SPLIT_PUNCTUATION:
+            if char == "." and 0 < i < len(text) - 1 and text[i - 1].isdigit() and text[i + 1].isdigit():
+                continue
+            segments.append("".join(current))
+            current = []
+    if current:
+        segments.append("".join(current))
+
+    return [seg.strip() for seg in segments if segment_length(seg) > 0]
+
+
+def find_sentence_boundary(text: str) -> int:
+    """
+    查找文本中最后一个完整句子的结束位置（用于增量输入的句子缓冲）
+
+    位于文本末尾、紧跟数字的"."可能是小数点，此时等待后续输入再判断。
+
+    Returns:
+        最后一个句末标点之后的偏移，没有完整句子时返回0
+    """
+    for i in range(len(text) - 1, -1, -1):
+        char = text[i]
+        if char not in SENTENCE_END_PUNCTUATION:
+            continue
+        if char == "." and i > 0 and text[i - 1].isdigit():
+            if i == len(text) - 1 or text[i + 1].isdigit():
+                continue
+        return i + 1
+    return 0
+
+
+@dataclass
+class Segment:
+    """规划后的文本片段"""
+    index: int
+    text: str
+    length: int
+
+
+@dataclass
+class SegmentBucket:
+    """长度相近的一组片段（同一窗口内，按原文顺序排列），作为一个推理批次"""
+    index: int
+    segments: List[Segment] = field(default_factory=list)
+
+    @property
+    def texts(self) -> List[str]:
+        return [seg.text for seg in self.segments]
+
+    @property
+    def max_length(self) -> int:
+        return max((seg.length for seg in self.segments), default=0)
+
+    @property
+    def total_length(self) -> int:
+        return sum(seg.length for seg in self.segments)
+
+    @property
+    def padding_ratio(self) -> float:
+        """批内填充占比：1 - 有效长度 / (最大长度 * 批大小)"""
+        padded = self.max_length * len(self.segments)
+        return 1.0 - self.total_length / padded if padded else 0.0
+
+
+@dataclass
+class BucketResult:
+    """一个桶的合成结果"""
+    sr: int
+    audio: Any  # 16bit PCM（numpy数组），桶内各片段依次拼接
+    elapsed: float
+    cached_segments: int = 0
+    # 桶内各片段音频的结束位置（采样点），无法按片段切分时为None
+    segment_ends: Optional[List[int]] = None
+
+    def splittable(self, bucket: "SegmentBucket") -> bool:
+        """结果能否按片段切分（单片段的桶总是可以）"""
+        if len(bucket.segments) == 1:
+            return True
+        return self.segment_ends is not None and len(self.segment_ends) == len(bucket.segments)
+
+
+@dataclass
+class SegmentPlan:
+    """一次合成请求的片段规划结果"""
+    segments: List[Segment]
+    buckets: List[SegmentBucket]
+
+    @property
+    def padding_ratio(self) -> float:
+        padded = sum(b.max_length * len(b.segments) for b in self.buckets)
+        total = sum(b.total_length for b in self.buckets)
+        return 1.0 - total / padded if padded else 0.0
+
+    def ordered_audio(self, results: List[BucketResult]) -> List[Any]:
+        """
+        按片段边界切分各桶音频，返回与segments一一对应、按原文顺序排列的音频片段（切片视图，不复制）
+
+        Args:
+            results: 与buckets一一对应的合成结果
+
+        Raises:
+            ValueError: 有多片段的桶无法按片段切分（调用方须先逐片段重新合成这样的桶）
+        """
+        parts: List[Optional[Any]] = [None] * len(self.segments)
+        for bucket, result in zip(self.buckets, results):
+            if not result.splittable(bucket):
+                raise ValueError(f"桶{bucket.index}无法按片段切分")
+            if len(bucket.segments) == 1:
+                parts[bucket.segments[0].index] = result.audio
+                continue
+            start = 0
+            for seg, end in zip(bucket.segments, result.segment_ends):
+                parts[seg.index] = result.audio[start:end]
+                start = end
+        return parts
+
+
+class SegmentPlanner:
+    """文本片段规划器"""
+
+    def __init__(
+        self,
+        min_segment_chars: int = 6,
+        max_segment_chars: int = 60,
+        max_batch_size: int = 4,
+        bucket_ratio: float = 1.5,
+        bucket_window: int = 16
+    ):
+        self.min_segment_chars = max(1, int(min_segment_chars))
+        self.max_segment_chars = max(self.min_segment_chars, int(max_segment_chars))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.bucket_ratio = max(1.0, float(bucket_ratio))
+        self.bucket_window = max(1, int(bucket_window))
+
+        # 按批大小汇总的运行统计
+        self._lock = threading.Lock()
+        self._bucket_stats: Dict[int, Dict[str, float]] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "SegmentPlanner":
+        """从config.json中的segment_planner配置创建"""
+        return cls(
+            min_segment_chars=config.get("min_segment_chars", 6),
+            max_segment_chars=config.get("max_segment_chars", 60),
+            max_batch_size=config.get("max_batch_size", 4),
+            bucket_ratio=config.get("bucket_ratio", 1.5),
+            bucket_window=config.get("bucket_window", 16)
+        )
+
+    def plan(self, text: str, max_batch_size: Optional[int] = None) -> SegmentPlan:
+        """
+        规划片段与批次
+
+        Args:
+            text: 待合成文本
+            max_batch_size: 覆盖默认的最大批大小
+
+        Returns:
+            片段规划结果，桶按原文顺序排列
+        """
+        segments = [Segment(index=i, text=t, length=segment_length(t)) for i, t in enumerate(self._pieces(text))]
+        buckets = self._bucketize(segments, max_batch_size or self.max_batch_size)
+        return SegmentPlan(segments=segments, buckets=buckets)
+
+    def plan_items(self, texts: List[str], max_batch_size: Optional[int] = None) -> Tuple[SegmentPlan, List[range]]:
+        """
+        把多条文本的片段规划为一个整体（批量合成），不同条目的片段可以分入同一个桶
+
+        Args:
+            texts: 各条待合成文本
+            max_batch_size: 覆盖默认的最大批大小
+
+        Returns:
+            (片段规划结果, 各条文本的片段在plan.segments中的下标范围)
+        """
+        segments: List[Segment] = []
+        spans: List[range] = []
+        for text in texts:
+            start = len(segments)
+            for piece in self._pieces(text):
+                segments.append(Segment(index=len(segments), text=piece, length=segment_length(piece)))
+            spans.append(range(start, len(segments)))
+        buckets = self._bucketize(segments, max_batch_size or self.max_batch_size)
+        return SegmentPlan(segments=segments, buckets=buckets), spans
+
+    def _pieces(self, text: str) -> List[str]:
+        """切分文本，拆分过长片段并合并过短片段"""
+        pieces = []
+        for piece in split_text(text):
+            pieces.extend(self._split_long(piece))
+        return self._merge_short(pieces)
+
+    def _merge_short(self, pieces: List[str]) -> List[str]:
+        """将过短片段并入相邻片段（合并后不超过最大长度）"""
+        merged: List[str] = []
+        for piece in pieces:
+            if merged and (
+                segment_length(merged[-1]) < self.min_segment_chars
+                or segment_length(piece) < self.min_segment_chars
+            ) and segment_length(merged[-1]) + segment_length(piece) <= self.max_segment_chars:
+                merged[-1] = merged[-1] + piece
+            else:
+                merged.append(piece)
+        return merged
+
+    def _split_long(self, piece: str) -> List[str]:
+        """在韵律边界处拆分过长片段，找不到边界时按最大长度硬切"""
+        if segment_length(piece) <= self.max_segment_chars:
+            return [piece]
+
+        for boundaries in PROSODIC_BOUNDARIES:
+            cut = self._find_cut(piece, boundaries)
+            if cut is not None:
+                head, tail = piece[:cut].strip(), piece[cut:].strip()
+                return self._split_long(head) + self._split_long(tail)
+
+        cut = self._char_offset(piece, self.max_segment_chars)
+        return [piece[:cut]] + self._split_long(piece[cut:])
+
+    def _find_cut(self, piece: str, boundaries: set) -> Optional[int]:
+        """在最大长度范围内寻找最靠近中点的边界位置（返回边界之后的偏移）"""
+        limit = self._char_offset(piece, self.max_segment_chars)
+        middle = len(piece) / 2
+        best = None
+        for i, char in enumerate(piece[:limit]):
+            if char in boundaries and 0 < i + 1 < len(piece):
+                if segment_length(piece[:i + 1]) < self.min_segment_chars:
+                    continue
+                if best is None or abs(i + 1 - middle) < abs(best - middle):
+                    best = i + 1
+        return best
+
+    @staticmethod
+    def _char_offset(piece: str, length: int) -> int:
+        """返回包含 length 个有效字符所需的字符偏移"""
+        count = 0
+        for i, char in enumerate(piece):
+            if not _NON_SPEECH_RE.match(char):
+                count += 1
+                if count >= length:
+                    return i + 1
+        return len(piece)
+
+    def _bucketize(self, segments: List[Segment], max_batch_size: int) -> List[SegmentBucket]:
+        """
+        在窗口内将长度相近的片段分入同一个桶
+
+        每bucket_window个相邻片段为一个窗口，窗口内按长度排序后依次装桶，桶内片段可以不相邻。
+        桶内与桶之间都按首个片段的原文位置排列，窗口限制了片段被提前合成的范围；
+        合成后由SegmentPlan.ordered_audio按片段边界还原原文顺序。
+        管道会与相邻行合并的过短片段单独成桶。
+        """
+        buckets: List[SegmentBucket] = []
+        for start in range(0, len(segments), self.bucket_window):
+            window = segments[start:start + self.bucket_window]
+            groups: List[List[Segment]] = []
+            current: Optional[List[Segment]] = None
+            for seg in sorted(window, key=lambda s: (s.length, s.index)):
+                if len(seg.text) < PIPELINE_MIN_TEXT_CHARS:
+                    groups.append([seg])
+                    continue
+                # 已按长度升序排列，桶内首个片段最短
+                if (current is not None and len(current) < max_batch_size
+                        and seg.length <= self.bucket_ratio * max(1, current[0].length)):
+                    current.append(seg)
+                    continue
+                current = [seg]
+                groups.append(current)
+
+            for group in sorted(groups, key=lambda g: min(s.index for s in g)):
+                group.sort(key=lambda s: s.index)
+                buckets.append(SegmentBucket(index=len(buckets), segments=group))
+        return buckets
+
+    def record_bucket(self, bucket: SegmentBucket, elapsed: float, audio_seconds: float):
+        """记录一个桶的推理耗时，用于统计各批大小下的填充率与吞吐"""
+        chars_per_second = bucket.total_length / elapsed if elapsed > 0 else 0.0
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"📊 桶{bucket.index}: 片段数={len(bucket.segments)}, 最大长度={bucket.max_length}, "
+                f"填充率={bucket.padding_ratio:.1%}, 耗时={elapsed:.2f}s, "
+                f"吞吐={chars_per_second:.1f}字/s, 实时率={elapsed / audio_seconds if audio_seconds else 0:.2f}"
+            )
+
+        with self._lock:
+            stats = self._bucket_stats.setdefault(len(bucket.segments), {
+                "buckets": 0, "chars": 0, "padded_chars": 0, "seconds": 0.0, "audio_seconds": 0.0
+            })
+            stats["buckets"] += 1
+            stats["chars"] += bucket.total_length
+            stats["padded_chars"] += bucket.max_length * len(bucket.segments)
+            stats["seconds"] += elapsed
+            stats["audio_seconds"] += audio_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """按批大小汇总的填充率与吞吐统计"""
+        with self._lock:
+            result = {}
+            for batch_size, s in sorted(self._bucket_stats.items()):
+                result[str(batch_size)] = {
+                    "buckets": s["buckets"],
+                    "padding_ratio": round(1 - s["chars"] / s["padded_chars"], 4) if s["padded_chars"] else 0.0,
+                    "chars_per_second": round(s["chars"] / s["seconds"], 2) if s["seconds"] else 0.0,
+                    "real_time_factor": round(s["seconds"] / s["audio_seconds"], 4) if s["audio_seconds"] else 0.0,
+                }
+            return result
@@ -0,0 +1,231 @@
+"""
+T2S语义token缓存
+自回归的GPT阶段是合成中最耗时的部分，它输出的语义token只取决于文本、参考音频（prompt）、
+GPT权重和采样参数，与语速、片段间隔、超采样等VITS阶段及后处理参数无关。
+缓存每个片段的语义token（LRU，可选磁盘持久化），相同片段以不同语速等参数重新渲染时
+跳过自回归解码，只执行VITS解码。
+
+挂载方式：包装T2S模型实例上的 infer_panel_batch_infer / infer_panel_naive_batched
+（TTS.run每次按parallel_infer从两者中选择一个作为infer_panel）。
+一个批次的所有序列都命中时直接返回缓存结果，否则完整执行该批次（保持解码看门狗对批次的跟踪）；
+新结果先暂存，由调用方在确认未被取消、未触发看门狗后提交。
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# 参与缓存键的采样参数
+SAMPLING_KWARGS = ("top_k", "top_p", "temperature", "repetition_penalty", "early_stop_num")
+
+
+class _Session:
+    """一次管道推理的缓存上下文"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.pending: List[tuple] = []
+        self.hits = 0
+        self.misses = 0
+
+
+class SemanticTokenCache:
+    """片段语义token的LRU缓存（可选磁盘持久化）"""
+
+    def __init__(self, max_entries: int = 4096, cache_dir: Optional[str] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.cache_dir = cache_dir or None
+        self._entries: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped_batches = 0
+
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                logger.info(f"✅ 语义token磁盘缓存目录: {self.cache_dir}")
+            except Exception as e:
+                logger.warning(f"⚠️ 无法创建语义token缓存目录 {self.cache_dir}: {e}")
+                self.cache_dir = None
+
+    @staticmethod
+    def make_key(namespace: str, phones: torch.Tensor, prompt: torch.Tensor, bert_feature: torch.Tensor, sampling: Dict[str, Any]) -> str:
+        """根据GPT权重、（参考+目标）音素、参考语义token、BERT特征和采样参数生成缓存键"""
+        digest = hashlib.sha1()
+        digest.update(namespace.encode("utf-8"))
+        digest.update(repr(sorted(sampling.items())).encode("utf-8"))
+        for tensor in (phones, prompt, bert_feature):
+            tensor = tensor.detach()
+            digest.update(str(tuple(tensor.shape)).encode("ascii"))
+            digest.update(tensor.to("cpu").contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        """读取缓存，命中时返回语义token（int16 CPU张量）"""
+        with self._lock:
+            tokens = self._entries.get(key)
+            if tokens is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return tokens
+
+        tokens = self._load_from_disk(key)
+        with self._lock:
+            if tokens is not None:
+                self.disk_hits += 1
+                self._store(key, tokens)
+            else:
+                self.misses += 1
+        return tokens
+
+    def put(self, key: str, tokens: torch.Tensor):
+        """写入缓存，语义token以int16 CPU张量保存（码本大小远小于int16上限）"""
+        tokens = tokens.detach().to("cpu", dtype=torch.int16).clone()
+        with self._lock:
+            self._store(key, tokens)
+        self._save_to_disk(key, tokens)
+
+    def _store(self, key: str, tokens: torch.Tensor):
+        self._entries[key] = tokens
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pt")
+
+    def _load_from_disk(self, key: str) -> Optional[torch.Tensor]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return torch.load(path, map_location="cpu")
+        except Exception as e:
+            logger.warning(f"⚠️ 读取语义token磁盘缓存失败 {path}: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, tokens: torch.Tensor):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            torch.save(tokens, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ 写入语义token磁盘缓存失败 {path}: {e}")
+
+    def install(self, t2s_model: Any):
+        """
+        将缓存挂载到T2S模型实例上（每个模型只挂载一次，切换权重后对新模型补挂载）
+
+        只在begin()与end()之间生效，其他调用原样转发
+        """
+        model = t2s_model.model
+        if getattr(model, "_semantic_cache_installed", False):
+            return
+        for name in ("infer_panel_batch_infer", "infer_panel_naive_batched"):
+            original = getattr(model, name, None)
+            if original is not None:
+                setattr(model, name, self._wrap(original))
+        model._semantic_cache_installed = True
+        logger.info("✅ 语义token缓存已挂载到T2S模型")
+
+    def _wrap(self, original):
+        cache = self
+
+        def cached_infer_panel(x, x_lens, prompts, bert_feature, *args, **kwargs):
+            session = getattr(cache._local, "session", None)
+            if session is None or prompts is None:
+                return original(x, x_lens, prompts, bert_feature, *args, **kwargs)
+
+            sampling = {name: kwargs[name] for name in SAMPLING_KWARGS if name in kwargs}
+            # 批量推理时音素和BERT特征 (1024, T) 按批内最长序列补齐，只取有效部分作为键，
+            # 同一片段无论与哪些片段同批都命中同一条缓存
+            keys = []
+            for i in range(len(x)):
+                length = int(x_lens[i])
+                keys.append(cache.make_key(
+                    session.namespace, x[i][:length], prompts[i], bert_feature[i][:, :length], sampling
+                ))
+            cached = [cache.get(key) for key in keys]
+            if all(tokens is not None for tokens in cached):
+                session.hits += len(keys)
+                with cache._lock:
+                    cache.skipped_batches += 1
+                device = prompts.device
+                tokens_list = [tokens.to(device=device, dtype=torch.long) for tokens in cached]
+                # TTS.run按 item[-idx:] 截取生成部分，缓存的正是生成部分
+                return tokens_list, [len(tokens) for tokens in tokens_list]
+
+            y_list, idx_list = original(x, x_lens, prompts, bert_feature, *args, **kwargs)
+            session.misses += len(keys)
+            for key, y, idx in zip(keys, y_list, idx_list):
+                if idx > 0:
+                    session.pending.append((key, y[-idx:]))
+            return y_list, idx_list
+
+        return cached_infer_panel
+
+    def begin(self, namespace: str):
+        """开始一次管道推理（与管道在同一线程调用），namespace标识当前GPT权重"""
+        self._local.session = _Session(namespace)
+
+    def end(self, commit: bool) -> Dict[str, int]:
+        """
+        结束一次管道推理
+
+        Args:
+            commit: 是否写入本次新解码的结果（被取消或触发看门狗截断的结果不应写入）
+
+        Returns:
+            本次推理的命中与未命中片段数
+        """
+        session = getattr(self._local, "session", None)
+        self._local.session = None
+        if session is None:
+            return {"hits": 0, "misses": 0}
+        if commit:
+            for key, tokens in session.pending:
+                self.put(key, tokens)
+        return {"hits": session.hits, "misses": session.misses}
+
+    def clear(self):
+        """清空内存中的缓存条目（磁盘缓存保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def memory_bytes(self) -> int:
+        """内存中缓存的语义token占用的字节数"""
+        with self._lock:
+            return sum(tokens.numel() * tokens.element_size() for tokens in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            size = len(self._entries)
+            skipped_batches = self.skipped_batches
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            "skipped_batches": skipped_batches,
+            "disk_enabled": bool(self.cache_dir),
+        }
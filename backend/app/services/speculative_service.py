@@ -0,0 +1,250 @@
+"""
+对话回复的预测合成
+对话接口生成回复后，在后台以低优先级提前合成回复语音，结果放入短期缓存；
+前端随后请求合成同一回复时直接取用（仍在合成中则等待其完成），省去整段推理的等待。
+预测合成只在没有真实合成请求时运行，真实请求到来时立即让出（取消进行中的预测合成），
+排队过多或长时间等不到空闲时直接丢弃
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from app.services.gpt_sovits_service import SynthesisCancelled
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Speculation:
+    """一次预测合成"""
+    reply_id: str
+    request_key: str
+    text: str
+    page: str
+    profile: Optional[str]
+    created_at: float
+    future: asyncio.Future = field(repr=False)
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    # 合成中被真实请求认领：不再因让出而取消
+    promoted: bool = False
+    running: bool = False
+
+
+class SpeculativeSynthesis:
+    """预测合成调度与短期结果缓存"""
+
+    def __init__(
+        self,
+        synthesizer,
+        ttl_seconds: float = 120.0,
+        max_entries: int = 32,
+        max_pending: int = 2,
+        max_wait_seconds: float = 30.0
+    ):
+        """
+        Args:
+            synthesizer: 提供synthesize_speech的合成服务
+            ttl_seconds: 预测结果的保留时间
+            max_entries: 缓存的最大条目数
+            max_pending: 等待中的预测合成上限，超出时丢弃新的预测
+            max_wait_seconds: 等待空闲的最长时间，超时丢弃
+        """
+        self.synthesizer = synthesizer
+        self.ttl = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self.max_pending = max(1, int(max_pending))
+        self.max_wait = max_wait_seconds
+
+        self._entries: "OrderedDict[str, _Speculation]" = OrderedDict()
+        self._by_reply: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._active_real = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._current: Optional[_Speculation] = None
+        self.counters: Counter = Counter()
+
+    @classmethod
+    def from_config(cls, synthesizer, config: Dict[str, Any]) -> "SpeculativeSynthesis":
+        """从config.json中的speculative_synthesis配置创建"""
+        return cls(
+            synthesizer,
+            ttl_seconds=config.get("ttl_seconds", 120.0),
+            max_entries=config.get("max_entries", 32),
+            max_pending=config.get("max_pending", 2),
+            max_wait_seconds=config.get("max_wait_seconds", 30.0)
+        )
+
+    async def start(self):
+        """启动后台预测合成协程"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        if self._active_real == 0:
+            self._idle.set()
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def schedule(self, text: str, page: str, profile: Optional[str], request_key: str) -> Optional[str]:
+        """
+        安排一次预测合成
+
+        Returns:
+            回复ID；未启动或排队过多被丢弃时返回None
+        """
+        if self._queue is None:
+            return None
+        self._expire()
+        existing = self._entries.get(request_key)
+        if existing is not None:
+            return existing.reply_id
+
+        if self._queue.qsize() >= self.max_pending:
+            self.counters["dropped_pending"] += 1
+            return None
+
+        speculation = _Speculation(
+            reply_id=uuid.uuid4().hex,
+            request_key=request_key,
+            text=text,
+            page=page,
+            profile=profile,
+            created_at=time.monotonic(),
+            future=asyncio.get_running_loop().create_future()
+        )
+        self._entries[request_key] = speculation
+        self._by_reply[speculation.reply_id] = request_key
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries.values())), "evicted")
+
+        self._queue.put_nowait(speculation)
+        self.counters["scheduled"] += 1
+        return speculation.reply_id
+
+    async def claim(self, request_key: str, reply_id: Optional[str] = None) -> Optional[bytes]:
+        """
+        真实请求认领预测结果：已完成直接返回，合成中则等待完成；
+        尚未开始的预测直接撤销，由真实请求自行合成。没有可用结果时返回None
+        """
+        self._expire()
+        if reply_id and self._by_reply.get(reply_id) not in (None, request_key):
+            # 回复ID对应的文本或档位与本次请求不同
+            return None
+
+        speculation = self._entries.get(request_key)
+        if speculation is None:
+            return None
+        if not speculation.running and not speculation.future.done():
+            self._discard(speculation, "superseded")
+            return None
+
+        speculation.promoted = True
+        try:
+            audio_data = await asyncio.shield(speculation.future)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            audio_data = None
+
+        self._forget(speculation)
+        if audio_data:
+            self.counters["hits"] += 1
+            return audio_data
+        return None
+
+    @asynccontextmanager
+    async def real_request(self):
+        """标记一次真实合成请求：进行中的预测合成立即让出"""
+        self._active_real += 1
+        if self._idle is not None:
+            self._idle.clear()
+        current = self._current
+        if current is not None and not current.promoted:
+            current.cancel_event.set()
+        try:
+            yield
+        finally:
+            self._active_real -= 1
+            if self._active_real == 0 and self._idle is not None:
+                self._idle.set()
+
+    async def _worker(self):
+        while True:
+            speculation = await self._queue.get()
+            if speculation.future.done():
+                continue
+
+            # 等待没有真实请求时再合成
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.max_wait)
+            except asyncio.TimeoutError:
+                self._discard(speculation, "dropped_busy")
+                continue
+            if speculation.future.done():
+                continue
+            if time.monotonic() - speculation.created_at > self.ttl:
+                self._discard(speculation, "expired")
+                continue
+
+            self._current = speculation
+            speculation.running = True
+            try:
+                audio_data = await self.synthesizer.synthesize_speech(
+                    speculation.text,
+                    speculation.page,
+                    cancel_event=speculation.cancel_event,
+                    profile=speculation.profile
+                )
+            except SynthesisCancelled:
+                self._discard(speculation, "yielded")
+                continue
+            except Exception as e:
+                logger.error(f"❌ 预测合成失败: {e}")
+                audio_data = b""
+            finally:
+                self._current = None
+                speculation.running = False
+
+            if not speculation.future.done():
+                speculation.future.set_result(audio_data)
+            self.counters["completed" if audio_data else "failed"] += 1
+
+    def _expire(self):
+        """清理过期的已完成结果"""
+        now = time.monotonic()
+        for speculation in list(self._entries.values()):
+            if now - speculation.created_at > self.ttl and not speculation.promoted and not speculation.running:
+                self._discard(speculation, "expired")
+
+    def _discard(self, speculation: _Speculation, reason: str):
+        self._forget(speculation)
+        speculation.cancel_event.set()
+        if not speculation.future.done():
+            speculation.future.set_result(None)
+        self.counters[reason] += 1
+
+    def _forget(self, speculation: _Speculation):
+        if self._entries.get(speculation.request_key) is speculation:
+            del self._entries[speculation.request_key]
+        self._by_reply.pop(speculation.reply_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "active_real_requests": self._active_real,
+            **self.counters,
+        }
@@ -0,0 +1,356 @@
+"""
+T2S静态KV缓存
+上游T2S模型每个解码步都用torch.cat把新一步的key/value拼接到缓存上，每层每步都要重新分配并复制
+整个缓存，长片段在CPU上的解码时间主要耗在这里。静态KV缓存在解码开始时为批次中的每条序列
+预分配固定容量的key/value缓冲区，之后每步只把新的一列就地写入，交给注意力计算的是缓冲区前
+length列的视图（与拼接结果数值相同，只是批次维度的步长不同），输出与拼接方式一致。
+
+挂载方式：替换T2S模型实例上 t2s_transformer.decode_next_token，并包装
+infer_panel_batch_infer / infer_panel_naive_batched 以限定缓冲区的生命周期（只在一次解码内有效）。
+解码循环在批次缩小时会对缓存做index_select，传回的张量不再是上一步返回的视图（按对象身份判断），
+此时把它复制进已有缓冲区的前几行继续使用；容量不足时按倍数扩容（只在超出预留长度时发生）。
+
+性能对比（在backend目录下执行，输出拼接方式与静态缓存的tokens/s以及逐步输出是否一致）:
+    python -m app.services.static_kv_cache [--gpt xxx.ckpt] [--prompt-tokens 300] [--steps 500] [--batch-sizes 1,4]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import torch
+import torch.nn.functional as F
+
+logger = logging.getLogger(__name__)
+
+# 静态缓存解码所需的T2SBlock属性（上游结构变化时不挂载，沿用拼接方式）
+_BLOCK_ATTRIBUTES = (
+    "qkv_w", "qkv_b", "out_w", "out_b", "num_heads", "hidden_dim", "mlp",
+    "norm_w1", "norm_b1", "norm_eps1", "norm_w2", "norm_b2", "norm_eps2",
+)
+
+
+class _LayerKV:
+    """一层的key/value缓冲区"""
+
+    __slots__ = ("k_buffer", "v_buffer", "batch", "length", "k_view", "v_view")
+
+    def __init__(self, k_buffer: torch.Tensor, v_buffer: torch.Tensor):
+        self.k_buffer = k_buffer
+        self.v_buffer = v_buffer
+        self.batch = 0
+        self.length = 0
+        self.k_view: Optional[torch.Tensor] = None
+        self.v_view: Optional[torch.Tensor] = None
+
+    @property
+    def capacity(self) -> int:
+        return self.k_buffer.shape[1]
+
+
+class _DecodeState:
+    """一次infer_panel调用内的缓冲区"""
+
+    def __init__(self):
+        self.layers: Dict[int, _LayerKV] = {}
+        self.counters: Counter = Counter()
+
+
+class StaticKVCache:
+    """预分配、就地更新的T2S解码KV缓存"""
+
+    def __init__(self, enabled: bool = True, cpu_only: bool = True, reserve_tokens: int = 512):
+        """
+        Args:
+            enabled: 是否启用
+            cpu_only: 只在CPU上启用（GPU上的拼接开销不明显，且显存更紧张）
+            reserve_tokens: 在参考+目标音素和参考语义token之外为新生成的token预留的长度
+        """
+        self.enabled = enabled
+        self.cpu_only = cpu_only
+        self.reserve_tokens = max(1, int(reserve_tokens))
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "StaticKVCache":
+        """从config.json中的static_kv_cache配置创建"""
+        return cls(
+            enabled=config.get("enabled", True),
+            cpu_only=config.get("cpu_only", True),
+            reserve_tokens=config.get("reserve_tokens", 512)
+        )
+
+    def install(self, t2s_model: Any):
+        """挂载到T2S模型实例上（每个模型只挂载一次，切换权重后对新模型补挂载）"""
+        if not self.enabled:
+            return
+        model = t2s_model.model
+        if getattr(model, "_static_kv_cache_installed", False):
+            return
+        model._static_kv_cache_installed = True
+
+        parameter = next(model.parameters(), None)
+        if self.cpu_only and parameter is not None and parameter.device.type != "cpu":
+            return
+
+        transformer = getattr(model, "t2s_transformer", None)
+        blocks = list(getattr(transformer, "blocks", None) or [])
+        if not blocks or not all(hasattr(block, name) for block in blocks for name in _BLOCK_ATTRIBUTES):
+            logger.warning("⚠️ T2S模型结构不受支持，静态KV缓存未启用（沿用逐步拼接的解码）")
+            return
+
+        try:
+            transformer.decode_next_token = self._wrap_decode(blocks, transformer.decode_next_token)
+        except (AttributeError, TypeError, RuntimeError) as e:
+            logger.warning(f"⚠️ 无法挂载静态KV缓存: {e}")
+            return
+        for name in ("infer_panel_batch_infer", "infer_panel_naive_batched"):
+            original = getattr(model, name, None)
+            if original is not None:
+                setattr(model, name, self._wrap_panel(original))
+        logger.info("✅ 静态KV缓存已挂载到T2S模型")
+
+    def _wrap_panel(self, original):
+        cache = self
+
+        def static_kv_infer_panel(*args, **kwargs):
+            previous = getattr(cache._local, "state", None)
+            state = _DecodeState()
+            cache._local.state = state
+            try:
+                return original(*args, **kwargs)
+            finally:
+                # 解码结束即释放缓冲区
+                cache._local.state = previous
+                with cache._lock:
+                    cache.counters["decodes"] += 1
+                    cache.counters.update(state.counters)
+
+        return static_kv_infer_panel
+
+    def _wrap_decode(self, blocks: List[Any], original):
+        cache = self
+
+        def static_kv_decode_next_token(x, k_cache, v_cache, attn_mask=None, torch_sdpa=True):
+            state = getattr(cache._local, "state", None)
+            if state is None or not torch_sdpa:
+                return original(x, k_cache, v_cache, attn_mask, torch_sdpa)
+            for index, block in enumerate(blocks):
+                x, k_cache[index], v_cache[index] = cache._decode_block(
+                    state, index, block, x, k_cache[index], v_cache[index], attn_mask
+                )
+            state.counters["steps"] += 1
+            return x, k_cache, v_cache
+
+        return static_kv_decode_next_token
+
+    def _decode_block(self, state: _DecodeState, index: int, block: Any, x, k_cache, v_cache, attn_mask):
+        """与上游T2SBlock.decode_next_token相同的计算，只是key/value写入预分配的缓冲区"""
+        q, k, v = F.linear(x, block.qkv_w, block.qkv_b).chunk(3, dim=-1)
+        k_cache, v_cache = self._append(state, index, k_cache, v_cache, k, v)
+
+        batch_size = q.shape[0]
+        q_len = q.shape[1]
+        kv_len = k_cache.shape[1]
+        q = q.view(batch_size, q_len, block.num_heads, -1).transpose(1, 2)
+        k = k_cache.view(batch_size, kv_len, block.num_heads, -1).transpose(1, 2)
+        v = v_cache.view(batch_size, kv_len, block.num_heads, -1).transpose(1, 2)
+
+        attn = F.scaled_dot_product_attention(q, k, v, (~attn_mask) if attn_mask is not None else None)
+        attn = attn.transpose(1, 2).reshape(batch_size, q_len, -1)
+        attn = F.linear(attn, block.out_w, block.out_b)
+
+        x = x + attn
+        x = F.layer_norm(x, [block.hidden_dim], block.norm_w1, block.norm_b1, block.norm_eps1)
+        x = x + block.mlp.forward(x)
+        x = F.layer_norm(x, [block.hidden_dim], block.norm_w2, block.norm_b2, block.norm_eps2)
+        return x, k_cache, v_cache
+
+    def _append(self, state: _DecodeState, index: int, k_cache, v_cache, k, v):
+        """把新一步的key/value写入缓冲区，返回前length列的视图"""
+        slot = state.layers.get(index)
+        if slot is None or k_cache is not slot.k_view or v_cache is not slot.v_view:
+            slot = self._adopt(state, index, slot, k_cache, v_cache)
+
+        length = slot.length + k.shape[1]
+        if length > slot.capacity:
+            self._grow(state, slot, length)
+        slot.k_buffer[:slot.batch, slot.length:length].copy_(k)
+        slot.v_buffer[:slot.batch, slot.length:length].copy_(v)
+        slot.length = length
+        slot.k_view = slot.k_buffer[:slot.batch, :length]
+        slot.v_view = slot.v_buffer[:slot.batch, :length]
+        return slot.k_view, slot.v_view
+
+    def _adopt(self, state: _DecodeState, index: int, slot: Optional[_LayerKV], k_cache, v_cache) -> _LayerKV:
+        """
+        接管解码循环传入的缓存：预填充的结果，或批次缩小后index_select得到的新张量
+
+        已有缓冲区放得下时复制进前几行，否则按 长度+reserve_tokens 分配新的缓冲区
+        """
+        batch, length, _ = k_cache.shape
+        reusable = (
+            slot is not None
+            and batch <= slot.k_buffer.shape[0]
+            and length < slot.capacity
+            and slot.k_buffer.dtype == k_cache.dtype
+            and k_cache._base is not slot.k_buffer
+            and v_cache._base is not slot.v_buffer
+        )
+        if reusable:
+            state.counters["compactions"] += 1
+        else:
+            capacity = length + self.reserve_tokens
+            slot = _LayerKV(
+                k_cache.new_empty((batch, capacity, k_cache.shape[2])),
+                v_cache.new_empty((batch, capacity, v_cache.shape[2]))
+            )
+            state.layers[index] = slot
+            state.counters["allocations"] += 1
+
+        slot.k_buffer[:batch, :length].copy_(k_cache)
+        slot.v_buffer[:batch, :length].copy_(v_cache)
+        slot.batch = batch
+        slot.length = length
+        return slot
+
+    @staticmethod
+    def _grow(state: _DecodeState, slot: _LayerKV, length: int):
+        """超出预留长度时按倍数扩容"""
+        capacity = max(length, slot.capacity * 2)
+        for name in ("k_buffer", "v_buffer"):
+            buffer = getattr(slot, name)
+            grown = buffer.new_empty((buffer.shape[0], capacity, buffer.shape[2]))
+            grown[:slot.batch, :slot.length].copy_(buffer[:slot.batch, :slot.length])
+            setattr(slot, name, grown)
+        state.counters["grows"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "cpu_only": self.cpu_only,
+                "reserve_tokens": self.reserve_tokens,
+                **self.counters,
+            }
+
+
+def _load_t2s_model(gpt_path: str, gpt_sovits_path: str):
+    """按上游TTS.init_t2s_weights的方式在CPU上加载T2S模型"""
+    for path in (gpt_sovits_path, os.path.join(gpt_sovits_path, "AR")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    from AR.models.t2s_lightning_module import Text2SemanticLightningModule
+
+    dict_s1 = torch.load(gpt_path, map_location="cpu", weights_only=False)
+    t2s_model = Text2SemanticLightningModule(dict_s1["config"], "****", is_train=False)
+    t2s_model.load_state_dict(dict_s1["weight"])
+    return t2s_model.eval()
+
+
+def _decode_steps(model, prompt: torch.Tensor, inputs: torch.Tensor):
+    """预填充后逐步解码，返回每步的输出与解码耗时"""
+    batch, length, _ = prompt.shape
+    transformer = model.t2s_transformer
+    causal = torch.triu(torch.ones(length, length, dtype=torch.bool), diagonal=1)
+    attn_mask = causal.view(1, 1, length, length).expand(batch, 1, length, length)
+
+    _, k_cache, v_cache = transformer.process_prompt(prompt, attn_mask, None)
+    attn_mask = F.pad(attn_mask[:, :, -1].unsqueeze(-2), (0, 1), value=False)
+
+    outputs = []
+    start = time.perf_counter()
+    for x in inputs:
+        y, k_cache, v_cache = transformer.decode_next_token(x, k_cache, v_cache, attn_mask)
+        attn_mask = F.pad(attn_mask, (0, 1), value=False)
+        outputs.append(y)
+    return outputs, time.perf_counter() - start
+
+
+def benchmark(t2s_model, prompt_tokens: int, steps: int, batch_size: int, reserve_tokens: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    对比拼接方式与静态缓存的解码速度，并逐步比较两者的输出
+
+    使用随机的预填充与逐步输入，只测Transformer的解码部分（不含采样）
+    """
+    model = t2s_model.model
+    generator = torch.Generator().manual_seed(seed)
+    prompt = torch.randn(batch_size, prompt_tokens, model.model_dim, generator=generator)
+    inputs = torch.randn(steps, batch_size, 1, model.model_dim, generator=generator)
+
+    cache = StaticKVCache(enabled=True, cpu_only=False, reserve_tokens=reserve_tokens)
+    cache.install(t2s_model)
+
+    with torch.inference_mode():
+        baseline, baseline_seconds = _decode_steps(model, prompt, inputs)
+        cache._local.state = _DecodeState()
+        try:
+            static, static_seconds = _decode_steps(model, prompt, inputs)
+            counters = dict(cache._local.state.counters)
+        finally:
+            cache._local.state = None
+
+    max_diff = max((a - b).abs().max().item() for a, b in zip(baseline, static))
+    tokens = steps * batch_size
+    return {
+        "batch_size": batch_size,
+        "prompt_tokens": prompt_tokens,
+        "steps": steps,
+        "concat_tokens_per_second": round(tokens / baseline_seconds, 1),
+        "static_tokens_per_second": round(tokens / static_seconds, 1),
+        "speedup": round(baseline_seconds / static_seconds, 3),
+        "identical": all(torch.equal(a, b) for a, b in zip(baseline, static)),
+        "max_abs_diff": max_diff,
+        "counters": counters,
+    }
+
+
+def main():
+    """静态KV缓存与拼接方式的解码速度对比"""
+    parser = argparse.ArgumentParser(description="T2S静态KV缓存解码性能对比")
+    parser.add_argument("--gpt", help="GPT权重文件，默认取gpt_weights_dir中的第一个")
+    parser.add_argument("--prompt-tokens", type=int, default=300, help="预填充长度（参考+目标音素与参考语义token）")
+    parser.add_argument("--steps", type=int, default=500, help="解码步数")
+    parser.add_argument("--batch-sizes", default="1,4", help="逗号分隔的批大小")
+    parser.add_argument("--reserve-tokens", type=int, default=512, help="静态缓存的预留长度")
+    parser.add_argument("--threads", type=int, help="torch线程数")
+    parser.add_argument("--config", default="./config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    from app.services.log_service import setup_logging, shutdown_logging
+    setup_logging({"json": False})
+
+    try:
+        backend_dir = os.path.dirname(os.path.abspath(args.config))
+        with open(args.config, "r", encoding="utf-8") as f:
+            model_paths = json.load(f).get("model_paths", {})
+        gpt_path = args.gpt
+        if not gpt_path:
+            weights_dir = os.path.join(backend_dir, model_paths.get("gpt_weights_dir", "../models/GPT-SoVITS/GPT_weights_v2Pro"))
+            candidates = sorted(name for name in os.listdir(weights_dir) if name.endswith(".ckpt"))
+            if not candidates:
+                raise FileNotFoundError(f"{weights_dir} 中没有GPT权重")
+            gpt_path = os.path.join(weights_dir, candidates[0])
+        if args.threads:
+            torch.set_num_threads(args.threads)
+
+        t2s_model = _load_t2s_model(gpt_path, os.path.join(backend_dir, "GPT_SoVITS"))
+        logger.info(f"📦 已加载T2S模型: {gpt_path}（torch线程数 {torch.get_num_threads()}）")
+        for batch_size in (int(size) for size in args.batch_sizes.split(",") if size.strip()):
+            result = benchmark(t2s_model, args.prompt_tokens, args.steps, batch_size, args.reserve_tokens)
+            logger.info(f"📊 {json.dumps(result, ensure_ascii=False)}")
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+合成档位
+将采样参数、解码限制、批大小、片段长度和后处理参数打包为命名档位（如realtime / balanced / quality），
+可按请求或按页面选择；请求给出latency_budget_ms时，根据该语音各档位实测的实时率(RTF)
+选择预计能在预算内完成的最高档位
+
+sample_steps、super_sampling只对v3/v4模型生效；v2/v2Pro模型下档位之间的差别
+只在AR采样参数（top_k、top_p、temperature等）、片段长度和批大小上，默认配置的档位据此设置
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.services.segment_planner import SegmentPlanner
+
+logger = logging.getLogger(__name__)
+
+# 档位中作用于片段规划的参数，其余参数传给TTS管道
+PLANNER_PARAMS = ("min_segment_chars", "max_segment_chars", "max_batch_size", "bucket_ratio")
+
+# synthesis_params中由片段规划器接管的参数
+_PLANNER_MANAGED_PARAMS = ("text_split_method", "batch_size", "split_bucket")
+
+# 实测值的指数滑动平均系数
+_EWMA_ALPHA = 0.2
+
+
+@dataclass
+class SynthesisProfile:
+    """一个合成档位"""
+    name: str
+    run_params: Dict[str, Any]
+    planner: SegmentPlanner
+    expected_rtf: Optional[float] = None
+
+
+@dataclass
+class _LatencyStats:
+    """某语音在某档位下的实测值"""
+    rtf: float
+    seconds_per_char: float
+    samples: int = field(default=1)
+
+    def update(self, rtf: float, seconds_per_char: float):
+        self.rtf += _EWMA_ALPHA * (rtf - self.rtf)
+        self.seconds_per_char += _EWMA_ALPHA * (seconds_per_char - self.seconds_per_char)
+        self.samples += 1
+
+
+class SynthesisProfiles:
+    """合成档位注册表与延迟模型"""
+
+    def __init__(
+        self,
+        base_params: Dict[str, Any],
+        profiles: Dict[str, Dict[str, Any]],
+        planner_config: Dict[str, Any],
+        default_profile: str = "balanced",
+        default_seconds_per_char: float = 0.22
+    ):
+        """
+        Args:
+            base_params: config.json中的synthesis_params，各档位在此基础上覆盖
+            profiles: 档位定义，按从快到慢（质量从低到高）的顺序排列
+            planner_config: config.json中的segment_planner配置
+            default_profile: 未指定档位时使用的档位
+            default_seconds_per_char: 尚无实测数据时每个字对应的音频秒数
+        """
+        base_run_params = {
+            key: value for key, value in base_params.items()
+            if key not in _PLANNER_MANAGED_PARAMS
+        }
+        # synthesis_params中的speed对应管道的speed_factor
+        if "speed" in base_run_params:
+            base_run_params["speed_factor"] = base_run_params.pop("speed")
+
+        self.profiles: Dict[str, SynthesisProfile] = {}
+        for name, definition in (profiles or {"balanced": {}}).items():
+            definition = dict(definition)
+            expected_rtf = definition.pop("expected_rtf", None)
+            planner_params = {key: definition.pop(key) for key in PLANNER_PARAMS if key in definition}
+            self.profiles[name] = SynthesisProfile(
+                name=name,
+                run_params={**base_run_params, **definition},
+                planner=SegmentPlanner.from_config({**planner_config, **planner_params}),
+                expected_rtf=expected_rtf
+            )
+
+        self.default_profile = default_profile if default_profile in self.profiles else next(iter(self.profiles))
+        self.default_seconds_per_char = default_seconds_per_char
+        self._latency: Dict[tuple, _LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "SynthesisProfiles":
+        """从完整的config.json配置创建"""
+        return cls(
+            base_params=config.get("synthesis_params", {}),
+            profiles=config.get("synthesis_profiles", {}),
+            planner_config=config.get("segment_planner", {}),
+            default_profile=config.get("default_synthesis_profile", "balanced")
+        )
+
+    @property
+    def names(self) -> List[str]:
+        """档位名称，按从快到慢排列"""
+        return list(self.profiles)
+
+    def get(self, name: Optional[str]) -> SynthesisProfile:
+        """获取档位，name为None时返回默认档位"""
+        profile = self.profiles.get(name or self.default_profile)
+        if profile is None:
+            raise ValueError(f"未知的合成档位: {name}")
+        return profile
+
+    def select(
+        self,
+        voice_key: Optional[str],
+        text: str,
+        requested: Optional[str] = None,
+        page_profile: Optional[str] = None,
+        latency_budget_ms: Optional[float] = None
+    ) -> str:
+        """
+        选择本次请求使用的档位
+
+        优先级：请求指定的档位 > 延迟预算 > 页面配置的档位 > 默认档位。
+        按延迟预算选择时，从质量最高的档位开始，返回第一个预计耗时不超过预算的档位；
+        都超出预算时返回最快的档位
+
+        Raises:
+            ValueError: 请求或页面指定了不存在的档位
+        """
+        if requested:
+            return self.get(requested).name
+        if latency_budget_ms is None:
+            return self.get(page_profile).name
+
+        chars = max(1, len(text))
+        for name in reversed(self.names):
+            predicted = self.predict_latency_ms(voice_key, name, chars)
+            if predicted is not None and predicted <= latency_budget_ms:
+                return name
+        return self.names[0]
+
+    def predict_latency_ms(self, voice_key: Optional[str], profile: str, chars: int) -> Optional[float]:
+        """预计合成耗时；该档位既无实测数据也未配置expected_rtf时返回None"""
+        with self._lock:
+            stats = self._latency.get((voice_key, profile))
+            if stats is not None:
+                return chars * stats.seconds_per_char * stats.rtf * 1000
+
+            expected_rtf = self.profiles[profile].expected_rtf
+            if expected_rtf is None:
+                return None
+            # 该语音在其他档位下的语速实测值与档位无关，可以借用
+            seconds_per_char = next(
+                (s.seconds_per_char for (voice, _), s in self._latency.items() if voice == voice_key),
+                self.default_seconds_per_char
+            )
+            return chars * seconds_per_char * expected_rtf * 1000
+
+    def record(self, voice_key: Optional[str], profile: str, chars: int, audio_seconds: float, elapsed: float):
+        """记录一次合成的实测实时率"""
+        if audio_seconds <= 0 or chars <= 0:
+            return
+        rtf = elapsed / audio_seconds
+        seconds_per_char = audio_seconds / chars
+        with self._lock:
+            stats = self._latency.get((voice_key, profile))
+            if stats is None:
+                self._latency[(voice_key, profile)] = _LatencyStats(rtf, seconds_per_char)
+            else:
+                stats.update(rtf, seconds_per_char)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            measured: Dict[str, Dict[str, Any]] = {}
+            for (voice_key, profile), stats in self._latency.items():
+                measured.setdefault(voice_key or "-", {})[profile] = {
+                    "rtf": round(stats.rtf, 3),
+                    "seconds_per_char": round(stats.seconds_per_char, 4),
+                    "samples": stats.samples,
+                }
+        return {
+            "profiles": self.names,
+            "default": self.default_profile,
+            "measured": measured,
+        }
@@ -0,0 +1,160 @@
+"""
+文本前端特征缓存
+缓存每个文本片段的音素ID与BERT特征，重复片段和固定的参考文本无需再次执行G2P和BERT前向计算
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_segment_text(text: str) -> str:
+    """规范化片段文本，作为缓存键的一部分（去除首尾空白并合并连续空白）"""
+    return " ".join(text.split())
+
+
+class TextFeatureCache:
+    """文本片段特征LRU缓存（可选磁盘持久化）"""
+
+    def __init__(self, max_entries: int = 2048, cache_dir: Optional[str] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.cache_dir = cache_dir or None
+        self._entries: "OrderedDict[str, Tuple[list, torch.Tensor, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                logger.info(f"✅ 文本特征磁盘缓存目录: {self.cache_dir}")
+            except Exception as e:
+                logger.warning(f"⚠️ 无法创建文本特征缓存目录 {self.cache_dir}: {e}")
+                self.cache_dir = None
+
+    @staticmethod
+    def make_key(text: str, language: str, version: str, final: bool = False) -> str:
+        """根据规范化文本、语言和模型版本生成缓存键"""
+        raw = f"{version}|{language}|{int(bool(final))}|{normalize_segment_text(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[list, torch.Tensor, str]]:
+        """读取缓存，命中时返回 (phones, bert_features, norm_text)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._load_from_disk(key)
+        with self._lock:
+            if entry is not None:
+                self.disk_hits += 1
+                self._store(key, entry)
+            else:
+                self.misses += 1
+        return entry
+
+    def put(self, key: str, phones: list, bert_features: torch.Tensor, norm_text: str):
+        """写入缓存，BERT特征以CPU张量形式保存"""
+        entry = (list(phones), bert_features.detach().to("cpu").clone(), norm_text)
+        with self._lock:
+            self._store(key, entry)
+        self._save_to_disk(key, entry)
+
+    def _store(self, key: str, entry: Tuple[list, torch.Tensor, str]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pt")
+
+    def _load_from_disk(self, key: str) -> Optional[Tuple[list, torch.Tensor, str]]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            data = torch.load(path, map_location="cpu")
+            return data["phones"], data["bert_features"], data["norm_text"]
+        except Exception as e:
+            logger.warning(f"⚠️ 读取文本特征磁盘缓存失败 {path}: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, entry: Tuple[list, torch.Tensor, str]):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            phones, bert_features, norm_text = entry
+            torch.save({"phones": phones, "bert_features": bert_features, "norm_text": norm_text}, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ 写入文本特征磁盘缓存失败 {path}: {e}")
+
+    def install(self, text_preprocessor: Any):
+        """
+        将缓存挂载到TTS管道的TextPreprocessor实例上
+
+        包装 get_phones_and_bert，待合成文本的每个片段和参考文本都会经过该方法，
+        命中缓存时直接返回音素ID和BERT特征，跳过G2P与BERT前向计算。
+        """
+        if getattr(text_preprocessor, "_feature_cache_installed", False):
+            return
+
+        original = text_preprocessor.get_phones_and_bert
+        cache = self
+
+        def cached_get_phones_and_bert(text: str, language: str, version: str, final: bool = False):
+            key = cache.make_key(text, language, version, final)
+            entry = cache.get(key)
+            if entry is not None:
+                phones, bert_features, norm_text = entry
+                return list(phones), bert_features.to(text_preprocessor.device), norm_text
+
+            phones, bert_features, norm_text = original(text, language, version, final=final)
+            cache.put(key, phones, bert_features, norm_text)
+            return phones, bert_features, norm_text
+
+        text_preprocessor.get_phones_and_bert = cached_get_phones_and_bert
+        text_preprocessor._feature_cache_installed = True
+        logger.info("✅ 文本特征缓存已挂载到TextPreprocessor")
+
+    def clear(self):
+        """清空内存中的缓存条目（磁盘缓存保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def memory_bytes(self) -> int:
+        """内存中缓存的BERT特征占用的字节数"""
+        with self._lock:
+            return sum(bert.numel() * bert.element_size() for _, bert, _ in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            "disk_enabled": bool(self.cache_dir),
+        }
@@ -0,0 +1,364 @@
+"""
+合成前的文本规范化
+大模型回复中偶尔仍带有markdown标记、表情符号和各种符号，直接送入TTS前端会浪费解码步，
+或切出无法发音的片段。规范化位于片段规划之前，依次执行：
+    1. 去除标记   代码块、链接、图片、HTML标签、标题/列表/引用标记、强调符号、表格
+    2. 去除表情   表情符号、变体选择符与零宽连接符
+    3. 全角折叠   全角字母数字与符号折叠为半角（随后统一处理）
+    4. 数字读法   日期、时刻、电话、年份、百分数、货币、单位、范围、分数、小数与整数展开为中文读法
+    5. 标点折叠   半角标点折叠为切分器使用的中文标点，去除无读音的符号，合并重复标点与空白
+
+所有规则均为模块加载时编译好的正则与translate映射表，单条回复的处理耗时为微秒级。
+
+自检与基准（在backend目录下执行）:
+    python -m app.services.text_normalizer [--iterations 2000]
+"""
+
+import argparse
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Match, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+DIGITS = "零一二三四五六七八九"
+_SMALL_UNITS = ("", "十", "百", "千")
+_LARGE_UNITS = ("", "万", "亿", "万亿")
+
+# 超过该位数的整数（或以0开头的整数）按位读
+_MAX_CARDINAL_DIGITS = 10
+
+# 数字后的单位读法（按长度降序匹配，区分大小写）
+UNIT_READINGS: Dict[str, str] = {
+    "km²": "平方公里", "m²": "平方米", "m³": "立方米", "㎡": "平方米", "km/h": "公里每小时",
+    "km": "公里", "cm": "厘米", "mm": "毫米", "m": "米",
+    "kg": "千克", "mg": "毫克", "g": "克", "t": "吨",
+    "ml": "毫升", "mL": "毫升", "L": "升",
+    "℃": "摄氏度", "°C": "摄氏度", "°": "度",
+    "h": "小时", "min": "分钟", "s": "秒", "ms": "毫秒",
+    "kb": "千字节", "KB": "千字节", "MB": "兆字节", "GB": "吉字节",
+    "%": "%", "‰": "‰",
+}
+
+# 去除标记（按顺序执行）
+_MARKUP_RULES: List[Tuple[Pattern, str]] = [
+    (re.compile(r"^\s*(```|~~~).*$", re.MULTILINE), ""),              # 代码块围栏
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), ""),                       # 图片
+    (re.compile(r"\[([^\]]+)\]\([^)]*\)"), r"\1"),                     # 链接保留文字
+    (re.compile(r"https?://[^\s，。！？）)]+|www\.[^\s，。！？）)]+"), ""),  # 网址
+    (re.compile(r"<[^<>\n]+>"), ""),                                   # HTML标签
+    (re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$", re.MULTILINE), ""),  # 表格分隔行
+    (re.compile(r"^\s{0,3}(#{1,6}|>+)\s*", re.MULTILINE), ""),         # 标题、引用
+    (re.compile(r"^\s*([-*+•·]|\d{1,2}[.)、])\s+", re.MULTILINE), ""),  # 列表标记
+    (re.compile(r"(\*{1,3}|_{2,3}|~~|`+)"), ""),                       # 强调、删除线、行内代码
+    (re.compile(r"^[ \t]*\||\|[ \t]*$", re.MULTILINE), ""),              # 表格行首尾
+    (re.compile(r"[ \t]*\|[ \t]*"), "，"),                                # 表格单元格
+]
+
+# 表情符号、装饰符号与组合字符
+_EMOJI_RE = re.compile(
+    "["
+    "\U0001F000-\U0001FAFF"   # 表情、交通、符号与象形文字
+    "\u2600-\u27BF"           # 杂项符号、装饰符号
+    "\u2B00-\u2BFF"           # 杂项符号与箭头
+    "\u2190-\u21FF"           # 箭头
+    "\u25A0-\u25FF"           # 几何图形
+    "\u2300-\u23FF"           # 杂项技术符号
+    "\uFE00-\uFE0F"           # 变体选择符
+    "\u200B-\u200F\u2060"     # 零宽字符
+    "\U000E0000-\U000E007F"   # 标签字符
+    "]+"
+)
+
+# 全角字母、数字和符号折叠为半角（全角空格折叠为空格）
+_FULLWIDTH_TABLE = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+_FULLWIDTH_TABLE[0x3000] = 0x20
+
+# 半角标点折叠为中文标点；括号、引号等无读音的符号删除
+_PUNCTUATION_TABLE = str.maketrans({
+    ",": "，", "!": "！", "?": "？", ";": "；", ":": "：",
+    "(": "，", ")": "，", "[": " ", "]": " ", "{": " ", "}": " ",
+    "【": " ", "】": " ", "《": "", "》": "", "〈": "", "〉": "",
+    "“": "", "”": "", "‘": "", "’": "", "\"": "", "'": "",
+    "「": "", "」": "", "『": "", "』": "",
+    "&": "和", "~": "", "^": "", "=": "", "\\": "", "/": " ", "@": " ",
+    "#": "", "$": "", "*": "", "_": " ", "<": "", ">": "", "|": "，",
+    "·": "", "•": "", "—": "，", "–": "，",
+})
+
+_NUMBER = r"\d+(?:\.\d+)?"
+
+
+def read_digits(digits: str) -> str:
+    """按位读数字（电话号码、编号、年份）"""
+    return "".join(DIGITS[int(d)] for d in digits)
+
+
+def _read_section(value: int) -> str:
+    """读0-9999"""
+    out = []
+    pending_zero = False
+    for position in (3, 2, 1, 0):
+        digit = value // 10 ** position % 10
+        if digit == 0:
+            pending_zero = bool(out)
+            continue
+        if pending_zero:
+            out.append("零")
+            pending_zero = False
+        out.append(DIGITS[digit] + _SMALL_UNITS[position])
+    return "".join(out)
+
+
+def read_integer(digits: str) -> str:
+    """
+    读整数（基数读法），如 10086 -> 一万零八十六
+
+    以0开头或超过_MAX_CARDINAL_DIGITS位的数字按位读
+    """
+    if len(digits) > 1 and digits[0] == "0" or len(digits) > _MAX_CARDINAL_DIGITS:
+        return read_digits(digits)
+    value = int(digits)
+    if value == 0:
+        return "零"
+
+    sections = []
+    while value:
+        sections.append(value % 10000)
+        value //= 10000
+
+    out = []
+    need_zero = False
+    for index in range(len(sections) - 1, -1, -1):
+        section = sections[index]
+        if section == 0:
+            need_zero = bool(out)
+            continue
+        if out and (need_zero or section < 1000):
+            out.append("零")
+        out.append(_read_section(section) + _LARGE_UNITS[index])
+        need_zero = False
+
+    text = "".join(out)
+    # 十至十九读作“十X”而非“一十X”
+    return text[1:] if text.startswith("一十") else text
+
+
+def read_number(number: str) -> str:
+    """读整数或小数，如 3.14 -> 三点一四"""
+    integer, _, fraction = number.replace(",", "").partition(".")
+    text = read_integer(integer or "0")
+    if fraction:
+        text += "点" + read_digits(fraction)
+    return text
+
+
+def _read_with_unit(number: str, unit: str) -> str:
+    if unit == "%":
+        return "百分之" + read_number(number)
+    if unit == "‰":
+        return "千分之" + read_number(number)
+    return read_number(number) + UNIT_READINGS[unit]
+
+
+def _date(match: Match) -> str:
+    year, month, day = match.group(1), int(match.group(2)), int(match.group(3))
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return match.group(0)
+    return f"{read_digits(year)}年{read_integer(str(month))}月{read_integer(str(day))}日"
+
+
+def _time(match: Match) -> str:
+    hour, minute, second = int(match.group(1)), int(match.group(2)), match.group(3)
+    if hour > 24 or minute > 59:
+        return match.group(0)
+    text = read_integer(str(hour)) + "点"
+    if minute or second:
+        text += ("零" if minute < 10 else "") + read_integer(str(minute)) + "分"
+    if second and int(second):
+        text += read_integer(str(int(second))) + "秒"
+    return text
+
+
+# 数字读法规则（按顺序执行，先处理结构化的日期、时刻等，最后处理剩余的数字）
+_NUMBER_RULES: List[Tuple[Pattern, Callable[[Match], str]]] = [
+    # 2024-05-01、2024/5/1、2024.5.1
+    (re.compile(r"(?<!\d)(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?!\d)"), _date),
+    # 08:30、8:05:09
+    (re.compile(r"(?<![\d:])(\d{1,2}):(\d{2})(?::(\d{2}))?(?![\d:])"), _time),
+    # 0591-87654321
+    (re.compile(r"(?<!\d)(0\d{2,3})-(\d{7,8})(?!\d)"), lambda m: f"{read_digits(m.group(1))}，{read_digits(m.group(2))}"),
+    # 138-1234-5678、13812345678（手机号按位读，先于范围规则，避免连字符被读作“至”）
+    (
+        re.compile(r"(?<!\d)(1[3-9]\d)([- ]?)(\d{4})\2(\d{4})(?!\d)"),
+        lambda m: "，".join(read_digits(m.group(i)) for i in (1, 3, 4)),
+    ),
+    # 1990-2000年、1990年~2000年（年份范围，先于年份规则，两端都按位读）
+    (
+        re.compile(r"(?<!\d)(1\d{3}|20\d{2})(\s*年)?\s*[-~～]\s*(1\d{3}|20\d{2})(?=\s*年)"),
+        lambda m: read_digits(m.group(1)) + (m.group(2) or "") + "至" + read_digits(m.group(3)),
+    ),
+    # 1990年、2024年（年份按位读）
+    (re.compile(r"(?<!\d)(1\d{3}|20\d{2})(?=\s*年)"), lambda m: read_digits(m.group(1))),
+    # ¥100、$5.5
+    (re.compile(r"[¥￥]\s*(" + _NUMBER + r")"), lambda m: read_number(m.group(1)) + "元"),
+    (re.compile(r"\$\s*(" + _NUMBER + r")"), lambda m: read_number(m.group(1)) + "美元"),
+    # 3-5公里、10~20℃：范围的连接符读作“至”（两端不超过4位，避免误读编号），数字与单位由后续规则展开
+    (
+        re.compile(r"(?<![\d.])(\d{1,4}(?:\.\d+)?[ \t]*[%℃]?)[ \t]*[-~～][ \t]*(?=\d{1,4}(?:\.\d+)?(?![\d.]))"),
+        lambda m: m.group(1) + "至",
+    ),
+    # -5 -> 负五
+    (re.compile(r"(?<![A-Za-z0-9.%℃])-(?=\d)"), lambda m: "负"),
+    # 带单位的数字：5km、30%、25℃
+    (
+        re.compile(
+            r"(" + _NUMBER + r")\s*("
+            + "|".join(re.escape(unit) for unit in sorted(UNIT_READINGS, key=len, reverse=True))
+            + r")(?![A-Za-z²³])"
+        ),
+        lambda m: _read_with_unit(m.group(1), m.group(2)),
+    ),
+    # 3/4 -> 四分之三
+    (re.compile(r"(?<![\d/])(\d+)/(\d+)(?![\d/])"), lambda m: f"{read_integer(m.group(2))}分之{read_integer(m.group(1))}"),
+    # 1,234,567.8、3.14、42
+    (re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|" + _NUMBER), lambda m: read_number(m.group(0))),
+]
+
+# 快速判断：不含标记符号或数字的文本跳过对应的规则组
+_MARKUP_HINT_RE = re.compile(r"[*_`#>\[\]<|~•·-]|https?://|www\.|^\s*\d{1,2}[.)、]\s", re.MULTILINE)
+_DIGIT_RE = re.compile(r"\d")
+
+_CJK = r"\u4e00-\u9fff\u3400-\u4dbf"
+_CN_PUNCTUATION = "，。！？；：、…"
+
+# 标点与空白的整理（按顺序执行）
+_CLEANUP_RULES: List[Tuple[Pattern, str]] = [
+    (re.compile(r"\.{2,}|。{2,}|…+"), "…"),                                # 省略号
+    (re.compile(r"(?<![A-Za-z0-9])\.|\.(?![A-Za-z0-9])"), "。"),           # 句点（保留缩写与版本号中的点）
+    (re.compile(r"\s*\n\s*"), "。"),                                        # 换行视为句末
+    (re.compile(r"-"), " "),                                                # 剩余的连字符
+    (re.compile(r"(?<=[" + _CJK + _CN_PUNCTUATION + r"])\s+|\s+(?=[" + _CJK + _CN_PUNCTUATION + r"])"), ""),
+    (re.compile(r"[ \t]{2,}"), " "),
+    (re.compile(r"([" + _CN_PUNCTUATION + r"])[" + _CN_PUNCTUATION + r"\s]+"), r"\1"),  # 合并重复标点
+    (re.compile(r"^[" + _CN_PUNCTUATION + r"\s]+"), ""),                   # 开头的标点
+    (re.compile(r"[，、；：\s]+$"), ""),                                    # 结尾的停顿标点
+]
+
+
+class TextNormalizer:
+    """合成前的文本规范化"""
+
+    def __init__(self, enabled: bool = True, strip_markup: bool = True, expand_numbers: bool = True):
+        """
+        Args:
+            enabled: 是否启用规范化
+            strip_markup: 是否去除markdown/HTML标记
+            expand_numbers: 是否将数字、日期和单位展开为中文读法
+        """
+        self.enabled = enabled
+        self.strip_markup = strip_markup
+        self.expand_numbers = expand_numbers
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "TextNormalizer":
+        """从config.json中的text_normalizer配置创建"""
+        return cls(
+            enabled=config.get("enabled", True),
+            strip_markup=config.get("strip_markup", True),
+            expand_numbers=config.get("expand_numbers", True)
+        )
+
+    def normalize(self, text: str) -> str:
+        """规范化待合成文本；未启用时原样返回"""
+        if not self.enabled or not text:
+            return text
+
+        if self.strip_markup and _MARKUP_HINT_RE.search(text):
+            for pattern, replacement in _MARKUP_RULES:
+                text = pattern.sub(replacement, text)
+        text = _EMOJI_RE.sub("", text)
+        text = text.translate(_FULLWIDTH_TABLE)
+
+        if self.expand_numbers and _DIGIT_RE.search(text):
+            for pattern, replacement in _NUMBER_RULES:
+                text = pattern.sub(replacement, text)
+
+        text = text.translate(_PUNCTUATION_TABLE)
+        for pattern, replacement in _CLEANUP_RULES:
+            text = pattern.sub(replacement, text)
+        return text.strip()
+
+
+# 自检语料：(输入, 期望输出)
+SELF_CHECK_CORPUS: List[Tuple[str, str]] = [
+    ("**福州**是一座有2200多年历史的城市😊", "福州是一座有二千二百多年历史的城市"),
+    ("## 三坊七巷\n- 南后街\n- 衣锦坊", "三坊七巷。南后街。衣锦坊"),
+    ("详见[官网](https://www.fuzhou.gov.cn)。", "详见官网。"),
+    ("鼓山海拔925m，距市区约8km。", "鼓山海拔九百二十五米，距市区约八公里。"),
+    ("今天气温25℃，湿度80%。", "今天气温二十五摄氏度，湿度百分之八十。"),
+    ("活动时间是2024-05-01 09:30。", "活动时间是二零二四年五月一日九点三十分。"),
+    ("闽王王审知于909年受封。", "闽王王审知于九百零九年受封。"),
+    ("1949年8月17日福州解放", "一九四九年八月十七日福州解放"),
+    ("门票¥120，学生半价。", "门票一百二十元，学生半价。"),
+    ("全程3-5公里，约需1.5h", "全程三至五公里，约需一点五小时"),
+    ("人口约1,000,000人", "人口约一百万人"),
+    ("咨询电话：0591-87654321", "咨询电话：零五九一，八七六五四三二一"),
+    ("手机138-1234-5678", "手机一三八，一二三四，五六七八"),
+    ("福州船政创办于1866-1907年间", "福州船政创办于一八六六至一九零七年间"),
+    ("1990年-2000年是快速发展期", "一九九零年至二零零零年是快速发展期"),
+    ("占全省的3/4", "占全省的四分之三"),
+    ("最低气温-3℃", "最低气温负三摄氏度"),
+    ("涨幅10%-20%", "涨幅百分之十至百分之二十"),
+    ("真的吗？？！！太好了～～", "真的吗？太好了"),
+    ("福建有“八闽”之称（古称闽）", "福建有八闽之称，古称闽"),
+    ("ＡＢＣ，１２３！", "ABC，一百二十三！"),
+    ("第10005位游客", "第一万零五位游客"),
+    ("他说……好吧...", "他说…好吧…"),
+    ("<b>重要</b>：请提前预约", "重要：请提前预约"),
+    ("| 景点 | 门票 |\n|---|---|\n| 鼓山 | 免费 |", "景点，门票。鼓山，免费"),
+]
+
+
+def _self_check(normalizer: TextNormalizer) -> int:
+    failures = 0
+    for source, expected in SELF_CHECK_CORPUS:
+        actual = normalizer.normalize(source)
+        if actual != expected:
+            failures += 1
+            logger.error(f"❌ {source!r}\n    期望: {expected!r}\n    实际: {actual!r}")
+    logger.info(f"🧪 自检: {len(SELF_CHECK_CORPUS) - failures}/{len(SELF_CHECK_CORPUS)} 条通过")
+    return failures
+
+
+def _benchmark(normalizer: TextNormalizer, iterations: int):
+    corpus = [source for source, _ in SELF_CHECK_CORPUS]
+    chars = sum(len(source) for source in corpus)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for source in corpus:
+            normalizer.normalize(source)
+    elapsed = time.perf_counter() - start
+    calls = iterations * len(corpus)
+    logger.info(
+        f"⏱️ 基准: {calls} 次, 平均 {elapsed / calls * 1e6:.1f} µs/条, "
+        f"{iterations * chars / elapsed / 1e6:.2f} M字符/秒"
+    )
+
+
+def main():
+    """运行自检语料与吞吐基准"""
+    parser = argparse.ArgumentParser(description="文本规范化自检与基准")
+    parser.add_argument("--iterations", type=int, default=2000, help="基准测试的语料轮数")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    normalizer = TextNormalizer()
+    failures = _self_check(normalizer)
+    _benchmark(normalizer, args.iterations)
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
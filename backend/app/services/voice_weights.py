@@ -0,0 +1,97 @@
+"""
+语音权重增量切换
+所有角色共用同一个TTS管道（BERT与CNHuBERT编码器只加载一次），切换页面时
+只替换发生变化的GPT(T2S)或SoVITS(VITS)权重；最近使用的权重常驻内存，
+再次切换时直接换回，无需重新加载
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Tuple
+
+from app.services.memory_manager import memory_manager, tensor_bytes
+
+logger = logging.getLogger(__name__)
+
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+
+# init_t2s_weights更新的TTS_Config属性；其余基本类型属性（版本、采样率、频谱参数等）由init_vits_weights更新
+_T2S_CONFIG_ATTRIBUTES = ("t2s_weights_path", "max_sec", "hz")
+
+
+def _config_snapshot(configs: Any, part: str) -> Dict[str, Any]:
+    """记录TTS_Config中属于该部分权重的基本类型属性，恢复时不会改动另一部分的路径和参数"""
+    return {
+        name: value for name, value in vars(configs).items()
+        if isinstance(value, _PRIMITIVE_TYPES) and (name in _T2S_CONFIG_ATTRIBUTES) == (part == "t2s")
+    }
+
+
+class VoiceWeightSwitcher:
+    """在共享管道上增量切换T2S/VITS权重"""
+
+    def __init__(self, max_resident_voices: int = 3):
+        self.max_resident_voices = max(1, int(max_resident_voices))
+        self._lock = threading.Lock()
+        self.switches = {"t2s_loaded": 0, "t2s_reused": 0, "vits_loaded": 0, "vits_reused": 0}
+
+    def switch(self, pipeline: Any, gpt_path: str, sovits_path: str) -> Tuple[bool, bool]:
+        """
+        将管道切换到指定的权重
+
+        Returns:
+            (T2S是否切换, VITS是否切换)
+        """
+        with self._lock:
+            t2s_changed = self._switch_part(pipeline, "t2s", gpt_path)
+            vits_changed = self._switch_part(pipeline, "vits", sovits_path)
+        return t2s_changed, vits_changed
+
+    def _switch_part(self, pipeline: Any, part: str, weights_path: str) -> bool:
+        # 各部分当前加载的权重单独记录在管道上，不依赖可能被快照恢复改写的TTS_Config
+        loaded = getattr(pipeline, "_loaded_weights", None)
+        if loaded is None:
+            loaded = pipeline._loaded_weights = {}
+        current_path = loaded.get(part) or getattr(pipeline.configs, f"{part}_weights_path", None)
+        if current_path == weights_path:
+            memory_manager.touch(f"voice_{part}:{weights_path}")
+            return False
+
+        # 当前权重常驻保留，供之后切换回来
+        if current_path:
+            self._keep_resident(pipeline, part, current_path)
+
+        resident = memory_manager.get(f"voice_{part}:{weights_path}")
+        if resident is not None:
+            model, snapshot, extra = resident
+            setattr(pipeline, f"{part}_model", model)
+            for name, value in snapshot.items():
+                setattr(pipeline.configs, name, value)
+            for name, value in extra.items():
+                setattr(pipeline, name, value)
+            self.switches[f"{part}_reused"] += 1
+            logger.info("♻️ 切换%s权重（常驻）: %s", part.upper(), weights_path)
+        else:
+            getattr(pipeline, f"init_{part}_weights")(weights_path)
+            self.switches[f"{part}_loaded"] += 1
+            logger.info("📦 加载%s权重: %s", part.upper(), weights_path)
+
+        loaded[part] = weights_path
+        self._keep_resident(pipeline, part, weights_path)
+        return True
+
+    def _keep_resident(self, pipeline: Any, part: str, weights_path: str):
+        """登记当前加载的权重，数量超出max_resident_voices时淘汰最久未用的"""
+        name = f"voice_{part}:{weights_path}"
+        model = getattr(pipeline, f"{part}_model")
+        extra = {"is_v2pro": getattr(pipeline, "is_v2pro")} if part == "vits" and hasattr(pipeline, "is_v2pro") else {}
+
+        memory_manager.get_or_create(
+            name,
+            lambda: (model, _config_snapshot(pipeline.configs, part), extra),
+            cost=lambda: tensor_bytes(model),
+            group_limit=self.max_resident_voices
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.switches)
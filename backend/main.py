@@ -3,20 +3,32 @@ GPT-SoVITS语音合成后端服务
 基于FastAPI提供语音合成功能
 """
 
+import asyncio
+import json
 import logging
 import os
-from fastapi import FastAPI
+import time
+import uuid
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from app.services.log_service import request_id_var, setup_logging, shutdown_logging
+
+def _load_logging_config() -> dict:
+    """读取config.json中的logging配置"""
+    config_path = os.path.join(os.path.dirname(__file__), "config.json")
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("logging", {})
+    except Exception:
+        return {}
+
+# 配置日志（队列+后台线程写出的结构化日志）
+setup_logging(_load_logging_config())
 logger = logging.getLogger(__name__)
 
 # 创建FastAPI应用
@@ -33,10 +45,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Content-Location", "Content-Range", "Accept-Ranges", "X-Request-ID", "X-Synthesis-Profile"],
 )
 
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    """为每个请求分配请求ID，并记录一条包含耗时的访问日志"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        logger.info(
+            "请求完成",
+            extra={
+                "event": "access",
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+        )
+        return response
+    finally:
+        request_id_var.reset(token)
+
 # 导入路由
+from app.routes import voice_service
 from app.routes.voice_service import router as voice_router
+from app.routes.admin_service import router as admin_router
+from app.routes.worker_service import router as worker_router
+from app.services.inference_worker import InferenceWorker
 
 # 注册路由
 app.include_router(
@@ -44,6 +84,19 @@ app.include_router(
     prefix="/api/voice",
     tags=["语音服务"]
 )
+app.include_router(
+    admin_router,
+    prefix="/api/admin",
+    tags=["管理接口"]
+)
+app.include_router(
+    worker_router,
+    prefix="/api/worker",
+    tags=["推理工作节点"]
+)
+
+# 队列模式下在网关进程内运行的推理工作协程
+local_workers = []
 
 @app.on_event("startup")
 async def startup_event():
@@ -60,12 +113,41 @@ async def startup_event():
     if not os.path.exists(config_path):
         logger.warning(f"⚠️ 配置文件不存在: {config_path}")
 
+    # 启动异步合成任务服务（恢复重启前排队的任务）
+    await voice_service.job_service.start()
+
+    # 启用时启动对话回复的预测合成
+    if voice_service.speculative_enabled:
+        await voice_service.speculative_synthesis.start()
+
+    # 队列模式：启动本地推理工作协程（local_workers为0时只由远程工作节点处理）
+    if voice_service.inference_queue is not None:
+        gateway_config = voice_service.gpt_sovits_service.config.get("gateway", {})
+        for index in range(int(gateway_config.get("local_workers", 1))):
+            worker = InferenceWorker(
+                voice_service.gpt_sovits_service,
+                voice_service.inference_queue,
+                worker_id=f"local-{os.getpid()}-{index}"
+            )
+            local_workers.append((worker, asyncio.create_task(worker.run())))
+
+    # 后台渲染缺失或过期的预渲染短语
+    phrase_bank_config = voice_service.gpt_sovits_service.config.get("phrase_bank", {})
+    if phrase_bank_config.get("render_on_startup", True):
+        asyncio.create_task(voice_service.gpt_sovits_service.phrase_bank.render_all())
+
     logger.info("✅ GPT-SoVITS后端服务启动完成")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
+    await voice_service.job_service.stop()
+    await voice_service.speculative_synthesis.stop()
+    for worker, task in local_workers:
+        worker.stop()
+        task.cancel()
     logger.info("🛑 GPT-SoVITS后端服务关闭")
+    shutdown_logging()
 
 @app.get("/")
 async def root():
@@ -9,6 +9,7 @@ interface Message {
   timestamp: Date;
   isPlaying?: boolean;
   audioUrl?: string;
+  replyId?: string;
 }
 
 const TTSChat: React.FC = () => {
@@ -18,6 +19,8 @@ const TTSChat: React.FC = () => {
   const [playingMessageId, setPlayingMessageId] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const audioRef = useRef<HTMLAudioElement | null>(null);
+  // 正在进行的对话/合成请求，停止或离开页面时中止，后端随之取消对应的工作
+  const requestControllerRef = useRef<AbortController | null>(null);
 
   // 常见问题
   const commonQuestions = [
@@ -46,6 +49,11 @@ Hello～ 我是你们的闽派文化小伙伴「闽仔」！🔥
     setMessages([welcomeMessage]);
   }, []);
 
+  // 离开页面时中止正在进行的请求
+  useEffect(() => {
+    return () => requestControllerRef.current?.abort();
+  }, []);
+
   // 自动滚动到底部
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -67,6 +75,9 @@ Hello～ 我是你们的闽派文化小伙伴「闽仔」！🔥
     setInputMessage('');
     setIsLoading(true);
 
+    const controller = new AbortController();
+    requestControllerRef.current = controller;
+
     try {
       // 调用后端API进行对话
       const response = await fetch('http://localhost:8000/api/voice/chat', {
@@ -77,7 +88,8 @@ Hello～ 我是你们的闽派文化小伙伴「闽仔」！🔥
         body: JSON.stringify({
           message: messageToSend,
           page: 'tts-chat'
-        })
+        }),
+        signal: controller.signal
       });
 
       if (!response.ok) {
@@ -91,11 +103,13 @@ Hello～ 我是你们的闽派文化小伙伴「闽仔」！🔥
         id: (Date.now() + 1).toString(),
         role: 'assistant',
         content: data.response,
-        timestamp: new Date()
+        timestamp: new Date(),
+        replyId: data.reply_id ?? undefined
       };
 
       setMessages(prev => [...prev, aiMessage]);
     } catch (error) {
+      if (controller.signal.aborted) return;
       console.error('对话失败:', error);
 
       // 添加错误消息
@@ -108,6 +122,7 @@ Hello～ 我是你们的闽派文化小伙伴「闽仔」！🔥
 
       setMessages(prev => [...prev, errorMessage]);
     } finally {
+      if (requestControllerRef.current === controller) requestControllerRef.current = null;
       setIsLoading(false);
     }
   };
@@ -116,32 +131,53 @@ Hello～ 我是你们的闽派文化小伙伴「闽仔」！🔥
   const handlePlayAudio = async (message: Message) => {
     if (!message.content.trim()) return;
 
+    const controller = new AbortController();
+    requestControllerRef.current = controller;
+    const timeoutId = setTimeout(() => controller.abort(), 500000); // 500秒超时
+
     try {
       setIsLoading(true);
 
-      // 调用语音合成API
-      const response = await fetch('http://localhost:8000/api/voice/synthesize', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          text: message.content,
-          page: 'tts-chat'
-        }),
-        signal: AbortSignal.timeout(500000) // 500秒超时
-      });
-
-      if (!response.ok) {
-        throw new Error(`语音合成失败: ${response.status}`);
+      // 已合成过的消息直接使用可缓存的音频地址，由浏览器缓存提供，不再重复下载和合成
+      let audioUrl = message.audioUrl;
+      let objectUrl: string | null = null;
+
+      if (!audioUrl) {
+        // 调用语音合成API
+        const response = await fetch('http://localhost:8000/api/voice/synthesize', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({
+            text: message.content,
+            page: 'tts-chat',
+            // 后端已在后台预测合成该回复时可直接取用
+            reply_id: message.replyId
+          }),
+          signal: controller.signal
+        });
+
+        if (!response.ok) {
+          throw new Error(`语音合成失败: ${response.status}`);
+        }
+
+        const contentLocation = response.headers.get('Content-Location');
+        if (contentLocation) {
+          audioUrl = `http://localhost:8000${contentLocation}`;
+          const cachedUrl = audioUrl;
+          setMessages(prev => prev.map(msg =>
+            msg.id === message.id ? { ...msg, audioUrl: cachedUrl } : msg
+          ));
+        }
+
+        // 获取音频数据
+        const audioBlob = await response.blob();
+        objectUrl = URL.createObjectURL(audioBlob);
       }
 
-      // 获取音频数据
-      const audioBlob = await response.blob();
-      const audioUrl = URL.createObjectURL(audioBlob);
-
       // 创建音频元素
-      const audio = new Audio(audioUrl);
+      const audio = new Audio(objectUrl ?? audioUrl);
       audioRef.current = audio;
 
       // 设置播放状态
@@ -153,26 +189,29 @@ Hello～ 我是你们的闽派文化小伙伴「闽仔」！🔥
       // 播放结束处理
       audio.onended = () => {
         setPlayingMessageId(null);
-        URL.revokeObjectURL(audioUrl);
+        if (objectUrl) URL.revokeObjectURL(objectUrl);
       };
 
       // 播放错误处理
       audio.onerror = () => {
         setPlayingMessageId(null);
-        URL.revokeObjectURL(audioUrl);
+        if (objectUrl) URL.revokeObjectURL(objectUrl);
         console.error('音频播放失败');
       };
 
     } catch (error) {
-      console.error('语音合成失败:', error);
+      if (!controller.signal.aborted) console.error('语音合成失败:', error);
       setPlayingMessageId(null);
     } finally {
+      clearTimeout(timeoutId);
+      if (requestControllerRef.current === controller) requestControllerRef.current = null;
       setIsLoading(false);
     }
   };
 
   // 停止播放
   const handleStopAudio = () => {
+    requestControllerRef.current?.abort();
     if (audioRef.current) {
       audioRef.current.pause();
       audioRef.current.currentTime = 0;